@@ -0,0 +1,152 @@
+"""
+Collision-free allocation of ``account_number``, ``account_id`` and
+``access_code``.
+
+Each field has a fixed keyspace (e.g. 10**7 numbers after the ``217``
+prefix) walked in a shuffled order: index ``i`` maps to
+``(multiplier * i + offset) % size``, a permutation of the keyspace because
+the multiplier is coprime with its size. ``IdentifierSequence`` records how
+far each walk has got. A worker process reserves ``IDENTIFIER_BLOCK_SIZE``
+indices at a time under a row lock and then hands codes out of memory, so a
+signup never retries on a unique-constraint collision. Codes that random
+generation put in the table before this allocator existed are skipped when
+a block is reserved.
+
+A block reserved inside a transaction that later rolls back is discarded
+rather than reused; the lost indices only show up as reserved-but-unused in
+``python manage.py identifier_usage``.
+"""
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+
+from account.models import Account, IdentifierSequence
+from paylio.db.transaction import write_transaction
+
+logger = logging.getLogger(__name__)
+
+
+class IdentifierSpaceExhausted(Exception):
+    pass
+
+
+class Keyspace:
+    def __init__(self, field, prefix, digits, multiplier, offset):
+        self.field = field
+        self.prefix = prefix
+        self.digits = digits
+        self.size = 10 ** digits
+        self.multiplier = multiplier
+        self.offset = offset
+
+    def code(self, index):
+        return f"{self.prefix}{(self.multiplier * index + self.offset) % self.size:0{self.digits}d}"
+
+
+# Multipliers end in 3 or 9 (coprime with powers of ten) and sit near
+# size / golden ratio, so consecutive indices land far apart.
+KEYSPACES = {
+    "account_number": Keyspace("account_number", "217", 7, multiplier=6180339, offset=4127153),
+    "account_id": Keyspace("account_id", "DEX", 7, multiplier=3819653, offset=2718281),
+    "access_code": Keyspace("access_code", "", 6, multiplier=618033, offset=141421),
+}
+
+
+def reserve(keyspace, size):
+    """Reserve the next ``size`` indices of ``keyspace`` and return their unused codes."""
+    with write_transaction():
+        sequence, _ = IdentifierSequence.objects.select_for_update().get_or_create(name=keyspace.field)
+        start = sequence.next_index
+        if start >= keyspace.size:
+            raise IdentifierSpaceExhausted(f"No {keyspace.field} values left.")
+        end = min(start + size, keyspace.size)
+        sequence.next_index = end
+        sequence.save(update_fields=["next_index"])
+
+    if end / keyspace.size >= settings.IDENTIFIER_WARN_UTILISATION:
+        logger.warning("%s keyspace is %.1f%% reserved", keyspace.field, 100 * end / keyspace.size)
+
+    codes = [keyspace.code(index) for index in range(start, end)]
+    taken = set(Account.objects.filter(**{f"{keyspace.field}__in": codes}).values_list(keyspace.field, flat=True))
+    return [code for code in codes if code not in taken]
+
+
+class IdentifierPool:
+    """The codes this process has reserved for one field but not handed out yet."""
+
+    def __init__(self, keyspace):
+        self.keyspace = keyspace
+        self.codes = deque()
+        self.lock = threading.Lock()
+
+    def allocate(self):
+        with self.lock:
+            if self.codes:
+                return self.codes.popleft()
+
+        codes = []
+        while not codes:
+            codes = reserve(self.keyspace, settings.IDENTIFIER_BLOCK_SIZE)
+        # The rest of the block only becomes usable once the reservation has
+        # committed; if the surrounding transaction rolls back, another
+        # process may be handed the same indices.
+        db_transaction.on_commit(lambda: self.release(codes[1:]))
+        return codes[0]
+
+    def release(self, codes):
+        with self.lock:
+            self.codes.extend(codes)
+
+    def clear(self):
+        with self.lock:
+            self.codes.clear()
+
+
+pools = {field: IdentifierPool(keyspace) for field, keyspace in KEYSPACES.items()}
+
+
+def clear_pools():
+    for pool in pools.values():
+        pool.clear()
+
+
+# A forked worker must not hand out the codes its parent already holds.
+os.register_at_fork(after_in_child=clear_pools)
+
+
+def allocate(field):
+    return pools[field].allocate()
+
+
+def allocate_many(field, count):
+    """``count`` fresh codes at once, for bulk inserts that bypass ``Account.save()``."""
+    keyspace = KEYSPACES[field]
+    codes = []
+    while len(codes) < count:
+        codes.extend(reserve(keyspace, count - len(codes)))
+    return codes
+
+
+def assign(account):
+    """Fill in any identifier ``account`` does not have yet."""
+    for field in KEYSPACES:
+        if not getattr(account, field):
+            setattr(account, field, allocate(field))
+
+
+def utilisation():
+    """Per field: keyspace size, indices reserved so far, and accounts holding a value."""
+    reserved = dict(IdentifierSequence.objects.values_list("name", "next_index"))
+    report = []
+    for field, keyspace in KEYSPACES.items():
+        report.append({
+            "field": field,
+            "size": keyspace.size,
+            "reserved": reserved.get(field, 0),
+            "used": Account.objects.exclude(**{f"{field}__isnull": True}).exclude(**{field: ""}).count(),
+        })
+    return report
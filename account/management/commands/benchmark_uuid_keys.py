@@ -0,0 +1,91 @@
+import time
+import uuid
+
+from django.apps.registry import Apps
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+
+from account.models import uuid7
+
+
+def scratch_model(registry, name, default):
+    """A table keyed by ``default()``, registered in ``registry`` rather than the project's apps."""
+    meta = type("Meta", (), {"app_label": "account", "apps": registry, "db_table": f"bench_{default.__name__}_keys"})
+    return type(name, (models.Model,), {
+        "__module__": __name__,
+        "Meta": meta,
+        "id": models.UUIDField(primary_key=True, default=default),
+        "payload": models.CharField(max_length=64),
+    })
+
+
+def primary_key_size(table):
+    """Bytes used by the primary-key index of ``table``, or None if the backend can't tell."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT pg_relation_size(indexrelid) FROM pg_index WHERE indrelid = %s::regclass AND indisprimary",
+                [table],
+            )
+        elif connection.vendor == "mysql":
+            # InnoDB clusters the table on its primary key, so the table is the index.
+            cursor.execute(f"ANALYZE TABLE {connection.ops.quote_name(table)}")
+            cursor.fetchall()
+            cursor.execute(
+                "SELECT data_length FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+        elif connection.vendor == "sqlite":
+            try:
+                cursor.execute("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE %s", [f"sqlite_autoindex_{table}_%"])
+            except Exception:
+                # SQLite built without the dbstat virtual table.
+                return None
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare insert throughput and primary-key index size of random (uuid4) and time-ordered (uuid7) "
+        "UUID keys on the configured database. Uses two scratch tables that are dropped afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000000, help="Rows inserted into each table.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per INSERT; each batch commits.")
+
+    def handle(self, *args, **options):
+        rows, batch_size = options["rows"], options["batch_size"]
+        self.stdout.write(f"Backend: {connection.vendor}, {rows} rows per table, batches of {batch_size}\n")
+
+        # A private registry, so migrations and apps.get_models() never see the scratch tables.
+        registry = Apps()
+        for model in (scratch_model(registry, "BenchUUID4", uuid.uuid4), scratch_model(registry, "BenchUUID7", uuid7)):
+            with connection.schema_editor() as editor:
+                editor.create_model(model)
+            try:
+                batch_timings = []
+                for start in range(0, rows, batch_size):
+                    count = min(batch_size, rows - start)
+                    batch = [model(payload=f"row {start + i}") for i in range(count)]
+                    started = time.perf_counter()
+                    with transaction.atomic():
+                        model.objects.bulk_create(batch)
+                    batch_timings.append((count, time.perf_counter() - started))
+
+                total = sum(elapsed for _, elapsed in batch_timings)
+                # The last tenth of the batches shows the cost once the index has grown.
+                tail = batch_timings[-max(1, len(batch_timings) // 10):]
+                tail_rate = sum(count for count, _ in tail) / sum(elapsed for _, elapsed in tail)
+                size = primary_key_size(model._meta.db_table)
+                size_text = f"{size / 1024 / 1024:.1f} MiB" if size is not None else "n/a"
+                self.stdout.write(self.style.SUCCESS(
+                    f"{model._meta.get_field('id').default.__name__}: {rows / total:,.0f} rows/s overall, "
+                    f"{tail_rate:,.0f} rows/s for the last 10%, primary key index {size_text}"
+                ))
+            finally:
+                with connection.schema_editor() as editor:
+                    editor.delete_model(model)
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from account import identifiers
+
+
+class Command(BaseCommand):
+    help = "Report how much of the account_number, account_id and access_code keyspaces is reserved and used."
+
+    def handle(self, *args, **options):
+        for row in identifiers.utilisation():
+            reserved = row["reserved"] / row["size"]
+            line = (
+                f"{row['field']}: {row['reserved']}/{row['size']} reserved ({reserved:.2%}), "
+                f"{row['used']} in use, {row['size'] - row['reserved']} left"
+            )
+            if reserved >= settings.IDENTIFIER_WARN_UTILISATION:
+                self.stdout.write(self.style.WARNING(line))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
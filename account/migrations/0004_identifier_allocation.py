@@ -0,0 +1,50 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:54
+
+import account.models
+from django.db import migrations, models
+
+
+def create_sequences(apps, schema_editor):
+    # One row per allocated field, so reservations only ever lock an existing row.
+    IdentifierSequence = apps.get_model('account', 'IdentifierSequence')
+    for name in ('account_number', 'account_id', 'access_code'):
+        IdentifierSequence.objects.get_or_create(name=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0003_add_access_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdentifierSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('next_index', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='account',
+            name='access_code',
+            field=models.CharField(blank=True, max_length=6, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='account',
+            name='account_id',
+            field=models.CharField(blank=True, max_length=25, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='account',
+            name='account_number',
+            field=models.CharField(blank=True, max_length=25, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='account',
+            name='pin_number',
+            field=models.CharField(default=account.models.generate_pin, max_length=7),
+        ),
+        migrations.RunPython(create_sequences, migrations.RunPython.noop),
+    ]
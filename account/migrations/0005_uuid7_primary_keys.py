@@ -0,0 +1,27 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:56
+
+import account.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_identifier_allocation'),
+    ]
+
+    # Only the default changes: existing uuid4 keys stay as they are (they are
+    # still valid, and rewriting primary keys would mean rewriting every
+    # foreign key to them). New rows get time-ordered keys.
+    operations = [
+        migrations.AlterField(
+            model_name='account',
+            name='id',
+            field=models.UUIDField(default=account.models.uuid7, editable=False, primary_key=True, serialize=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='kyc',
+            name='id',
+            field=models.UUIDField(default=account.models.uuid7, editable=False, primary_key=True, serialize=False, unique=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+import random
+
+from django.db import migrations
+from django.db.models import Q
+
+from paylio.db.batches import update_in_chunks
+
+
+def generate_unique_code(existing):
+    digits = '0123456789'
+    for _ in range(10000):
+        code = ''.join(random.choices(digits, k=6))
+        if code not in existing:
+            return code
+    raise RuntimeError('Unable to generate unique access code')
+
+
+def forwards(apps, schema_editor):
+    Account = apps.get_model('account', 'Account')
+    existing = set(Account.objects.exclude(access_code__isnull=True).values_list('access_code', flat=True))
+
+    def assign(accounts):
+        for acc in accounts:
+            acc.access_code = generate_unique_code(existing)
+            existing.add(acc.access_code)
+        return accounts
+
+    # Only accounts still without a code, so a stopped run resumes.
+    missing = Q(access_code__isnull=True) | Q(access_code='')
+    update_in_chunks(Account.objects.filter(missing), ['access_code'], assign)
+
+
+class Migration(migrations.Migration):
+    # Data only: each chunk of accounts commits separately.
+    atomic = False
+
+    dependencies = [
+        ('account', '0005_uuid7_primary_keys'),
+    ]
+
+    operations = [
+        # Nothing to undo: the codes are left in place.
+        migrations.RunPython(forwards, reverse_code=migrations.RunPython.noop),
+    ]
@@ -1,8 +1,12 @@
 from django.db import models
+import os
+import secrets
+import time
 import uuid
 from shortuuid.django_fields import ShortUUIDField
 from userauths.models import User
 from django.db.models.signals import post_save
+from paylio.db.dirty import DirtyFieldsMixin
 
 
 
@@ -38,20 +42,45 @@ IDENTITY_TYPE = (
 )
 
 
+def uuid7():
+    """
+    Time-ordered UUID (RFC 9562 version 7): a 48-bit Unix millisecond
+    timestamp followed by 74 random bits. New rows land at the right-hand
+    edge of the primary-key B-tree instead of on a random page.
+    """
+    millis = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (
+        (millis & 0xFFFFFFFFFFFF) << 80
+        | 0x7 << 76
+        | (rand >> 62 & 0xFFF) << 64
+        | 0b10 << 62
+        | rand & (1 << 62) - 1
+    )
+    return uuid.UUID(int=value)
+
+
+def generate_pin():
+    # PINs are secrets, not identifiers: drawn at random and not unique.
+    return "".join(secrets.choice("0123456789") for _ in range(4))
+
+
 def user_directory_path(instance, filename):
     ext = filename.split(".")[-1]
     filename = "%s_%s" % (instance.id, ext)
     return "user_{0}/{1}".format(instance.user.id, filename)
 
-class Account(models.Model):
-    id = models.UUIDField(primary_key=True, unique=True, default=uuid.uuid4, editable=False)
+class Account(DirtyFieldsMixin, models.Model):
+    id = models.UUIDField(primary_key=True, unique=True, default=uuid7, editable=False)
     user =  models.OneToOneField(User, on_delete=models.CASCADE)
     account_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0.00) #123 345 789 102
-    account_number = ShortUUIDField(unique=True,length=7, max_length=7, prefix="217", alphabet="1234567890") #2175893745837
+    # account_number, account_id and access_code are handed out on the first
+    # save by account.identifiers, collision-free.
+    account_number = models.CharField(unique=True, max_length=25, blank=True) #2175893745837
     # Short numeric access code shown on dashboard (6 digits)
-    access_code = ShortUUIDField(unique=True, length=6, max_length=6, alphabet="1234567890", null=True, blank=True)
-    account_id = ShortUUIDField(unique=True,length=7, max_length=25, prefix="DEX", alphabet="1234567890") #2175893745837
-    pin_number = ShortUUIDField(unique=True,length=4, max_length=7, prefix="", alphabet="1234567890") #2737
+    access_code = models.CharField(unique=True, max_length=6, null=True, blank=True)
+    account_id = models.CharField(unique=True, max_length=25, blank=True) #DEX5893745
+    pin_number = models.CharField(max_length=7, default=generate_pin) #2737
     red_code = ShortUUIDField(unique=True,length=10, max_length=20, prefix="", alphabet="abcdefgh1234567890") #2737
     account_type = models.CharField(max_length=50, choices=ACCOUNT_TYPE, default="checking")
     account_status = models.CharField(max_length=100, choices=ACCOUNT_STATUS, default="in-active")
@@ -68,8 +97,25 @@ class Account(models.Model):
     def __str__(self):
         return f"{self.user}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            from account import identifiers
+
+            identifiers.assign(self)
+        super().save(*args, **kwargs)
+
+
+class IdentifierSequence(models.Model):
+    """How far into its shuffled keyspace each identifier field has been reserved."""
+    name = models.CharField(max_length=50, unique=True)
+    next_index = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_index}"
+
+
 class KYC(models.Model):
-    id = models.UUIDField(primary_key=True, unique=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, unique=True, default=uuid7, editable=False)
     user =  models.OneToOneField(User, on_delete=models.CASCADE)
     account =  models.OneToOneField(Account, on_delete=models.CASCADE, null=True, blank=True)
     full_name = models.CharField(max_length=1000)
@@ -101,15 +147,13 @@ class KYC(models.Model):
 
 
 
-def create_account(sender, instance, created, **kwargs):
-    if created:
+def create_account(sender, instance, created, raw=False, **kwargs):
+    # Once, when the user row is inserted, and in its transaction (sign-up
+    # runs in one). Later User saves (last_login, password) leave the
+    # account alone.
+    if created and not raw:
         Account.objects.create(user=instance)
 
-def save_account(sender, instance,**kwargs):
-    account, created = Account.objects.get_or_create(user=instance)
-    instance.account.save()
-
-post_save.connect(create_account, sender=User)
-post_save.connect(save_account, sender=User)
+post_save.connect(create_account, sender=User, dispatch_uid="create-account")
 
 
@@ -1,3 +1,65 @@
+import time
+
+from django.db import transaction
 from django.test import TestCase
+from django.urls import reverse
+
+from account import identifiers
+from account.models import Account, IdentifierSequence, uuid7
+from core.tests import QueryBudgetTestCase, make_user
+
+
+class DashboardQueryTests(QueryBudgetTestCase):
+    # Cold-cache budgets: the first render also builds the dashboard summary.
+    def test_dashboard_query_budget(self):
+        self.assertQueryBudget(reverse("account:dashboard"), budget=13)
+
+    def test_account_query_budget(self):
+        self.assertQueryBudget(reverse("account:account"), budget=14)
+
+
+class IdentifierAllocationTests(TestCase):
+    def setUp(self):
+        identifiers.clear_pools()
+
+    def test_signups_get_distinct_well_formed_codes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            users = [make_user(f"signup{i}") for i in range(5)]
+        numbers = {user.account.account_number for user in users}
+        self.assertEqual(len(numbers), 5)
+        for user in users:
+            self.assertRegex(user.account.account_number, r"^217\d{7}$")
+            self.assertRegex(user.account.account_id, r"^DEX\d{7}$")
+            self.assertRegex(user.account.access_code, r"^\d{6}$")
+
+        # Once the reservations have committed, later signups are served from memory.
+        reserved = IdentifierSequence.objects.get(name="account_number").next_index
+        with self.assertNumQueries(0):
+            identifiers.allocate("account_number")
+        self.assertEqual(IdentifierSequence.objects.get(name="account_number").next_index, reserved)
+
+    def test_codes_already_in_the_table_are_skipped(self):
+        user = make_user("legacy")
+        keyspace = identifiers.KEYSPACES["account_number"]
+        next_index = IdentifierSequence.objects.get(name="account_number").next_index
+        Account.objects.filter(pk=user.account.pk).update(account_number=keyspace.code(next_index))
+        identifiers.clear_pools()
+        self.assertNotEqual(identifiers.allocate("account_number"), keyspace.code(next_index))
+
+    def test_block_reserved_in_rolled_back_transaction_is_discarded(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                identifiers.allocate("access_code")
+                raise RuntimeError
+        self.assertEqual(len(identifiers.pools["access_code"].codes), 0)
+
 
-# Create your tests here.
+class UUID7Tests(TestCase):
+    def test_keys_are_version_7_and_time_ordered(self):
+        keys = []
+        for _ in range(3):
+            keys.append(uuid7())
+            time.sleep(0.002)
+        self.assertEqual({key.version for key in keys}, {7})
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(make_user("ordered").account.pk.version, 7)
@@ -1,13 +1,26 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from account.models import KYC, Account
 from account.forms import KYCForm
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.http import Http404
 from core.forms import CreditCardForm
-from core.models import CreditCard, Notification, Transaction
+from core.models import Notification
+from core.pagination import paginate
+from core.summary import get_summary
+from core.transaction import transaction_feed, with_parties
 from userauths.models import User
 
+
+def dashboard_feed(request, summary, feed):
+    # The newest page of each feed comes from the cached summary; older pages
+    # (a cursor in the query string) are read from the database.
+    cursor = request.GET.get(feed)
+    if not cursor:
+        return summary["feeds"][feed]
+    return paginate(with_parties(transaction_feed(request.user, feed)), cursor, settings.DASHBOARD_TRANSACTIONS)
+
 # @login_required
 def account(request):
     if request.user.is_authenticated:
@@ -16,17 +29,7 @@ def account(request):
         except:
             kyc = None
         
-        recent_transfer = Transaction.objects.filter(sender=request.user, transaction_type="transfer", status="completed").order_by("-id")[:1]
-        recent_recieved_transfer = Transaction.objects.filter(reciever=request.user, transaction_type="transfer").order_by("-id")[:1]
-
-        sender_transaction = Transaction.objects.filter(sender=request.user, transaction_type="transfer").order_by("-id")
-        reciever_transaction = Transaction.objects.filter(reciever=request.user, transaction_type="transfer").order_by("-id")
-
-        request_sender_transaction = Transaction.objects.filter(sender=request.user, transaction_type="request")
-        request_reciever_transaction = Transaction.objects.filter(reciever=request.user, transaction_type="request")
-        
         account = Account.objects.get(user=request.user)
-        credit_card = CreditCard.objects.filter(user=request.user).order_by("-id")
 
         if request.method == "POST":
             form = CreditCardForm(request.POST)
@@ -42,7 +45,14 @@ def account(request):
         else:
             form = CreditCardForm()
 
-        notifications = Notification.objects.filter(user=request.user).order_by("-id")[:5]
+        summary = get_summary(request.user)
+        credit_card = summary["cards"]
+        sender_transaction = dashboard_feed(request, summary, "sent")
+        reciever_transaction = dashboard_feed(request, summary, "received")
+
+        request_sender_transaction = dashboard_feed(request, summary, "sent_requests")
+        request_reciever_transaction = dashboard_feed(request, summary, "received_requests")
+        sent_count = summary["sent_count"]
         
         context = {
             "kyc": kyc,
@@ -53,7 +63,8 @@ def account(request):
             "reciever_transaction": reciever_transaction,
             "request_sender_transaction": request_sender_transaction,
             "request_reciever_transaction": request_reciever_transaction,
-            "notifications": notifications,
+            "sent_count": sent_count,
+            "summary": summary,
         }
         return render(request, "account/dashboard.html", context)
     else:
@@ -104,14 +115,11 @@ def kyc_registration(request):
             return redirect("account:account")
     else:
         form = KYCForm(instance=kyc)
-    
-    notifications = Notification.objects.filter(user=user).order_by("-id")[:5]
-    
+
     context = {
         "account": account,
         "form": form,
         "kyc": kyc,
-        "notifications": notifications,
     }
     return render(request, "account/kyc-form.html", context)
 
@@ -124,19 +132,7 @@ def dashboard(request):
             kyc = None
             messages.info(request, "Complete your KYC verification to unlock all features")
         
-        recent_transfer = Transaction.objects.filter(sender=request.user, transaction_type="transfer", status="completed").order_by("-id")[:1]
-        recent_recieved_transfer = Transaction.objects.filter(reciever=request.user, transaction_type="transfer").order_by("-id")[:1]
-
-
-        sender_transaction = Transaction.objects.filter(sender=request.user, transaction_type="transfer").order_by("-id")
-        reciever_transaction = Transaction.objects.filter(reciever=request.user, transaction_type="transfer").order_by("-id")
-
-        request_sender_transaction = Transaction.objects.filter(sender=request.user, transaction_type="request")
-        request_reciever_transaction = Transaction.objects.filter(reciever=request.user, transaction_type="request")
-        
-        
         account = Account.objects.get(user=request.user)
-        credit_card = CreditCard.objects.filter(user=request.user).order_by("-id")
 
         if request.method == "POST":
             form = CreditCardForm(request.POST)
@@ -156,6 +152,15 @@ def dashboard(request):
         else:
             form = CreditCardForm()
 
+        summary = get_summary(request.user)
+        credit_card = summary["cards"]
+        sender_transaction = dashboard_feed(request, summary, "sent")
+        reciever_transaction = dashboard_feed(request, summary, "received")
+
+        request_sender_transaction = dashboard_feed(request, summary, "sent_requests")
+        request_reciever_transaction = dashboard_feed(request, summary, "received_requests")
+        sent_count = summary["sent_count"]
+
     else:
         messages.warning(request, "You need to login to access the dashboard")
         return redirect("userauths:sign-in")
@@ -170,8 +175,8 @@ def dashboard(request):
 
         'request_sender_transaction':request_sender_transaction,
         'request_reciever_transaction':request_reciever_transaction,
-        'recent_transfer':recent_transfer,
-        'recent_recieved_transfer':recent_recieved_transfer,
+        'sent_count':sent_count,
+        'summary':summary,
     }
     return render(request, "account/dashboard.html", context)
     
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""
+Resolve what a user typed into the "find recipient" box to an account.
+
+Only exact matches are supported, and the shape of the query picks the
+column: ``DEX...`` is an ``account_id``, six digits an ``access_code`` and
+anything else an ``account_number``. Each of those columns is unique, so a
+lookup is one index probe however many accounts exist, and an empty query
+resolves to nothing instead of listing every account.
+
+Resolved accounts are kept as small public cards (name, number, email,
+avatar) in a per-process LRU; saving the Account or its KYC drops the cached
+card in this process, other workers pick up changes within
+``ACCOUNT_CARD_CACHE_TTL`` seconds.
+"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+from account.models import KYC, Account
+from core.lru import LRUCache
+
+card_cache = LRUCache(settings.ACCOUNT_CARD_CACHE_SIZE)
+
+
+class AccountCard:
+    """The public part of an account, safe to show to other users."""
+
+    def __init__(self, account_number, full_name, email, image_url):
+        self.account_number = account_number
+        self.full_name = full_name
+        self.email = email
+        self.image_url = image_url
+
+    @classmethod
+    def from_account(cls, account):
+        kyc = getattr(account.user, "kyc", None)
+        full_name = kyc.full_name if kyc else ""
+        image_url = kyc.image.url if kyc and kyc.image else ""
+        return cls(account.account_number, full_name, account.user.email, image_url)
+
+
+def identifier_field(query):
+    if query.upper().startswith("DEX"):
+        return "account_id"
+    if len(query) == 6 and query.isdigit():
+        return "access_code"
+    return "account_number"
+
+
+def resolve(query):
+    """Return a list with the matching ``AccountCard``, or an empty list."""
+    query = (query or "").strip()
+    if not query:
+        return []
+    field = identifier_field(query)
+    if field == "account_id":
+        query = query.upper()
+
+    card = card_cache.get((field, query))
+    if card is None:
+        account = Account.objects.filter(**{field: query}).select_related("user__kyc").first()
+        if account is None:
+            return []
+        card = AccountCard.from_account(account)
+        card_cache.set((field, query), card, settings.ACCOUNT_CARD_CACHE_TTL)
+    return [card]
+
+
+def forget(account):
+    card_cache.delete(
+        ("account_number", account.account_number),
+        ("account_id", account.account_id),
+        ("access_code", account.access_code),
+    )
+
+
+def account_changed(sender, instance, **kwargs):
+    forget(instance)
+
+
+def kyc_changed(sender, instance, **kwargs):
+    if instance.account_id is not None:
+        forget(instance.account)
+
+
+def connect_signals():
+    for signal in (post_save, post_delete):
+        signal.connect(account_changed, sender=Account, dispatch_uid=f"resolver-account-{signal is post_save}")
+        signal.connect(kyc_changed, sender=KYC, dispatch_uid=f"resolver-kyc-{signal is post_save}")
@@ -1,5 +1,9 @@
-from django.contrib import admin
-from core.models import Transaction, CreditCard, Notification
+from django.contrib import admin, messages
+from django.shortcuts import render
+from django.urls import path
+from account.models import Account
+from core.bulk_transfer import parse_payout_csv, run_bulk_transfer
+from core.models import Transaction, CreditCard, Notification, LedgerEntry, BalanceSnapshot
 
 class TransactionAdmin(admin.ModelAdmin):
     list_editable = ['amount', 'status', 'transaction_type']
@@ -8,6 +12,42 @@ class TransactionAdmin(admin.ModelAdmin):
     search_fields = ['transaction_id', 'user__username', 'reciever__username', 'sender__username', 'description']
     readonly_fields = ['transaction_id', 'date']
     date_hierarchy = 'date'
+    change_list_template = 'admin/core/transaction/change_list.html'
+
+    def get_urls(self):
+        urls = [
+            path('bulk-payout/', self.admin_site.admin_view(self.bulk_payout_view), name='core_transaction_bulk_payout'),
+        ]
+        return urls + super().get_urls()
+
+    def bulk_payout_view(self, request):
+        result = None
+        if request.method == 'POST':
+            account_number = request.POST.get('account_number', '').strip()
+            upload = request.FILES.get('payouts')
+            account = Account.objects.select_related('user').filter(account_number=account_number).first()
+            if account is None:
+                messages.error(request, 'Sender account does not exist.')
+            elif upload is None:
+                messages.error(request, 'Upload a CSV file of payouts.')
+            else:
+                try:
+                    result = run_bulk_transfer(account, parse_payout_csv(upload))
+                except ValueError as e:
+                    messages.error(request, str(e))
+                else:
+                    if 'error' in result:
+                        messages.error(request, result['error'])
+                    else:
+                        messages.success(request, f"Paid {len(result['completed'])} recipient(s), {len(result['failed'])} row(s) failed.")
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Bulk payout',
+            'result': result,
+        }
+        return render(request, 'admin/core/transaction/bulk_payout.html', context)
 
 
 class CreditCardAdmin(admin.ModelAdmin):
@@ -26,6 +66,31 @@ class NotificationAdmin(admin.ModelAdmin):
     readonly_fields = ['date']
     date_hierarchy = 'date'
 
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ['reference', 'direction', 'amount', 'account', 'credit_card', 'transaction', 'date']
+    list_filter = ['direction', 'date']
+    search_fields = ['reference', 'account__account_number', 'account__user__username']
+    date_hierarchy = 'date'
+
+    # Entries are written only by core.transfer_service.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class BalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['account', 'balance', 'last_entry_id', 'date']
+    search_fields = ['account__account_number', 'account__user__username']
+    readonly_fields = ['account', 'balance', 'last_entry_id', 'date']
+    date_hierarchy = 'date'
+
 admin.site.register(Transaction, TransactionAdmin)
 admin.site.register(CreditCard, CreditCardAdmin)
-admin.site.register(Notification, NotificationAdmin)
\ No newline at end of file
+admin.site.register(Notification, NotificationAdmin)
+admin.site.register(LedgerEntry, LedgerEntryAdmin)
+admin.site.register(BalanceSnapshot, BalanceSnapshotAdmin)
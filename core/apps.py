@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+
+        from core import account_resolver, metrics, notifications, slow_queries, summary
+
+        summary.connect_signals()
+        account_resolver.connect_signals()
+        notifications.connect_signals()
+        metrics.connect_signals()
+        if settings.SLOW_QUERY_THRESHOLD_MS:
+            connection_created.connect(slow_queries.install, dispatch_uid="slow-query-recorder")
@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.views.decorators.http import require_POST
+
+from core import transfer_service
+
+CSV_COLUMNS = ["account_number", "amount", "description"]
+
+
+def parse_payout_csv(upload):
+    """
+    Read payouts from an uploaded CSV file. Columns are ``account_number``,
+    ``amount`` and an optional ``description``; the header row may be left out.
+    """
+    try:
+        text = io.TextIOWrapper(upload.file, encoding="utf-8-sig")
+        rows = [row for row in csv.reader(text) if any(cell.strip() for cell in row)]
+    except (UnicodeDecodeError, csv.Error):
+        raise ValueError("The file is not a valid CSV file.")
+
+    if rows and rows[0] and rows[0][0].strip().lower() == "account_number":
+        rows = rows[1:]
+    return [dict(zip(CSV_COLUMNS, (cell.strip() for cell in row))) for row in rows]
+
+
+def run_bulk_transfer(sender_account, payouts):
+    """Pay ``payouts`` and return a result dict that the page and the API both report."""
+    if len(payouts) > settings.BULK_TRANSFER_MAX_ROWS:
+        return {"error": f"A bulk transfer can pay at most {settings.BULK_TRANSFER_MAX_ROWS} recipients."}
+    try:
+        transactions, failures = transfer_service.bulk_transfer(sender_account, payouts)
+    except transfer_service.InsufficientFunds:
+        return {"error": "Insufficient Funds."}
+
+    return {
+        "completed": [
+            {
+                "transaction_id": t.transaction_id,
+                "account_number": t.reciever_account.account_number,
+                "amount": str(t.amount),
+            }
+            for t in transactions
+        ],
+        "failed": failures,
+        "total": str(sum(t.amount for t in transactions)),
+    }
+
+
+@login_required
+def bulk_transfer(request):
+    account = request.user.account
+    result = None
+
+    if request.method == "POST":
+        pin_number = request.POST.get("pin-number")
+        upload = request.FILES.get("payouts")
+
+        if pin_number != account.pin_number:
+            messages.warning(request, "Incorrect Pin.")
+        elif upload is None:
+            messages.warning(request, "Upload a CSV file of payouts.")
+        else:
+            try:
+                payouts = parse_payout_csv(upload)
+            except ValueError as e:
+                messages.warning(request, str(e))
+            else:
+                result = run_bulk_transfer(account, payouts)
+                if "error" in result:
+                    messages.warning(request, result["error"])
+                else:
+                    messages.success(request, f"Paid {len(result['completed'])} recipient(s), {len(result['failed'])} row(s) failed.")
+
+    context = {
+        "account": account,
+        "result": result,
+    }
+    return render(request, "transfer/bulk-transfer.html", context)
+
+
+@login_required
+@require_POST
+def bulk_transfer_api(request):
+    """
+    JSON body: ``{"pin": "1234", "payouts": [{"account_number": ..., "amount": ..., "description": ...}]}``.
+    """
+    try:
+        data = json.loads(request.body)
+        payouts = list(data["payouts"])
+        pin_number = str(data.get("pin", ""))
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": "Invalid request body."}, status=400)
+
+    account = request.user.account
+    if pin_number != account.pin_number:
+        return JsonResponse({"error": "Incorrect Pin."}, status=403)
+    if not all(isinstance(payout, dict) for payout in payouts):
+        return JsonResponse({"error": "Each payout must be an object."}, status=400)
+
+    result = run_bulk_transfer(account, payouts)
+    return JsonResponse(result, status=400 if "error" in result else 200)
@@ -1,15 +1,53 @@
-
+from django.conf import settings
 
 from core.models import Notification
 
 
-def default(request):
-    try:
-        notifications = Notification.objects.filter(user=request.user).order_by("-id")[:10]
-    except:
-        notifications = None
+class LatestNotifications:
+    """
+    The user's newest notifications, loaded on first use.
+
+    Pages that never mention ``notifications`` run no query. ``count`` is
+    the number shown, at most ``LATEST_NOTIFICATIONS``: nothing marks
+    notifications read yet, so the unread counter would only ever grow.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._items = None
+
+    @property
+    def items(self):
+        if self._items is None:
+            if self.user.is_authenticated:
+                self._items = list(
+                    Notification.objects.filter(user=self.user).order_by("-id")[:settings.LATEST_NOTIFICATIONS]
+                )
+            else:
+                self._items = []
+        return self._items
+
+    @property
+    def count(self):
+        return len(self.items)
 
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+
+def default(request):
+    # Memoised on the request, so every template rendered for it shares one query.
+    if not hasattr(request, "_latest_notifications"):
+        request._latest_notifications = LatestNotifications(request.user)
     return {
-        "notifications":notifications,
-       
-    }
\ No newline at end of file
+        "notifications": request._latest_notifications,
+    }
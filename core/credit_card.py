@@ -1,9 +1,8 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.contrib.auth.decorators import login_required
-from core.models import CreditCard, Notification
+from core.models import CreditCard
+from core import transfer_service, metrics
 from account.models import Account
-from decimal import Decimal
 
 def all_cards(request):
     account = Account.objects.get(user=request.user)
@@ -33,52 +32,27 @@ def withdraw_fund(request, card_id):
         amount = request.POST.get("amount")
         print(amount)
 
-        if credit_card.amount >= Decimal(amount) and credit_card.amount != 0.00:
-            account.account_balance += Decimal(amount)
-            account.save()
-
-            credit_card.amount -= Decimal(amount)
-            credit_card.save()
-            
-            Notification.objects.create(
-                user=request.user,
-                amount=amount,
-                notification_type="Withdrew Credit Card Funds"
-            )
-
-            messages.success(request, "Withdrawal Successfull")
-            return redirect("core:card-detail", credit_card.card_id)
-        elif credit_card.amount == 0.00:
-            messages.warning(request, "Insufficient Funds")
-            return redirect("core:card-detail", credit_card.card_id)
-        else:
-            messages.warning(request, "Insufficient Funds")
+        try:
+            transfer_service.withdraw_from_card(account, credit_card, amount)
+        except transfer_service.TransferError as e:
+            outcome = "insufficient_funds" if isinstance(e, transfer_service.InsufficientFunds) else "failed"
+            metrics.card_operations.inc(operation="withdraw", outcome=outcome)
+            messages.warning(request, str(e))
             return redirect("core:card-detail", credit_card.card_id)
 
+        metrics.card_operations.inc(operation="withdraw", outcome="completed")
+        messages.success(request, "Withdrawal Successfull")
+        return redirect("core:card-detail", credit_card.card_id)
+
 def delete_card(request, card_id):
     credit_card = CreditCard.objects.get(card_id=card_id, user=request.user)
     
     # New Feature
     # BEfore deleting card, it'll be nice to transfer all the money from the card to the main account balance.
     account = request.user.account
-    
-    if credit_card.amount > 0:
-        account.account_balance += credit_card.amount
-        account.save()
-        
-        Notification.objects.create(
-            user=request.user,
-            notification_type="Deleted Credit Card"
-        )
-        
-        credit_card.delete()
-        messages.success(request, "Card Deleted Successfull")
-        return redirect("account:dashboard")
-    Notification.objects.create(
-        user=request.user,
-        notification_type="Deleted Credit Card"
-    )
-    credit_card.delete()
+    transfer_service.close_card(account, credit_card)
+    metrics.card_operations.inc(operation="delete", outcome="completed")
+
     messages.success(request, "Card Deleted Successfull")
     return redirect("account:dashboard")
 
@@ -90,22 +64,14 @@ def fund_credit_card(request, card_id):
     if request.method == "POST":
         amount = request.POST.get("funding_amount") # 25
         
-        if Decimal(amount) <= account.account_balance:
-            account.account_balance -= Decimal(amount) ## 14,790.00 - 20
-            account.save()
-            
-            credit_card.amount += Decimal(amount)
-            credit_card.save()
-            
-            Notification.objects.create(
-                amount=amount,
-                user=request.user,
-                notification_type="Funded Credit Card"
-            )
-            
-            messages.success(request, "Funding Successfull")
+        try:
+            transfer_service.fund_card(account, credit_card, amount)
+        except transfer_service.TransferError as e:
+            outcome = "insufficient_funds" if isinstance(e, transfer_service.InsufficientFunds) else "failed"
+            metrics.card_operations.inc(operation="fund", outcome=outcome)
+            messages.warning(request, str(e))
             return redirect("core:card-detail", credit_card.card_id)
-        else:
-            messages.warning(request, "Insufficient Funds")
-            return redirect("core:card-detail", credit_card.card_id)
-            
\ No newline at end of file
+
+        metrics.card_operations.inc(operation="fund", outcome="completed")
+        messages.success(request, "Funding Successfull")
+        return redirect("core:card-detail", credit_card.card_id)
@@ -0,0 +1,66 @@
+"""
+Model fields shared by the core models.
+
+``EnumField`` stores one of a fixed set of strings as a small integer. Code
+keeps reading and writing the strings (``transaction.status == "completed"``,
+``filter(status="completed")``, admin choices); only the column holds
+``codes[value]``. Codes are part of the schema: never renumber an existing
+value, only add new ones.
+"""
+from django.core import exceptions
+from django.db import models
+
+
+class EnumField(models.PositiveSmallIntegerField):
+    def __init__(self, *args, codes=None, aliases=None, **kwargs):
+        # ``aliases`` maps legacy spellings (e.g. "none" for "None") to their
+        # canonical value; they are accepted on input, never returned.
+        self.codes = dict(codes or {})
+        self.aliases = dict(aliases or {})
+        self.values = {code: value for value, code in self.codes.items()}
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs["codes"] = self.codes
+        if self.aliases:
+            kwargs["aliases"] = self.aliases
+        return name, path, args, kwargs
+
+    @property
+    def validators(self):
+        # Skip IntegerField's range validators; they would compare the string
+        # value with integers. ``choices`` already bounds the value.
+        return [*self.default_validators, *self._validators]
+
+    def encode(self, value):
+        if value is None or isinstance(value, int):
+            return value
+        value = self.aliases.get(value, value)
+        try:
+            return self.codes[value]
+        except KeyError:
+            raise ValueError(f"{value!r} is not a valid {self.name}.") from None
+
+    def decode(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return self.values.get(value, value)
+
+    def get_prep_value(self, value):
+        if hasattr(value, "resolve_expression"):
+            return value
+        return self.encode(value)
+
+    def from_db_value(self, value, expression, connection):
+        return self.decode(value)
+
+    def to_python(self, value):
+        if isinstance(value, str):
+            value = self.aliases.get(value, value)
+            if value not in self.codes:
+                raise exceptions.ValidationError(
+                    self.error_messages["invalid_choice"], code="invalid_choice", params={"value": value}
+                )
+            return value
+        return self.decode(value)
@@ -0,0 +1,97 @@
+"""
+Idempotency keys for the POSTs that create transactions.
+
+A key comes from the ``Idempotency-Key`` header or the ``idempotency_key``
+field that the transfer and request forms embed. The first request with a key
+stores ``(user, key) -> transaction`` in the same database transaction as the
+new Transaction row; a retry or double-click with the same key gets the
+original transaction back instead of inserting another one. Keys expire after
+``IDEMPOTENCY_KEY_TTL`` seconds and are purged with
+``python manage.py purge_idempotency_keys``.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+
+from core.lru import LRUCache
+from core.models import IdempotencyKey, Transaction
+from paylio.db.transaction import write_transaction
+
+MAX_KEY_LENGTH = 100
+
+# Recently used keys, so replays skip the database.
+key_cache = LRUCache(settings.IDEMPOTENCY_CACHE_SIZE)
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def get_key(request):
+    key = request.headers.get("Idempotency-Key") or request.POST.get("idempotency_key")
+    if not key:
+        return None
+    return key.strip()[:MAX_KEY_LENGTH] or None
+
+
+def lookup(user, key):
+    ttl = settings.IDEMPOTENCY_KEY_TTL
+    transaction_pk = key_cache.get((user.pk, key))
+    if transaction_pk is not None:
+        transaction = Transaction.objects.filter(pk=transaction_pk).select_related("reciever_account").first()
+        if transaction is not None:
+            return transaction
+
+    record = (
+        IdempotencyKey.objects
+        .filter(user=user, key=key, date__gte=timezone.now() - timedelta(seconds=ttl))
+        .select_related("transaction__reciever_account")
+        .first()
+    )
+    if record is None:
+        return None
+    key_cache.set((user.pk, key), record.transaction_id, ttl)
+    return record.transaction
+
+
+def create_once(request, create):
+    """
+    Call ``create()`` (which must insert and return a Transaction) at most once
+    per idempotency key. Returns ``(transaction, replayed)``.
+    """
+    key = get_key(request)
+    if key is None:
+        return create(), False
+
+    existing = lookup(request.user, key)
+    if existing is not None:
+        return existing, True
+
+    # An expired key may still have its row until the next purge.
+    IdempotencyKey.objects.filter(
+        user=request.user, key=key, date__lt=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    ).delete()
+
+    try:
+        with write_transaction():
+            transaction = create()
+            IdempotencyKey.objects.create(user=request.user, key=key, transaction=transaction)
+    except IntegrityError:
+        # A concurrent request with the same key won the race; its insert is
+        # the one that counts and ours has been rolled back.
+        existing = lookup(request.user, key)
+        if existing is None:
+            raise
+        return existing, True
+
+    key_cache.set((request.user.pk, key), transaction.pk, settings.IDEMPOTENCY_KEY_TTL)
+    return transaction, False
+
+
+def purge_expired():
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    deleted, _ = IdempotencyKey.objects.filter(date__lt=cutoff).delete()
+    return deleted
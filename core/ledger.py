@@ -0,0 +1,114 @@
+"""
+Double-entry ledger behind ``Account.account_balance``.
+
+``post`` is called by ``core.transfer_service`` inside the same database
+transaction (and under the same row locks) as the balance update, so the
+ledger and the balances can not drift apart through the application.
+
+A balance at any moment is the newest ``BalanceSnapshot`` taken before it
+plus the short tail of entries written after that snapshot, so statements and
+reconciliation never have to scan an account's whole history. Snapshots are
+taken periodically with ``python manage.py snapshot_balances``.
+"""
+from decimal import Decimal
+
+import shortuuid
+from django.db.models import Case, DecimalField, F, Max, Sum, When
+from django.utils import timezone
+
+from account.models import Account
+from core.models import BalanceSnapshot, LedgerEntry
+from paylio.db.transaction import write_transaction
+
+CENT = Decimal("0.01")
+
+
+def new_reference():
+    return "LED" + shortuuid.ShortUUID().random(length=15)
+
+
+def entries_for(amount, debit_account=None, credit_account=None, debit_card=None, credit_card=None, transaction=None):
+    if (debit_account is None) == (debit_card is None) or (credit_account is None) == (credit_card is None):
+        raise ValueError("A movement needs exactly one debit side and one credit side.")
+
+    reference = new_reference()
+    now = timezone.now()
+    return [
+        LedgerEntry(reference=reference, transaction=transaction, account=debit_account,
+                    credit_card=debit_card, direction="debit", amount=amount, date=now),
+        LedgerEntry(reference=reference, transaction=transaction, account=credit_account,
+                    credit_card=credit_card, direction="credit", amount=amount, date=now),
+    ]
+
+
+def post(amount, **sides):
+    """Write one movement: a debit on the paying side and a credit on the receiving side."""
+    return LedgerEntry.objects.bulk_create(entries_for(amount, **sides))
+
+
+def post_many(movements, batch_size=1000):
+    """Write many movements at once; each item is a dict of ``post`` keyword arguments."""
+    entries = []
+    for movement in movements:
+        movement = dict(movement)
+        entries.extend(entries_for(movement.pop("amount"), **movement))
+    return LedgerEntry.objects.bulk_create(entries, batch_size=batch_size)
+
+
+def signed_amount():
+    return Case(
+        When(direction="credit", then=F("amount")),
+        default=-F("amount"),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def latest_snapshot(account, at=None):
+    snapshots = BalanceSnapshot.objects.filter(account=account)
+    if at is not None:
+        snapshots = snapshots.filter(date__lte=at)
+    return snapshots.order_by("-date", "-id").first()
+
+
+def balance_at(account, at=None):
+    """Account balance at ``at`` (default: now), from the last snapshot plus the entries after it."""
+    snapshot = latest_snapshot(account, at)
+    entries = LedgerEntry.objects.filter(account=account)
+    balance = Decimal("0.00")
+    if snapshot is not None:
+        balance = snapshot.balance
+        entries = entries.filter(id__gt=snapshot.last_entry_id)
+    if at is not None:
+        entries = entries.filter(date__lte=at)
+    tail = entries.aggregate(total=Sum(signed_amount()))["total"]
+    # SQLite sums decimals as floats; round back to cents.
+    return (balance + (tail or 0)).quantize(CENT)
+
+
+def statement(account, start, end):
+    """Opening balance at ``start`` and the entries between ``start`` and ``end``."""
+    opening = balance_at(account, start)
+    entries = LedgerEntry.objects.filter(account=account, date__gt=start, date__lte=end).order_by("id")
+    return opening, entries
+
+
+def take_snapshot(account):
+    with write_transaction():
+        # Postings lock the account row too, so no entry for this account can
+        # be in flight while the snapshot is computed.
+        Account.objects.select_for_update().filter(pk=account.pk).first()
+        last_entry_id = LedgerEntry.objects.filter(account=account).aggregate(last=Max("id"))["last"] or 0
+        previous = latest_snapshot(account)
+        if previous is not None and previous.last_entry_id == last_entry_id:
+            return previous
+        return BalanceSnapshot.objects.create(
+            account=account,
+            balance=balance_at(account),
+            last_entry_id=last_entry_id,
+        )
+
+
+def reconcile(account):
+    """Difference between the stored balance and the ledger balance; zero when they agree."""
+    account_balance = Account.objects.values_list("account_balance", flat=True).get(pk=account.pk)
+    return account_balance - balance_at(account)
@@ -0,0 +1,288 @@
+import io
+import json
+import random
+import re
+import statistics
+import time
+from contextlib import redirect_stdout
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from account.models import Account
+from core import synthetic
+from core.models import CreditCard, Transaction
+from userauths.models import User
+
+FLOWS = ["sign-in", "dashboard", "transfer", "request-settlement", "card"]
+
+IDEMPOTENCY_KEY = re.compile(rb'name="idempotency_key" value="([^"]+)"')
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def latency_summary(timings):
+    timings = sorted(timings)
+    return {
+        "p50": round(statistics.median(timings), 3),
+        "p95": round(percentile(timings, 0.95), 3),
+        "p99": round(percentile(timings, 0.99), 3),
+        "mean": round(statistics.fmean(timings), 3),
+        "max": round(timings[-1], 3),
+    }
+
+
+def idempotency_key(response):
+    """The key embedded in a transfer/request form, as a browser would submit it back."""
+    match = IDEMPOTENCY_KEY.search(response.content)
+    if match is None:
+        raise FlowFailed(f"{response.wsgi_request.path}: no idempotency_key in the form")
+    return match.group(1).decode()
+
+
+class FlowFailed(Exception):
+    pass
+
+
+class Recorder:
+    """Issues requests through the test client and records latency and query count per step."""
+
+    def __init__(self):
+        self.steps = {}
+        self.recording = False
+
+    def request(self, client, step, method, path, data=None, expect=200):
+        # Some views print() their form input; keep that out of the report.
+        with CaptureQueriesContext(connection) as queries, redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            response = getattr(client, method)(path, data or {})
+            elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code != expect:
+            raise FlowFailed(f"{step}: {method.upper()} {path} returned {response.status_code}, expected {expect}")
+        if self.recording:
+            timings, counts = self.steps.setdefault(step, ([], []))
+            timings.append(elapsed)
+            counts.append(len(queries))
+        return response
+
+    def redirect(self, response, step, url_name):
+        """The URL kwargs of the redirect ``response``, which must point at ``url_name``."""
+        match = resolve(response["Location"])
+        if match.view_name != url_name:
+            raise FlowFailed(f"{step}: redirected to {match.view_name}, expected {url_name}")
+        return match.kwargs
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the sign-in, dashboard, transfer, payment request/settlement and card fund/withdraw flows "
+        "in-process through the real URLs and middleware against the configured database, and report p50/p95/p99 "
+        "latency, queries per request and throughput per flow. Needs users from generate_data; the money flows "
+        "really move (small amounts of) money between them, so run it against a copy of anything you care about."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--flows", nargs="+", choices=FLOWS, default=FLOWS)
+        parser.add_argument("--iterations", type=int, default=50, help="Measured runs of each flow.")
+        parser.add_argument("--warmup", type=int, default=5, help="Unmeasured runs of each flow first.")
+        parser.add_argument("--users", type=int, default=20, help="Number of synthetic users the flows rotate through.")
+        parser.add_argument("--amount", default="1.00", help="Amount moved by each money flow.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.amount = Decimal(options["amount"])
+        self.accounts = self.benchmark_accounts(options["users"])
+        # Logged in up front so the first run of a flow does not pay for it.
+        self.clients = {account.pk: self.logged_in_client(account) for account in self.accounts}
+
+        results = {
+            "backend": connection.vendor,
+            "date": timezone.now().isoformat(),
+            "iterations": options["iterations"],
+            "warmup": options["warmup"],
+            "dataset": {"users": User.objects.count(), "transactions": Transaction.objects.count()},
+            "flows": {},
+        }
+        # The test client talks to "testserver".
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for flow in options["flows"]:
+                try:
+                    results["flows"][flow] = self.run_flow(flow, options["iterations"], options["warmup"])
+                except FlowFailed as e:
+                    raise CommandError(f"{flow} flow failed at {e}")
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def benchmark_accounts(self, count):
+        accounts = list(
+            Account.objects.filter(
+                user__email__endswith=f"@{synthetic.EMAIL_DOMAIN}", account_balance__gte=self.amount * 1000
+            ).select_related("user").order_by("user_id")[:count]
+        )
+        if len(accounts) < 2:
+            raise CommandError("Needs at least two funded synthetic users; run `python manage.py generate_data` first.")
+        for account in accounts:
+            if not CreditCard.objects.filter(user=account.user).exists():
+                CreditCard.objects.create(
+                    user=account.user, name=account.user.username, number=4111111, month=12, year=2030, cvv=123,
+                )
+        return accounts
+
+    def logged_in_client(self, account):
+        client = Client()
+        client.force_login(account.user)
+        return client
+
+    def client(self, account):
+        return self.clients[account.pk]
+
+    def pair(self):
+        return self.rng.sample(self.accounts, 2)
+
+    def run_flow(self, flow, iterations, warmup):
+        run = getattr(self, f"flow_{flow.replace('-', '_')}")
+        recorder = Recorder()
+        for _ in range(warmup):
+            run(recorder)
+
+        recorder.recording = True
+        timings = []
+        started = time.perf_counter()
+        for _ in range(iterations):
+            flow_started = time.perf_counter()
+            run(recorder)
+            timings.append((time.perf_counter() - flow_started) * 1000)
+        elapsed = time.perf_counter() - started
+
+        requests = sum(len(step_timings) for step_timings, _ in recorder.steps.values())
+        result = {
+            "flows_per_second": round(iterations / elapsed, 2),
+            "requests_per_second": round(requests / elapsed, 2),
+            "latency_ms": latency_summary(timings),
+            "steps": {
+                step: {
+                    "latency_ms": latency_summary(step_timings),
+                    "queries": {"mean": round(statistics.fmean(counts), 2), "max": max(counts)},
+                }
+                for step, (step_timings, counts) in recorder.steps.items()
+            },
+        }
+
+        latency = result["latency_ms"]
+        self.stdout.write(self.style.SUCCESS(
+            f"{flow}: p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f} ms, p99 {latency['p99']:.2f} ms, "
+            f"{result['flows_per_second']} flows/s, {result['requests_per_second']} requests/s"
+        ))
+        for step, stats in result["steps"].items():
+            self.stdout.write(
+                f"  {step}: p50 {stats['latency_ms']['p50']:.2f} ms, p95 {stats['latency_ms']['p95']:.2f} ms, "
+                f"p99 {stats['latency_ms']['p99']:.2f} ms, {stats['queries']['mean']} queries"
+            )
+        return result
+
+    def flow_sign_in(self, recorder):
+        account = self.rng.choice(self.accounts)
+        client = Client()
+        recorder.request(client, "sign-in page", "get", reverse("userauths:sign-in"))
+        response = recorder.request(
+            client, "sign-in", "post", reverse("userauths:sign-in"),
+            {"username": account.user.username, "password": synthetic.PASSWORD}, expect=302,
+        )
+        recorder.redirect(response, "sign-in", "account:account")
+
+    def flow_dashboard(self, recorder):
+        client = self.client(self.rng.choice(self.accounts))
+        recorder.request(client, "dashboard", "get", reverse("account:dashboard"))
+
+    def flow_transfer(self, recorder):
+        sender, reciever = self.pair()
+        client = self.client(sender)
+        number = reciever.account_number
+        recorder.request(client, "search-account", "post", reverse("core:search-account"), {"account_number": number})
+        page = recorder.request(client, "amount-transfer", "get", reverse("core:amount-transfer", args=[number]))
+        response = recorder.request(
+            client, "amount-transfer-process", "post", reverse("core:amount-transfer-process", args=[number]),
+            {"amount-send": self.amount, "description": "benchmark", "idempotency_key": idempotency_key(page)},
+            expect=302,
+        )
+        transaction_id = recorder.redirect(response, "amount-transfer-process", "core:transfer-confirmation")["transaction_id"]
+        args = [number, transaction_id]
+        recorder.request(client, "transfer-confirmation", "get", reverse("core:transfer-confirmation", args=args))
+        response = recorder.request(
+            client, "transfer-process", "post", reverse("core:transfer-process", args=args),
+            {"pin-number": sender.pin_number}, expect=302,
+        )
+        recorder.redirect(response, "transfer-process", "core:transfer-completed")
+        recorder.request(client, "transfer-completed", "get", reverse("core:transfer-completed", args=args))
+
+    def flow_request_settlement(self, recorder):
+        requester, payer = self.pair()
+        client = self.client(requester)
+        number = payer.account_number
+        recorder.request(
+            client, "request-search-account", "post", reverse("core:request-search-account"), {"account_number": number}
+        )
+        page = recorder.request(client, "amount-request", "get", reverse("core:amount-request", args=[number]))
+        response = recorder.request(
+            client, "amount-request-process", "post", reverse("core:amount-request-process", args=[number]),
+            {"amount-request": self.amount, "description": "benchmark", "idempotency_key": idempotency_key(page)},
+            expect=302,
+        )
+        transaction_id = recorder.redirect(
+            response, "amount-request-process", "core:amount-request-confirmation"
+        )["transaction_id"]
+        args = [number, transaction_id]
+        recorder.request(client, "amount-request-confirmation", "get", reverse("core:amount-request-confirmation", args=args))
+        response = recorder.request(
+            client, "amount-request-final-process", "post", reverse("core:amount-request-final-process", args=args),
+            {"pin-number": requester.pin_number}, expect=302,
+        )
+        recorder.redirect(response, "amount-request-final-process", "core:amount-request-completed")
+        recorder.request(client, "amount-request-completed", "get", reverse("core:amount-request-completed", args=args))
+
+        # The payer settles from their side of the request.
+        client = self.client(payer)
+        args = [requester.account_number, transaction_id]
+        recorder.request(client, "settlement-confirmation", "get", reverse("core:settlement-confirmation", args=args))
+        response = recorder.request(
+            client, "settlement-processing", "post", reverse("core:settlement-processing", args=args),
+            {"pin-number": payer.pin_number}, expect=302,
+        )
+        recorder.redirect(response, "settlement-processing", "core:settlement-completed")
+        recorder.request(client, "settlement-completed", "get", reverse("core:settlement-completed", args=args))
+
+    def flow_card(self, recorder):
+        account = self.rng.choice(self.accounts)
+        client = self.client(account)
+        card_id = CreditCard.objects.filter(user=account.user).values_list("card_id", flat=True).first()
+        recorder.request(client, "card-detail", "get", reverse("core:card-detail", args=[card_id]))
+        response = recorder.request(
+            client, "fund-credit-card", "post", reverse("core:fund-credit-card", args=[card_id]),
+            {"funding_amount": self.amount}, expect=302,
+        )
+        self.expect_success(response, "fund-credit-card")
+        response = recorder.request(
+            client, "withdraw-fund", "post", reverse("core:withdraw_fund", args=[card_id]),
+            {"amount": self.amount}, expect=302,
+        )
+        self.expect_success(response, "withdraw-fund")
+
+    def expect_success(self, response, step):
+        # Card views redirect to the card page either way; the flash message says which.
+        warnings = [str(m) for m in get_messages(response.wsgi_request) if m.level_tag == "warning"]
+        if warnings:
+            raise FlowFailed(f"{step}: {', '.join(warnings)}")
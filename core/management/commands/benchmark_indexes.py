@@ -0,0 +1,99 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core import synthetic
+from core.models import Notification, Transaction
+from userauths.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the dashboard/transaction-list/login queries and print their EXPLAIN plans on the configured "
+        "database (SQLite, PostgreSQL or MySQL). Use --seed to first bulk-load a synthetic dataset (as generate_data "
+        "does). To compare against the plans without the composite Transaction and Notification indexes (migrations "
+        "core 0004_hot_path_indexes and 0007_swap_enum_columns), run again with --without-indexes. Migrating back "
+        "instead would also undo the later schema changes the models rely on."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", action="store_true", help="Bulk-load synthetic users and transactions first.")
+        parser.add_argument("--users", type=int, default=20000)
+        parser.add_argument("--transactions", type=int, default=2000000)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--samples", type=int, default=50, help="Number of users each query is timed for.")
+        parser.add_argument("--analyze", action="store_true", help="Use EXPLAIN ANALYZE where the backend supports it.")
+        parser.add_argument(
+            "--without-indexes", action="store_true",
+            help="Drop the composite Transaction and Notification indexes for this run and rebuild them afterwards.",
+        )
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            synthetic.generate(
+                users=options["users"],
+                transactions=options["transactions"],
+                batch_size=options["batch_size"],
+                log=self.stdout.write,
+            )
+
+        # The synthetic generator gives the lowest user ids the most
+        # transactions, so these are the accounts with the longest histories.
+        heavy = list(
+            Transaction.objects.filter(transaction_type="transfer")
+            .values_list("sender", flat=True)
+            .order_by("sender")
+            .distinct()[:options["samples"]]
+        )
+        users = list(User.objects.filter(pk__in=heavy))
+        if not users:
+            self.stdout.write(self.style.WARNING("No transactions found; run with --seed first."))
+            return
+
+        self.stdout.write(f"Backend: {connection.vendor}, {Transaction.objects.count()} transactions, {User.objects.count()} users\n")
+
+        dropped = []
+        try:
+            if options["without_indexes"]:
+                for model in (Transaction, Notification):
+                    for index in model._meta.indexes:
+                        with connection.schema_editor() as editor:
+                            editor.remove_index(model, index)
+                        dropped.append((model, index))
+            self.time_queries(users, options)
+        finally:
+            for model, index in dropped:
+                with connection.schema_editor() as editor:
+                    editor.add_index(model, index)
+
+    def time_queries(self, users, options):
+        queries = {
+            "sent feed (first page)": lambda u: Transaction.objects.filter(sender=u, transaction_type="transfer").order_by("-date", "-id")[:25],
+            "received feed (first page)": lambda u: Transaction.objects.filter(reciever=u, transaction_type="transfer").order_by("-date", "-id")[:25],
+            "recent completed transfer": lambda u: Transaction.objects.filter(sender=u, transaction_type="transfer", status="completed").order_by("-id")[:1],
+            "sent transfer count": lambda u: Transaction.objects.filter(sender=u, transaction_type="transfer"),
+            "latest notifications": lambda u: Notification.objects.filter(user=u).order_by("-id")[:5],
+            "login username lookup": lambda u: User.objects.filter(username=u.username),
+        }
+
+        for name, build in queries.items():
+            timings = []
+            for user in users:
+                queryset = build(user)
+                started = time.perf_counter()
+                if name == "sent transfer count":
+                    queryset.count()
+                else:
+                    list(queryset)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: p50 {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms, max {timings[-1]:.2f} ms"
+            ))
+            explain_options = {"analyze": True} if options["analyze"] and connection.vendor == "postgresql" else {}
+            self.stdout.write(build(users[0]).explain(**explain_options))
+            self.stdout.write("")
@@ -0,0 +1,107 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# name -> (SQLITE_PRODUCTION, extra stress_transfers arguments)
+MODES = {
+    "stock": ("False", ["--no-wal"]),
+    "stock-wal": ("False", []),
+    "production": ("True", []),
+}
+
+SQLITE_ENGINES = {"django.db.backends.sqlite3", "paylio.db.backends.sqlite3"}
+# Prints the default database a child process resolves, and its replicas.
+DATABASE_PROBE = (
+    "import json; from django.conf import settings; default = settings.DATABASES['default']; "
+    "print(json.dumps([default['ENGINE'], str(default['NAME']), settings.REPLICA_DATABASES]))"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare stress_transfers throughput on SQLite with Django's stock backend (rollback journal, then WAL) "
+        "and with the tuned backend of SQLITE_PRODUCTION (pragmas, BEGIN IMMEDIATE money movements, per-process "
+        "write queue). Each mode runs in a child process on its own copy of a freshly migrated and seeded "
+        "temporary database; the configured database is not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+        parser.add_argument("--accounts", type=int, default=50)
+        parser.add_argument("--operations", type=int, default=2000)
+        parser.add_argument("--processes", type=int, default=2)
+        parser.add_argument("--threads", type=int, default=4, help="Threads per process.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            template = os.path.join(directory, "template.sqlite3")
+            self.stdout.write(f"Preparing a database with {options['accounts']} synthetic accounts...")
+            self.manage(template, "False", "migrate", "--no-input")
+            self.manage(template, "False", "generate_data", "--users", str(options["accounts"]), "--transactions", "0")
+
+            for mode in options["modes"]:
+                production, extra = MODES[mode]
+                path = os.path.join(directory, f"{mode}.sqlite3")
+                shutil.copy(template, path)
+                output = os.path.join(directory, f"{mode}.json")
+                self.stdout.write(f"Running {mode}...")
+                self.manage(
+                    path, production, "stress_transfers", *extra,
+                    "--accounts", str(options["accounts"]), "--operations", str(options["operations"]),
+                    "--processes", str(options["processes"]), "--threads", str(options["threads"]),
+                    "--seed", str(options["seed"]), "--output", output,
+                )
+                with open(output) as f:
+                    results[mode] = json.load(f)
+
+        baseline = results[options["modes"][0]]["ops_per_second"]
+        self.stdout.write("")
+        for mode, result in results.items():
+            latency = result["latency_ms"] or {"p50": 0, "p99": 0}
+            failed = result["outcomes"].get("database error", 0)
+            attempts = sum(result["outcomes"].values())
+            gain = result["ops_per_second"] / baseline if baseline else float("inf")
+            self.stdout.write(self.style.SUCCESS(
+                f"{mode:>10}: {result['ops_per_second']:8.1f} ops/s ({gain:.2f}x), p50 {latency['p50']:.2f} ms, "
+                f"p99 {latency['p99']:.2f} ms, {failed} of {attempts} failed with a database error"
+            ))
+            for error, count in result["errors"].items():
+                self.stdout.write(f"            {count} x {error}")
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def manage(self, path, production, *command):
+        # Set to "" rather than removed: load_dotenv() would fill a missing
+        # variable back in from .env and point the child at the real database.
+        environment = {
+            **os.environ, "SQLITE_PATH": path, "SQLITE_PRODUCTION": production, "PRODUCTION": "False",
+            "DATABASE_URL": "", "REPLICA_DATABASE_URLS": "",
+        }
+        engine, name, replicas = json.loads(self.run_child(environment, "shell", "-c", DATABASE_PROBE).splitlines()[-1])
+        if engine not in SQLITE_ENGINES or name != path or replicas:
+            raise CommandError(
+                f"Refusing to run {command[0]}: the child process would use {engine} {name} "
+                f"(replicas: {replicas or 'none'}), not the scratch database {path}."
+            )
+        return self.run_child(environment, *command)
+
+    def run_child(self, environment, *command):
+        completed = subprocess.run(
+            [sys.executable, "manage.py", *command], cwd=settings.BASE_DIR, env=environment,
+            capture_output=True, text=True,
+        )
+        if completed.returncode:
+            raise CommandError(f"{' '.join(command[:1])} failed:\n{completed.stdout}{completed.stderr}")
+        return completed.stdout
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import synthetic
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generate synthetic users (with account, KYC and opening balance) and transactions with their "
+        f"notifications for load and query testing. Users get @{synthetic.EMAIL_DOMAIN} emails and the password "
+        f"{synthetic.PASSWORD!r}; running again adds to the existing synthetic data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--transactions", type=int, default=1000000)
+        parser.add_argument("--seed", type=int, default=42, help="Same seed and arguments give the same dataset.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per bulk insert; each batch commits.")
+        parser.add_argument("--years", type=int, default=3, help="Transaction dates are spread over this many years.")
+        parser.add_argument("--alpha", type=float, default=1.1, help="Power-law exponent of the sender distribution.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        synthetic.generate(
+            users=options["users"],
+            transactions=options["transactions"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            years=options["years"],
+            alpha=options["alpha"],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.perf_counter() - started:.1f} s."))
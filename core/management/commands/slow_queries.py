@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import slow_queries
+
+
+class Command(BaseCommand):
+    help = (
+        "Summarise the slow-query log (SLOW_QUERY_LOG_FILE and its rotated backups): statements grouped by "
+        "normalised SQL fingerprint, worst first, with the views that ran them and the plan of the slowest call."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--file", default=settings.SLOW_QUERY_LOG_FILE)
+        parser.add_argument("--top", type=int, default=10)
+        parser.add_argument("--sort", choices=["total", "count", "max", "mean"], default="total")
+        parser.add_argument("--no-explain", action="store_true", help="Leave out the EXPLAIN plans.")
+
+    def handle(self, *args, **options):
+        groups = slow_queries.top_offenders(slow_queries.read_log(options["file"]), sort=options["sort"])
+        if not groups:
+            self.stdout.write(self.style.WARNING(f"No slow queries in {options['file']}."))
+            return
+
+        self.stdout.write(f"{sum(group['count'] for group in groups)} slow queries, {len(groups)} distinct statements\n")
+        for rank, group in enumerate(groups[:options["top"]], start=1):
+            example = group["example"]
+            self.stdout.write(self.style.SUCCESS(
+                f"#{rank} {group['fingerprint']}: {group['count']} calls, total {group['total_ms']:.1f} ms, "
+                f"mean {group['mean_ms']:.1f} ms, max {group['max_ms']:.1f} ms"
+            ))
+            self.stdout.write(f"  {group['normalised']}")
+            views = ", ".join(f"{view} ({count})" for view, count in sorted(group["views"].items(), key=lambda v: -v[1]))
+            self.stdout.write(f"  views: {views}")
+            if example.get("stack"):
+                self.stdout.write(f"  called from: {example['stack'][-1]}")
+            if example.get("explain") and not options["no_explain"]:
+                for line in example["explain"].splitlines():
+                    self.stdout.write(f"    {line}")
+            self.stdout.write("")
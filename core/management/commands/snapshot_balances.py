@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from account.models import Account
+from core import ledger
+
+
+class Command(BaseCommand):
+    help = "Take a balance snapshot for every account with new ledger entries. Run periodically (e.g. nightly from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reconcile", action="store_true", help="Also report accounts whose stored balance differs from the ledger.")
+
+    def handle(self, *args, **options):
+        taken = 0
+        drifted = 0
+        for account in Account.objects.select_related("user").order_by("pk").iterator(chunk_size=500):
+            previous = ledger.latest_snapshot(account)
+            snapshot = ledger.take_snapshot(account)
+            if previous is None or snapshot.pk != previous.pk:
+                taken += 1
+
+            if options["reconcile"]:
+                difference = ledger.reconcile(account)
+                if difference:
+                    drifted += 1
+                    self.stdout.write(self.style.WARNING(
+                        f"{account.account_number} ({account.user}): stored balance differs from ledger by {difference}"
+                    ))
+
+        self.stdout.write(self.style.SUCCESS(f"Took {taken} balance snapshot(s)."))
+        if options["reconcile"]:
+            self.stdout.write(self.style.SUCCESS(f"{drifted} account(s) out of balance with the ledger."))
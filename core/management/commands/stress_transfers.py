@@ -0,0 +1,319 @@
+import json
+import multiprocessing
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections
+from django.db.models import Sum
+
+from account.models import Account
+from core import ledger, synthetic, transfer_service
+from core.models import CreditCard, Transaction
+
+OPERATIONS = ["transfer", "settlement", "fund-card", "withdraw-card"]
+# Outcome of a worker thread that stopped on an unexpected error.
+CRASHED = "crashed"
+# Attempts at reads that must get through under load: a worker loading its
+# pool, the monitor's last check.
+RETRY_ATTEMPTS = 50
+RETRY_DELAY = 0.01
+
+
+def pool_accounts(pks):
+    return list(Account.objects.filter(pk__in=pks).select_related("user").order_by("pk"))
+
+
+def pool_cards(pks):
+    return CreditCard.objects.filter(user__account__in=pks)
+
+
+def pool_totals(pks):
+    balances = Account.objects.filter(pk__in=pks).aggregate(total=Sum("account_balance"))["total"] or 0
+    cards = pool_cards(pks).aggregate(total=Sum("amount"))["total"] or 0
+    return (balances + cards).quantize(ledger.CENT)
+
+
+def load_pool(pks):
+    """The pool's accounts and their cards, retried while the database is busy."""
+    for attempt in range(RETRY_ATTEMPTS):
+        try:
+            return pool_accounts(pks), {card.user_id: card for card in pool_cards(pks)}
+        except DatabaseError:
+            if attempt == RETRY_ATTEMPTS - 1:
+                raise
+            time.sleep(RETRY_DELAY)
+
+
+def random_amount(rng):
+    return Decimal(rng.randint(100, 5000)) / 100
+
+
+def transfer(rng, accounts, cards):
+    sender, reciever = rng.sample(accounts, 2)
+    transaction = Transaction.objects.create(
+        user=sender.user, sender=sender.user, reciever=reciever.user,
+        sender_account=sender, reciever_account=reciever,
+        amount=random_amount(rng), status="processing", transaction_type="transfer",
+    )
+    transfer_service.complete_transfer(transaction, sender, reciever)
+
+
+def settlement(rng, accounts, cards):
+    requester, payer = rng.sample(accounts, 2)
+    transaction = Transaction.objects.create(
+        user=requester.user, sender=requester.user, reciever=payer.user,
+        sender_account=requester, reciever_account=payer,
+        amount=random_amount(rng), status="request_sent", transaction_type="request",
+    )
+    transfer_service.settle_request(transaction, payer, requester)
+
+
+def fund_card(rng, accounts, cards):
+    account = rng.choice(accounts)
+    transfer_service.fund_card(account, cards[account.user_id], random_amount(rng))
+
+
+def withdraw_card(rng, accounts, cards):
+    account = rng.choice(accounts)
+    transfer_service.withdraw_from_card(account, cards[account.user_id], random_amount(rng))
+
+
+RUNNERS = {"transfer": transfer, "settlement": settlement, "fund-card": fund_card, "withdraw-card": withdraw_card}
+
+
+def first_line(error):
+    return (str(error).splitlines() or [type(error).__name__])[0][:120]
+
+
+def run_thread(pks, operations, seed, results):
+    """Run ``operations`` random money movements on this thread's own connection."""
+    outcomes = Counter()
+    latencies = []
+    errors = Counter()
+    try:
+        rng = random.Random(seed)
+        accounts, cards = load_pool(pks)
+        for _ in range(operations):
+            operation = rng.choice(OPERATIONS)
+            started = time.perf_counter()
+            try:
+                RUNNERS[operation](rng, accounts, cards)
+            except transfer_service.InsufficientFunds:
+                outcomes["insufficient funds"] += 1
+            except DatabaseError as e:
+                # Lock timeouts, deadlocks and serialization failures: the
+                # whole movement rolled back, which is what is being tested.
+                outcomes["database error"] += 1
+                errors[first_line(e)] += 1
+            else:
+                outcomes[operation] += 1
+                latencies.append((time.perf_counter() - started) * 1000)
+    except Exception as e:
+        # Counted, so the command fails instead of reporting a run with
+        # fewer workers than asked for.
+        outcomes[CRASHED] += 1
+        errors[f"{type(e).__name__}: {first_line(e)}"] += 1
+    finally:
+        connection.close()
+        results.append((outcomes, latencies, errors))
+
+
+def run_process(pks, threads, operations, seed):
+    """Run ``threads`` worker threads and return their combined results."""
+    results = []
+    workers = [
+        threading.Thread(target=run_thread, args=(pks, share, seed + index, results))
+        for index, share in enumerate(split(operations, threads))
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    outcomes, latencies, errors = Counter(), [], Counter()
+    for thread_outcomes, thread_latencies, thread_errors in results:
+        outcomes.update(thread_outcomes)
+        latencies.extend(thread_latencies)
+        errors.update(thread_errors)
+    return outcomes, latencies, errors
+
+
+def run_process_star(args):
+    return run_process(*args)
+
+
+def split(total, parts):
+    return [total // parts + (1 if index < total % parts else 0) for index in range(parts)]
+
+
+class NegativeBalanceMonitor(threading.Thread):
+    """Polls the pool for a negative account balance or card amount while the stress run is going."""
+
+    def __init__(self, pks, interval):
+        super().__init__(daemon=True)
+        self.pks = pks
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.checks = 0
+        self.violations = 0
+        self.errors = 0
+        self.failure = None
+
+    def check(self):
+        """One look at the pool; False if the database was busy and it has to be retried."""
+        try:
+            negative = (
+                Account.objects.filter(pk__in=self.pks, account_balance__lt=0).exists()
+                or pool_cards(self.pks).filter(amount__lt=0).exists()
+            )
+        except DatabaseError:
+            # Locked or busy under the load being generated; try again.
+            self.errors += 1
+            return False
+        self.checks += 1
+        if negative:
+            self.violations += 1
+        return True
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                self.check()
+            # A last look once the workers are done, so even a short run is
+            # checked at least once.
+            for _ in range(RETRY_ATTEMPTS):
+                if self.check():
+                    break
+                time.sleep(RETRY_DELAY)
+        except Exception as e:
+            self.failure = f"{type(e).__name__}: {first_line(e)}"
+        finally:
+            connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent transfers, request settlements and card fund/withdraw operations between a pool of "
+        "synthetic accounts from several threads and processes, report the sustained throughput, and check that "
+        "the pool's account balances plus card amounts are conserved, that nothing went negative and that every "
+        "balance still reconciles with the ledger. Runs against the configured database: SQLite (switched to WAL "
+        "unless --no-wal, which the tuned SQLite backend ignores) or PostgreSQL via DATABASE_URL. It really moves "
+        "money between the pool accounts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--accounts", type=int, default=50, help="Size of the account pool.")
+        parser.add_argument("--operations", type=int, default=5000, help="Total operations over all workers.")
+        parser.add_argument("--processes", type=int, default=2)
+        parser.add_argument("--threads", type=int, default=4, help="Threads per process.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--no-wal", action="store_true", help="Leave SQLite's journal mode alone.")
+        parser.add_argument("--check-interval", type=float, default=0.05, help="Seconds between negative-balance checks.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite" and not options["no_wal"]:
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode=WAL")
+                mode = cursor.fetchone()[0]
+            self.stdout.write(f"SQLite journal mode: {mode}")
+
+        pks = self.account_pool(options["accounts"])
+        before = pool_totals(pks)
+        self.stdout.write(
+            f"Backend: {connection.vendor}; {len(pks)} accounts holding {before}; {options['operations']} operations "
+            f"on {options['processes']} process(es) x {options['threads']} thread(s)"
+        )
+
+        processes, threads = options["processes"], options["threads"]
+        jobs = [
+            (pks, threads, share, options["seed"] + index * threads)
+            for index, share in enumerate(split(options["operations"], processes))
+        ]
+        monitor = NegativeBalanceMonitor(pks, options["check_interval"])
+        # Forked children must open their own connections.
+        connections.close_all()
+        started = time.perf_counter()
+        if processes > 1:
+            with multiprocessing.get_context("fork").Pool(processes) as pool:
+                # Started after the fork so no child inherits its connection.
+                monitor.start()
+                results = pool.map(run_process_star, jobs)
+        else:
+            monitor.start()
+            results = [run_process(*jobs[0])]
+        elapsed = time.perf_counter() - started
+        monitor.stopped.set()
+        monitor.join()
+
+        outcomes, latencies, errors = Counter(), [], Counter()
+        for process_outcomes, process_latencies, process_errors in results:
+            outcomes.update(process_outcomes)
+            latencies.extend(process_latencies)
+            errors.update(process_errors)
+        result = self.report(outcomes, latencies, errors, elapsed)
+
+        after = pool_totals(pks)
+        negative = (
+            Account.objects.filter(pk__in=pks, account_balance__lt=0).count()
+            + pool_cards(pks).filter(amount__lt=0).count()
+        )
+        drift = [account for account in Account.objects.filter(pk__in=pks) if ledger.reconcile(account) != 0]
+        self.stdout.write(
+            f"Pool total before {before}, after {after}; negative balances: {negative} at the end, "
+            f"{monitor.violations} in {monitor.checks} checks during the run ({monitor.errors} retried); "
+            f"accounts off the ledger: {len(drift)}"
+        )
+        result["conserved"] = not (after != before or negative or monitor.violations or drift)
+        result["monitor"] = {"checks": monitor.checks, "retried": monitor.errors, "failure": monitor.failure}
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(result, output, indent=2)
+        if outcomes[CRASHED]:
+            raise CommandError(f"{outcomes[CRASHED]} worker thread(s) crashed.")
+        if monitor.failure or not monitor.checks:
+            raise CommandError(f"The negative-balance monitor did not run: {monitor.failure or 'no checks'}.")
+        if not result["conserved"]:
+            raise CommandError("Money was not conserved.")
+        self.stdout.write(self.style.SUCCESS("Money conserved."))
+
+    def account_pool(self, count):
+        accounts = Account.objects.filter(user__email__endswith=f"@{synthetic.EMAIL_DOMAIN}")
+        missing = count - accounts.count()
+        if missing > 0:
+            synthetic.generate(users=missing)
+        pks = list(accounts.order_by("user_id").values_list("pk", flat=True)[:count])
+        for account in Account.objects.filter(pk__in=pks).select_related("user"):
+            if not CreditCard.objects.filter(user=account.user).exists():
+                CreditCard.objects.create(
+                    user=account.user, name=account.user.username, number=4111111, month=12, year=2030, cvv=123,
+                )
+        return pks
+
+    def report(self, outcomes, latencies, errors, elapsed):
+        completed = sum(outcomes[operation] for operation in OPERATIONS)
+        result = {
+            "committed": completed,
+            "elapsed_s": round(elapsed, 3),
+            "ops_per_second": round(completed / elapsed, 1),
+            "latency_ms": None,
+            "outcomes": dict(outcomes),
+            "errors": dict(errors.most_common(5)),
+        }
+        self.stdout.write(self.style.SUCCESS(
+            f"{completed} operations committed in {elapsed:.2f} s: {completed / elapsed:.1f} ops/s"
+        ))
+        if latencies:
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            result["latency_ms"] = {"p50": round(statistics.median(latencies), 3), "p99": round(p99, 3)}
+            self.stdout.write(f"  latency p50 {statistics.median(latencies):.2f} ms, p99 {p99:.2f} ms")
+        for outcome, count in sorted(outcomes.items()):
+            self.stdout.write(f"  {outcome}: {count}")
+        for error, count in errors.most_common(5):
+            self.stdout.write(f"    {count} x {error}")
+        return result
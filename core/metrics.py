@@ -0,0 +1,386 @@
+"""
+In-process metrics (counters, gauges, fixed-bucket histograms) exposed in the
+Prometheus text format at ``/internal/metrics/``.
+
+With ``METRICS_DIR`` set, every worker process keeps its values in its own
+memory-mapped file in that directory, and the endpoint adds up the files of
+all workers, so a scrape that lands on any gunicorn worker sees the totals
+for the whole server. Counters and histograms of workers that have exited
+stay in the sum; ``gunicorn.conf.py`` deletes their gauges file, and empties
+the directory when the server starts. Without ``METRICS_DIR`` the values
+live in memory and cover just the one process (``runserver``, tests).
+
+The endpoint answers requests carrying ``Authorization: Bearer <token>``
+with the ``METRICS_TOKEN``. Without a token it answers no one, unless
+``METRICS_ALLOW_UNAUTHENTICATED`` is set. Behind the nginx proxy every
+request comes from localhost, so the client address proves nothing.
+"""
+import glob
+import json
+import mmap
+import os
+import secrets
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from core.performance import url_name
+from paylio.db.backends.pool import pool_event
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HEADER = struct.Struct("i4x")
+KEY_LENGTH = struct.Struct("i")
+VALUE = struct.Struct("d")
+INITIAL_FILE_SIZE = 1 << 16
+
+
+class MemoryValues:
+    def __init__(self):
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def add(self, key, amount):
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def set(self, key, value):
+        with self.lock:
+            self.values[key] = value
+
+    def items(self):
+        with self.lock:
+            return list(self.values.items())
+
+
+class MmapValues:
+    """
+    ``key -> float`` in a file another process can read at any time.
+
+    Layout: a header holding the number of bytes in use, then entries of
+    ``[key length][utf-8 key, padded to 8 bytes][double]``. A new entry is
+    written in full before the header is moved past it, so a reader never
+    sees half an entry.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.positions = {}
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, "a+b")
+        if not exists:
+            self.file.truncate(INITIAL_FILE_SIZE)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.used = HEADER.unpack_from(self.map, 0)[0] if exists else HEADER.size
+        for key, _, position in read_entries(self.map, self.used):
+            self.positions[key] = position
+        HEADER.pack_into(self.map, 0, self.used)
+
+    def position(self, key):
+        position = self.positions.get(key)
+        if position is None:
+            encoded = key.encode()
+            padding = -(KEY_LENGTH.size + len(encoded)) % 8
+            size = KEY_LENGTH.size + len(encoded) + padding + VALUE.size
+            while self.used + size > len(self.map):
+                length = len(self.map)
+                self.map.close()
+                self.file.truncate(length * 2)
+                self.map = mmap.mmap(self.file.fileno(), 0)
+            KEY_LENGTH.pack_into(self.map, self.used, len(encoded))
+            self.map[self.used + KEY_LENGTH.size:self.used + KEY_LENGTH.size + len(encoded)] = encoded
+            position = self.used + size - VALUE.size
+            VALUE.pack_into(self.map, position, 0.0)
+            self.used += size
+            HEADER.pack_into(self.map, 0, self.used)
+            self.positions[key] = position
+        return position
+
+    def add(self, key, amount):
+        with self.lock:
+            position = self.position(key)
+            VALUE.pack_into(self.map, position, VALUE.unpack_from(self.map, position)[0] + amount)
+
+    def set(self, key, value):
+        with self.lock:
+            VALUE.pack_into(self.map, self.position(key), value)
+
+    def items(self):
+        with self.lock:
+            return [(key, value) for key, value, _ in read_entries(self.map, self.used)]
+
+
+def read_entries(data, used):
+    offset = HEADER.size
+    while offset < used:
+        length = KEY_LENGTH.unpack_from(data, offset)[0]
+        start = offset + KEY_LENGTH.size
+        key = bytes(data[start:start + length]).decode()
+        position = start + length + (-(KEY_LENGTH.size + length) % 8)
+        yield key, VALUE.unpack_from(data, position)[0], position
+        offset = position + VALUE.size
+
+
+def read_file(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        return []
+    return [(key, value) for key, value, _ in read_entries(data, HEADER.unpack_from(data, 0)[0])]
+
+
+class Storage:
+    """This process's values: one store for counters and histograms, one for gauges."""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        directory = settings.METRICS_DIR
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.totals = MmapValues(os.path.join(directory, f"totals_{self.pid}.db"))
+            self.gauges = MmapValues(os.path.join(directory, f"gauges_{self.pid}.db"))
+        else:
+            self.totals = MemoryValues()
+            self.gauges = MemoryValues()
+
+
+storage_lock = threading.Lock()
+storage = None
+
+
+def get_storage():
+    global storage
+    if storage is None or storage.pid != os.getpid():
+        with storage_lock:
+            if storage is None or storage.pid != os.getpid():
+                # A forked worker gets its own file; the parent's values stay with the parent.
+                storage = Storage()
+    return storage
+
+
+def reset():
+    """Forget this process's values (tests)."""
+    global storage
+    with storage_lock:
+        storage = None
+
+
+def sample_key(metric, suffix, labels):
+    return json.dumps([metric, suffix, sorted(labels.items())])
+
+
+def collect():
+    """``{(metric, suffix, labels): value}`` summed over every worker process."""
+    totals = {}
+
+    def add(items):
+        for key, value in items:
+            metric, suffix, labels = json.loads(key)
+            sample = (metric, suffix, tuple(tuple(pair) for pair in labels))
+            totals[sample] = totals.get(sample, 0.0) + value
+
+    if settings.METRICS_DIR:
+        for path in glob.glob(os.path.join(settings.METRICS_DIR, "*.db")):
+            add(read_file(path))
+    else:
+        add(get_storage().totals.items())
+        add(get_storage().gauges.items())
+    return totals
+
+
+registry = {}
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        registry[name] = self
+
+    def check_labels(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}.")
+        return {name: str(value) for name, value in labels.items()}
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters only go up.")
+        get_storage().totals.add(sample_key(self.name, "", self.check_labels(labels)), amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        get_storage().gauges.set(sample_key(self.name, "", self.check_labels(labels)), value)
+
+    def inc(self, amount=1, **labels):
+        get_storage().gauges.add(sample_key(self.name, "", self.check_labels(labels)), amount)
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        labels = self.check_labels(labels)
+        values = get_storage().totals
+        # Each observation lands in one bucket; exposition makes them cumulative.
+        bucket = next((str(bound) for bound in self.buckets if value <= bound), "+Inf")
+        values.add(sample_key(self.name, "_bucket", {**labels, "le": bucket}), 1)
+        values.add(sample_key(self.name, "_sum", labels), value)
+        values.add(sample_key(self.name, "_count", labels), 1)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_sample(name, labels, value):
+    label_text = ",".join(f'{key}="{escape(label)}"' for key, label in labels)
+    return f"{name}{{{label_text}}} {value!r}" if label_text else f"{name} {value!r}"
+
+
+def render():
+    """Every registered metric in the Prometheus text exposition format (0.0.4)."""
+    samples = collect()
+    by_metric = {}
+    for (metric, suffix, labels), value in samples.items():
+        by_metric.setdefault(metric, []).append((suffix, labels, value))
+
+    lines = []
+    for name, metric in sorted(registry.items()):
+        lines.append(f"# HELP {name} {escape(metric.documentation)}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        metric_samples = by_metric.get(name, [])
+        if metric.kind != "histogram":
+            for suffix, labels, value in sorted(metric_samples):
+                lines.append(format_sample(name + suffix, labels, value))
+            continue
+
+        series = {}
+        for suffix, labels, value in metric_samples:
+            le = dict(labels).get("le")
+            series_labels = tuple(pair for pair in labels if pair[0] != "le")
+            entry = series.setdefault(series_labels, {"buckets": {}, "_sum": 0.0, "_count": 0.0})
+            if suffix == "_bucket":
+                entry["buckets"][le] = value
+            else:
+                entry[suffix] = value
+        for labels, entry in sorted(series.items()):
+            cumulative = 0.0
+            for bound in [*map(str, metric.buckets), "+Inf"]:
+                cumulative += entry["buckets"].get(bound, 0.0)
+                lines.append(format_sample(f"{name}_bucket", (*labels, ("le", bound)), cumulative))
+            lines.append(format_sample(f"{name}_sum", labels, entry["_sum"]))
+            lines.append(format_sample(f"{name}_count", labels, entry["_count"]))
+    return "\n".join(lines) + "\n"
+
+
+def metrics(request):
+    token = settings.METRICS_TOKEN
+    if token:
+        allowed = secrets.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    else:
+        allowed = settings.METRICS_ALLOW_UNAUTHENTICATED
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class MetricsMiddleware:
+    """Latency histogram per URL name and a count of requests in progress."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        requests_in_progress.inc()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            requests_in_progress.dec()
+        view_latency.observe(time.perf_counter() - started, view=url_name(request))
+        return response
+
+
+# Application metrics.
+
+view_latency = Histogram("paylio_view_latency_seconds", "Time to handle a request, per URL name.", labels=("view",))
+requests_in_progress = Gauge("paylio_requests_in_progress", "Requests being handled right now.")
+transfers = Counter("paylio_transfers_total", "Transfer attempts by outcome.", labels=("outcome",))
+payment_requests = Counter("paylio_payment_requests_total", "Payment requests sent.")
+settlements = Counter("paylio_settlements_total", "Payment request settlement attempts by outcome.", labels=("outcome",))
+card_operations = Counter(
+    "paylio_card_operations_total", "Card fund/withdraw/delete attempts by outcome.", labels=("operation", "outcome")
+)
+incorrect_pins = Counter("paylio_incorrect_pins_total", "Incorrect transaction PINs entered, per flow.", labels=("flow",))
+sign_ins = Counter("paylio_sign_ins_total", "Sign-in attempts by outcome.", labels=("outcome",))
+sign_ups = Counter("paylio_sign_ups_total", "Accounts registered.")
+session_loads = Counter(
+    "paylio_session_loads_total", "Sessions loaded, by where they were found (core/sessions.py).", labels=("source",)
+)
+
+# Database connection pools (paylio/db/backends/pool.py).
+
+db_pool_connections = Gauge(
+    "paylio_db_pool_connections", "Pooled database connections, idle or in use.", labels=("alias", "state")
+)
+db_pool_checkouts = Counter("paylio_db_pool_checkouts_total", "Connections handed out by the pool.", labels=("alias",))
+db_pool_wait = Histogram(
+    "paylio_db_pool_wait_seconds", "Time to get a connection from the pool, including opening one.",
+    labels=("alias",), buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0),
+)
+db_pool_opened = Counter("paylio_db_pool_opened_total", "Connections opened by the pool.", labels=("alias",))
+db_pool_closed = Counter(
+    "paylio_db_pool_closed_total", "Pooled connections closed, by reason.", labels=("alias", "reason")
+)
+db_pool_timeouts = Counter(
+    "paylio_db_pool_timeouts_total", "Checkouts that gave up waiting for a free connection.", labels=("alias",)
+)
+
+
+def record_pool_event(sender, alias, event, **values):
+    if event == "connections":
+        db_pool_connections.set(values["idle"], alias=alias, state="idle")
+        db_pool_connections.set(values["in_use"], alias=alias, state="in_use")
+    elif event == "checkout":
+        db_pool_checkouts.inc(alias=alias)
+        db_pool_wait.observe(values["wait"], alias=alias)
+    elif event == "opened":
+        db_pool_opened.inc(alias=alias)
+    elif event == "closed":
+        db_pool_closed.inc(alias=alias, reason=values["reason"])
+    elif event == "timeout":
+        db_pool_timeouts.inc(alias=alias)
+
+
+def connect_signals():
+    pool_event.connect(record_pool_event, dispatch_uid="metrics-db-pool")
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    First of three steps moving Transaction.status, Transaction.transaction_type
+    and Notification.notification_type from strings to small-integer codes:
+    add the code columns (0005), fill them in batches (0006), then drop the
+    string columns and take over their names (0007).
+    """
+
+    dependencies = [
+        ('core', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(model_name='transaction', name='txn_sender_type_date_idx'),
+        migrations.RemoveIndex(model_name='transaction', name='txn_reciever_type_date_idx'),
+        migrations.RemoveIndex(model_name='transaction', name='txn_sender_type_status_idx'),
+        migrations.RemoveIndex(model_name='transaction', name='txn_reciever_type_status_idx'),
+        migrations.AddField(
+            model_name='transaction',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='transaction_type_code',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='notification_type_code',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+from django.db.models import Case, Value, When
+
+from paylio.db.batches import run_in_chunks
+
+BATCH_SIZE = 10000
+
+# Frozen copies of the code tables in core.models at the time of this migration.
+CODES = {
+    ('Transaction', 'status'): {
+        'failed': 0, 'completed': 1, 'pending': 2, 'processing': 3,
+        'request_sent': 4, 'request_settled': 5, 'request_processing': 6,
+    },
+    ('Transaction', 'transaction_type'): {
+        'none': 0, 'transfer': 1, 'recieved': 2, 'withdraw': 3, 'refund': 4, 'request': 5,
+    },
+    ('Notification', 'notification_type'): {
+        'None': 0, 'none': 0, 'Transfer': 1, 'Credit Alert': 2, 'Debit Alert': 3,
+        'Sent Payment Request': 4, 'Recieved Payment Request': 5, 'Funded Credit Card': 6,
+        'Withdrew Credit Card Funds': 7, 'Deleted Credit Card': 8, 'Added Credit Card': 9,
+    },
+}
+
+
+def to_codes(apps, schema_editor):
+    for (model_name, field), codes in CODES.items():
+        model = apps.get_model('core', model_name)
+        code_field = f'{field}_code'
+        # Rows already converted are skipped, so a stopped run resumes.
+        run_in_chunks(model.objects.filter(**{f'{code_field}__isnull': True}), lambda rows: rows.update(**{
+            code_field: Case(*(When(**{field: value}, then=Value(code)) for value, code in codes.items()), default=None)
+        }), batch_size=BATCH_SIZE, label=f'{model_name}.{code_field}')
+        unknown = set(model.objects.filter(**{f'{code_field}__isnull': True}).values_list(field, flat=True).distinct())
+        if unknown:
+            raise ValueError(
+                f'{model_name}.{field} has values without a code: {sorted(map(str, unknown))}. '
+                f'Add them to the code table in core.models and this migration, then migrate again.'
+            )
+
+
+def to_strings(apps, schema_editor):
+    for (model_name, field), codes in CODES.items():
+        model = apps.get_model('core', model_name)
+        values = {}
+        for value, code in codes.items():
+            values.setdefault(code, value)
+        run_in_chunks(model.objects.all(), lambda rows: rows.update(**{
+            field: Case(*(When(**{f'{field}_code': code}, then=Value(value)) for code, value in values.items()))
+        }), batch_size=BATCH_SIZE, label=f'{model_name}.{field}')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0005_enum_code_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_codes, to_strings),
+    ]
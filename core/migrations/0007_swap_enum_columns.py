@@ -0,0 +1,49 @@
+import core.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_fill_enum_code_columns'),
+    ]
+
+    operations = [
+        migrations.RemoveField(model_name='transaction', name='status'),
+        migrations.RemoveField(model_name='transaction', name='transaction_type'),
+        migrations.RemoveField(model_name='notification', name='notification_type'),
+        migrations.RenameField(model_name='transaction', old_name='status_code', new_name='status'),
+        migrations.RenameField(model_name='transaction', old_name='transaction_type_code', new_name='transaction_type'),
+        migrations.RenameField(model_name='notification', old_name='notification_type_code', new_name='notification_type'),
+        migrations.AlterField(
+            model_name='transaction',
+            name='status',
+            field=core.fields.EnumField(choices=[('failed', 'failed'), ('completed', 'completed'), ('pending', 'pending'), ('processing', 'processing'), ('request_sent', 'request_sent'), ('request_settled', 'request settled'), ('request_processing', 'request processing')], codes={'failed': 0, 'completed': 1, 'pending': 2, 'processing': 3, 'request_sent': 4, 'request_settled': 5, 'request_processing': 6}, default='pending'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='transaction_type',
+            field=core.fields.EnumField(choices=[('transfer', 'Transfer'), ('recieved', 'Recieved'), ('withdraw', 'Withdraw'), ('refund', 'Refund'), ('request', 'Request'), ('none', 'None')], codes={'none': 0, 'transfer': 1, 'recieved': 2, 'withdraw': 3, 'refund': 4, 'request': 5}, default='none'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=core.fields.EnumField(aliases={'none': 'None'}, choices=[('None', 'None'), ('Transfer', 'Transfer'), ('Credit Alert', 'Credit Alert'), ('Debit Alert', 'Debit Alert'), ('Sent Payment Request', 'Sent Payment Request'), ('Recieved Payment Request', 'Recieved Payment Request'), ('Funded Credit Card', 'Funded Credit Card'), ('Withdrew Credit Card Funds', 'Withdrew Credit Card Funds'), ('Deleted Credit Card', 'Deleted Credit Card'), ('Added Credit Card', 'Added Credit Card')], codes={'None': 0, 'Transfer': 1, 'Credit Alert': 2, 'Debit Alert': 3, 'Sent Payment Request': 4, 'Recieved Payment Request': 5, 'Funded Credit Card': 6, 'Withdrew Credit Card Funds': 7, 'Deleted Credit Card': 8, 'Added Credit Card': 9}, default='None'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['sender', 'transaction_type', '-date', '-id'], name='txn_sender_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['reciever', 'transaction_type', '-date', '-id'], name='txn_reciever_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['sender', 'transaction_type', 'status', '-id'], name='txn_sender_type_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['reciever', 'transaction_type', 'status', '-id'], name='txn_reciever_type_status_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+from paylio.db.batches import run_in_chunks
+
+
+def opening_snapshots(apps, schema_editor):
+    # Balances that existed before the ledger have no entries behind them, so
+    # record them as each account's opening snapshot.
+    Account = apps.get_model('account', 'Account')
+    BalanceSnapshot = apps.get_model('core', 'BalanceSnapshot')
+
+    def snapshot(accounts):
+        BalanceSnapshot.objects.bulk_create([
+            BalanceSnapshot(account_id=account_id, balance=balance, last_entry_id=0)
+            for account_id, balance in accounts.values_list('id', 'account_balance')
+        ])
+
+    # Accounts with a snapshot are done, and accounts with ledger entries
+    # already have a balance the ledger explains, so a stopped run resumes.
+    pending = Account.objects.filter(balance_snapshots__isnull=True, ledgerentry__isnull=True)
+    run_in_chunks(pending, snapshot)
+
+
+class Migration(migrations.Migration):
+    # Data only: each chunk of snapshots commits separately.
+    atomic = False
+
+    dependencies = [
+        ('account', '0006_fill_access_codes'),
+        ('core', '0007_swap_enum_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(opening_snapshots, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,10 @@
 from django.db import models
+from django.utils import timezone
 from userauths.models import User 
 from account.models import Account
 from shortuuid.django_fields import ShortUUIDField
+from core.fields import EnumField
+from paylio.db.dirty import DirtyFieldsMixin
 
 
 TRANSACTION_TYPE = (
@@ -48,7 +51,45 @@ NOTIFICATION_TYPE = (
 
 )
 
-class Transaction(models.Model):
+# Column values of the EnumFields below. Never renumber; append new values.
+TRANSACTION_TYPE_CODES = {
+    "none": 0,
+    "transfer": 1,
+    "recieved": 2,
+    "withdraw": 3,
+    "refund": 4,
+    "request": 5,
+}
+
+TRANSACTION_STATUS_CODES = {
+    "failed": 0,
+    "completed": 1,
+    "pending": 2,
+    "processing": 3,
+    "request_sent": 4,
+    "request_settled": 5,
+    "request_processing": 6,
+}
+
+NOTIFICATION_TYPE_CODES = {
+    "None": 0,
+    "Transfer": 1,
+    "Credit Alert": 2,
+    "Debit Alert": 3,
+    "Sent Payment Request": 4,
+    "Recieved Payment Request": 5,
+    "Funded Credit Card": 6,
+    "Withdrew Credit Card Funds": 7,
+    "Deleted Credit Card": 8,
+    "Added Credit Card": 9,
+}
+
+LEDGER_DIRECTION = (
+    ("debit", "Debit"),
+    ("credit", "Credit"),
+)
+
+class Transaction(DirtyFieldsMixin, models.Model):
     transaction_id = ShortUUIDField(unique=True, length=15, max_length=20, prefix="TRN")
    
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="user")
@@ -61,12 +102,23 @@ class Transaction(models.Model):
     reciever_account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, related_name="reciever_account")
     sender_account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, related_name="sender_account")
 
-    status = models.CharField(choices=TRANSACTION_STATUS, max_length=100, default="pending")
-    transaction_type = models.CharField(choices=TRANSACTION_TYPE, max_length=100, default="none")
+    status = EnumField(choices=TRANSACTION_STATUS, codes=TRANSACTION_STATUS_CODES, default="pending")
+    transaction_type = EnumField(choices=TRANSACTION_TYPE, codes=TRANSACTION_TYPE_CODES, default="none")
 
     date = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now_add=False, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Dashboard / transaction-list feeds (core.transaction.TRANSACTION_FEEDS),
+            # paginated newest first on (date, id).
+            models.Index(fields=["sender", "transaction_type", "-date", "-id"], name="txn_sender_type_date_idx"),
+            models.Index(fields=["reciever", "transaction_type", "-date", "-id"], name="txn_reciever_type_date_idx"),
+            # "Recent transfer" lookups that also filter on status.
+            models.Index(fields=["sender", "transaction_type", "status", "-id"], name="txn_sender_type_status_idx"),
+            models.Index(fields=["reciever", "transaction_type", "status", "-id"], name="txn_reciever_type_status_idx"),
+        ]
+
     def __str__(self):
         try:
             return f"{self.user}"
@@ -74,7 +126,7 @@ class Transaction(models.Model):
             return f"Transaction"
 
 
-class CreditCard(models.Model):
+class CreditCard(DirtyFieldsMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     card_id = ShortUUIDField(unique=True, length=5, max_length=20, prefix="CARD", alphabet="1234567890")
 
@@ -97,7 +149,9 @@ class CreditCard(models.Model):
 
 class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
-    notification_type = models.CharField(max_length=100, choices=NOTIFICATION_TYPE, default="none")
+    notification_type = EnumField(
+        choices=NOTIFICATION_TYPE, codes=NOTIFICATION_TYPE_CODES, aliases={"none": "None"}, default="None"
+    )
     amount = models.IntegerField(default=0)
     is_read = models.BooleanField(default=False)
     date = models.DateTimeField(auto_now_add=True)
@@ -106,6 +160,91 @@ class Notification(models.Model):
     class Meta:
         ordering = ["-date"]
         verbose_name_plural = "Notification"
+        indexes = [
+            models.Index(fields=["user", "-id"], name="notif_user_id_idx"),
+            models.Index(fields=["user", "-date"], name="notif_user_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.notification_type}"
+
+
+class IdempotencyKey(models.Model):
+    """Maps a client-supplied key to the transaction its first request created."""
+    key = models.CharField(max_length=100)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE)
+    date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="unique_idempotency_key"),
+        ]
+        indexes = [
+            models.Index(fields=["date"], name="idempotency_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.key}"
+
+
+class LedgerEntryQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        raise TypeError("Ledger entries are append-only.")
+
+    def delete(self):
+        raise TypeError("Ledger entries are append-only.")
+
+
+class LedgerEntry(models.Model):
+    """
+    One leg of a money movement. Every movement is written as exactly one
+    debit and one credit sharing the same ``reference``; rows are never
+    updated or deleted. Entries belong to either an account or a credit card.
+    """
+    reference = ShortUUIDField(length=15, max_length=20, prefix="LED")
+    transaction = models.ForeignKey(Transaction, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True)
+    account = models.ForeignKey(Account, on_delete=models.PROTECT, null=True, blank=True)
+    # Cards and payment requests can be deleted, their history can not.
+    credit_card = models.ForeignKey(CreditCard, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True)
+    direction = models.CharField(choices=LEDGER_DIRECTION, max_length=6)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    date = models.DateTimeField(default=timezone.now)
+
+    objects = LedgerEntryQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["id"]
+        verbose_name_plural = "Ledger Entries"
+        indexes = [
+            models.Index(fields=["account", "id"], name="ledger_account_id_idx"),
+            models.Index(fields=["reference"], name="ledger_reference_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise TypeError("Ledger entries are append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise TypeError("Ledger entries are append-only.")
+
+    def __str__(self):
+        return f"{self.reference} - {self.direction} {self.amount}"
+
+
+class BalanceSnapshot(models.Model):
+    """Account balance after every ledger entry up to and including ``last_entry_id``."""
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name="balance_snapshots")
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    last_entry_id = models.BigIntegerField(default=0)
+    date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-date"]
+        indexes = [
+            models.Index(fields=["account", "-date"], name="snapshot_account_date_idx"),
+        ]
 
     def __str__(self):
-        return f"{self.user} - {self.notification_type}"
\ No newline at end of file
+        return f"{self.account} - {self.balance}"
@@ -0,0 +1,69 @@
+"""
+Denormalised unread-notification counter on ``User.unread_notifications``.
+
+Single-row creates and deletes adjust the counter with an ``F()`` update;
+any other save of a Notification (e.g. flipping ``is_read`` in the admin)
+recounts the user's unread rows. ``bulk_create`` bypasses signals, so
+callers that bulk-insert notifications call ``add_unread`` themselves.
+"""
+from collections import Counter
+
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+
+from core.models import Notification
+from userauths.models import User
+
+
+def add_unread(notifications):
+    counts = Counter(n.user_id for n in notifications if n.user_id is not None and not n.is_read)
+    # One UPDATE per distinct increment; a bulk payout is mostly ones.
+    users_by_count = {}
+    for user_id, count in counts.items():
+        users_by_count.setdefault(count, []).append(user_id)
+    for count, user_ids in users_by_count.items():
+        User.objects.filter(pk__in=user_ids).update(unread_notifications=F("unread_notifications") + count)
+
+
+def recount(user_id):
+    unread = Notification.objects.filter(user_id=user_id, is_read=False).count()
+    User.objects.filter(pk=user_id).update(unread_notifications=unread)
+
+
+def recount_all(notifications=None, chunk_size=500):
+    """Set the counter from scratch for every user with unread rows in ``notifications``."""
+    notifications = Notification.objects.all() if notifications is None else notifications
+    unread = (
+        notifications.filter(is_read=False, user__isnull=False)
+        .values_list("user_id")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    users_by_count = {}
+    for user_id, count in unread.iterator(chunk_size=1000):
+        users_by_count.setdefault(count, []).append(user_id)
+    for count, user_ids in users_by_count.items():
+        for start in range(0, len(user_ids), chunk_size):
+            User.objects.filter(pk__in=user_ids[start:start + chunk_size]).update(unread_notifications=count)
+
+
+def notification_saved(sender, instance, created, **kwargs):
+    if instance.user_id is None:
+        return
+    if created:
+        add_unread([instance])
+    else:
+        recount(instance.user_id)
+
+
+def notification_deleted(sender, instance, **kwargs):
+    if instance.user_id is not None and not instance.is_read:
+        User.objects.filter(pk=instance.user_id).update(
+            unread_notifications=Greatest(F("unread_notifications") - 1, 0)
+        )
+
+
+def connect_signals():
+    post_save.connect(notification_saved, sender=Notification, dispatch_uid="unread-notification-saved")
+    post_delete.connect(notification_deleted, sender=Notification, dispatch_uid="unread-notification-deleted")
@@ -0,0 +1,81 @@
+"""
+Keyset (cursor) pagination on ``(date, id)``.
+
+Pages are fetched with ``WHERE (date, id) < (cursor.date, cursor.id) ORDER BY
+date DESC, id DESC LIMIT n``, so a page deep in a long history costs the same
+as the first one, unlike ``OFFSET``. The cursor handed to clients is an opaque
+URL-safe token; an invalid or tampered token just yields the first page.
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# Bounds of a signed 64-bit primary key; a larger one overflows the driver.
+MAX_PK = 2 ** 63
+
+
+def encode_cursor(obj):
+    raw = json.dumps([obj.date.isoformat(), obj.pk], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        date, pk = json.loads(raw)
+        date = parse_datetime(date)
+        pk = int(pk)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if date is None or not 0 < pk < MAX_PK:
+        return None
+    return date, pk
+
+
+class KeysetPage:
+    def __init__(self, items, cursor, next_cursor):
+        self.items = items
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        # Keyset pages only link forward; "previous" goes back to the newest page.
+        return bool(self.cursor)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def paginate(queryset, cursor=None, per_page=None):
+    """Return the page of ``queryset`` (newest first) that follows ``cursor``."""
+    per_page = per_page or settings.TRANSACTIONS_PER_PAGE
+    queryset = queryset.order_by("-date", "-id")
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        date, pk = position
+        queryset = queryset.filter(Q(date__lt=date) | Q(date=date, id__lt=pk))
+
+    items = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = encode_cursor(items[-1])
+    return KeysetPage(items, cursor if position is not None else None, next_cursor)
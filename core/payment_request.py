@@ -1,24 +1,17 @@
 from django.shortcuts import render, redirect
 from account.models import Account
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
 from django.contrib import messages
 from decimal import Decimal
 from core.models import Notification, Transaction
+from core import account_resolver, transfer_service, idempotency, metrics
 from decimal import Decimal
 
 @login_required
 def SearchUsersRequest(request):
-    account = Account.objects.all() ## all the account in my db
     query = request.POST.get("account_number") ## <input name="account_number">
+    account = account_resolver.resolve(query)
 
-    if query:
-        account = account.filter(
-            Q(account_number=query)|
-            Q(account_id=query)
-
-        ).distinct()
-    
     context = {
         "account": account,
         "query": query,
@@ -29,6 +22,7 @@ def AmountRequest(request, account_number):
     account = Account.objects.get(account_number=account_number)
     context = {
         "account": account,
+        "idempotency_key": idempotency.new_key(),
     }
     return render(request, "payment_request/amount-request.html", context)
 
@@ -45,7 +39,7 @@ def AmountRequestProcess(request, account_number):
         amount = request.POST.get("amount-request")
         description = request.POST.get("description")
 
-        new_request = Transaction.objects.create(
+        new_request, _ = idempotency.create_once(request, lambda: Transaction.objects.create(
             user=request.user,
             amount=amount,
             description=description,
@@ -58,10 +52,9 @@ def AmountRequestProcess(request, account_number):
 
             status="request_processing",
             transaction_type="request"
-        )
-        new_request.save()
+        ))
         transaction_id = new_request.transaction_id
-        return redirect("core:amount-request-confirmation", account.account_number, transaction_id)
+        return redirect("core:amount-request-confirmation", new_request.reciever_account.account_number, transaction_id)
     else:
         messages.warning(request, "Error Occured, try again later.")
         return redirect("account:dashboard")
@@ -100,9 +93,11 @@ def AmountRequestFinalProcess(request, account_number, transaction_id):
                 notification_type="Sent Payment Request"
             )
 
+            metrics.payment_requests.inc()
             messages.success(request, "Your payment request have been sent successfully.")
             return redirect("core:amount-request-completed", account.account_number, transaction.transaction_id)
         else:
+            metrics.incorrect_pins.inc(flow="request")
             messages.error(request, "Incorrect Pin.")
             return redirect("core:amount-request-confirmation", account.account_number, transaction.transaction_id)
 
@@ -147,22 +142,23 @@ def settlement_processing(request, account_number, transaction_id):
     if request.method == "POST":
         pin_number = request.POST.get("pin-number")
         if pin_number == request.user.account.pin_number:
-            if sender_account.account_balance <= 0 or sender_account.account_balance < transaction.amount:
+            try:
+                transfer_service.settle_request(transaction, sender_account, account)
+            except transfer_service.InsufficientFunds:
+                metrics.settlements.inc(outcome="insufficient_funds")
                 messages.warning(request, "Insufficient Funds, fund your account and try again.")
+                return redirect("core:settlement-confirmation", account.account_number, transaction.transaction_id)
+            except transfer_service.TransferError as e:
+                metrics.settlements.inc(outcome="failed")
+                messages.warning(request, str(e))
+                return redirect("account:dashboard")
             else:
-                sender_account.account_balance -= transaction.amount
-                sender_account.save()
-
-                account.account_balance += transaction.amount
-                account.save()
-
-                transaction.status = "request_settled"
-                transaction.save()
-
+                metrics.settlements.inc(outcome="completed")
                 messages.success(request, f"Settled to {account.user.kyc.full_name} was successfull.")
                 return redirect("core:settlement-completed", account.account_number, transaction.transaction_id)
 
         else:
+            metrics.incorrect_pins.inc(flow="settlement")
             messages.warning(request, "Incorrect Pin")
             return redirect("core:settlement-confirmation", account.account_number, transaction.transaction_id)
     else:
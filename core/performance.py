@@ -0,0 +1,226 @@
+"""
+Opt-in per-request performance instrumentation (``PERFORMANCE_INSTRUMENTATION=True``).
+
+``PerformanceMiddleware`` sits first in ``MIDDLEWARE`` and measures the whole
+request: SQL query count and time (through connection execute wrappers),
+template render time and cache hits/misses. ``ViewTimingMiddleware`` sits
+last and times just the view. The numbers are sent back as a
+``Server-Timing`` header, which browser dev tools show next to the request,
+and logged as one JSON line on the ``core.performance`` logger.
+
+A ``PERFORMANCE_PROFILE_RATE`` fraction of requests also runs under cProfile,
+with the stats dumped to ``PERFORMANCE_PROFILE_DIR/<url name>/`` for
+``python -m pstats`` or snakeviz.
+
+With the setting off both middlewares remove themselves at startup
+(``MiddlewareNotUsed``), so they cost nothing.
+"""
+import cProfile
+import functools
+import json
+import logging
+import os
+import random
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template
+from django.utils.module_loading import import_string
+
+from core.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Metrics of the request being handled in this thread/task, if it is measured.
+current = ContextVar("performance_metrics", default=None)
+
+MISSING = object()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.view_time = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - started
+
+
+def record_cache_lookup(hit):
+    metrics = current.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+def timed_render(render):
+    @functools.wraps(render)
+    def wrapper(self, *args, **kwargs):
+        metrics = current.get()
+        # Only the outermost render is timed; a template rendered from inside
+        # another one is already part of its time.
+        if metrics is None or metrics.template_depth:
+            return render(self, *args, **kwargs)
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+            metrics.template_depth -= 1
+    return wrapper
+
+
+def counted_cache_get(get):
+    @functools.wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        value = get(self, key, MISSING, version=version)
+        record_cache_lookup(value is not MISSING)
+        return default if value is MISSING else value
+    return wrapper
+
+
+def counted_cache_get_many(get_many):
+    @functools.wraps(get_many)
+    def wrapper(self, keys, version=None):
+        keys = list(keys)
+        found = get_many(self, keys, version=version)
+        metrics = current.get()
+        if metrics is not None:
+            metrics.cache_hits += len(found)
+            metrics.cache_misses += len(keys) - len(found)
+        return found
+    return wrapper
+
+
+def counted_lru_get(get):
+    @functools.wraps(get)
+    def wrapper(self, key):
+        value = get(self, key)
+        record_cache_lookup(value is not None)
+        return value
+    return wrapper
+
+
+def patch(cls, name, decorator):
+    method = getattr(cls, name)
+    if not getattr(method, "performance_instrumented", False):
+        wrapped = decorator(method)
+        wrapped.performance_instrumented = True
+        setattr(cls, name, wrapped)
+
+
+def instrument():
+    """Wrap template rendering and cache lookups; they only record while a request is measured."""
+    patch(Template, "render", timed_render)
+    for cache in settings.CACHES.values():
+        backend = import_string(cache["BACKEND"])
+        patch(backend, "get", counted_cache_get)
+        patch(backend, "get_many", counted_cache_get_many)
+    patch(LRUCache, "get", counted_lru_get)
+
+
+def url_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match and match.view_name else "unresolved"
+
+
+def server_timing(metrics, total):
+    entries = [
+        f'sql;dur={metrics.sql_time * 1000:.2f};desc="{metrics.queries} queries"',
+        f"tpl;dur={metrics.template_time * 1000:.2f}",
+        f'cache;desc="{metrics.cache_hits} hits, {metrics.cache_misses} misses"',
+        f"total;dur={total * 1000:.2f}",
+    ]
+    if metrics.view_time is not None:
+        entries.insert(0, f"view;dur={metrics.view_time * 1000:.2f}")
+    return ", ".join(entries)
+
+
+def dump_profile(profiler, request):
+    directory = os.path.join(settings.PERFORMANCE_PROFILE_DIR, url_name(request).replace(":", "."))
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{random.getrandbits(32):08x}.prof")
+    profiler.dump_stats(path)
+    return path
+
+
+class PerformanceMiddleware:
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instrument()
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        profiler = None
+        if settings.PERFORMANCE_PROFILE_RATE and random.random() < settings.PERFORMANCE_PROFILE_RATE:
+            profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.sql_wrapper))
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            current.reset(token)
+        total = time.perf_counter() - started
+
+        response["Server-Timing"] = server_timing(metrics, total)
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "url_name": url_name(request),
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 2),
+            "view_ms": None if metrics.view_time is None else round(metrics.view_time * 1000, 2),
+            "sql_ms": round(metrics.sql_time * 1000, 2),
+            "queries": metrics.queries,
+            "template_ms": round(metrics.template_time * 1000, 2),
+            "cache_hits": metrics.cache_hits,
+            "cache_misses": metrics.cache_misses,
+            "profile": dump_profile(profiler, request) if profiler is not None else None,
+        }))
+        return response
+
+
+class ViewTimingMiddleware:
+    """Goes last in ``MIDDLEWARE``, so what it wraps is the view (and its template response)."""
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = current.get()
+        if metrics is None:
+            return self.get_response(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        metrics.view_time = time.perf_counter() - started
+        return response
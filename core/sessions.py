@@ -0,0 +1,238 @@
+"""
+Session engine (``SESSION_ENGINE = "core.sessions"``): database sessions
+with two caches in front.
+
+A request's session is looked up in:
+
+1. this worker's LRU, which holds ``SESSION_LOCAL_CACHE_SIZE`` sessions for
+   ``SESSION_LOCAL_CACHE_TTL`` seconds;
+2. the ``SESSION_CACHE_ALIAS`` cache, if one is configured. It must be shared
+   by all workers (Redis, memcached): with a per-process cache, a session
+   deleted on one worker would live on in the others;
+3. the ``django_session`` table, which stays the copy of record.
+
+A sign-out deletes the session from the table, the shared cache and the LRU
+of the worker that handled it. Other workers may still serve the session from
+their LRU for up to ``SESSION_LOCAL_CACHE_TTL`` seconds, but only to reads:
+``SessionMiddleware`` makes state-changing (POST, PUT, ...) requests skip the
+LRU, so a signed-out session can not be used to change anything.
+
+Saving a session whose data has not changed (``SESSION_SAVE_EVERY_REQUEST``,
+or a view re-setting the same value) does not rewrite its row. Only its
+expiry is pushed back, and only once it has moved by more than
+``SESSION_TOUCH_INTERVAL`` seconds. Those expiry updates are queued and
+written in bulk by ``SessionMiddleware`` at the end of the first request
+after ``SESSION_TOUCH_INTERVAL`` seconds, or when the gunicorn worker exits
+(``gunicorn.conf.py``). ``last_login`` is still written at sign-in, by
+Django: the password-reset token is derived from it.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.contrib.sessions.middleware import SessionMiddleware as DjangoSessionMiddleware
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.db import DatabaseError, transaction as db_transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
+
+from core import metrics
+from core.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "core.sessions"
+# Most rows one bulk touch UPDATE covers.
+TOUCH_BATCH_SIZE = 500
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+# session key -> (serialized data, expire date)
+local_sessions = LRUCache(settings.SESSION_LOCAL_CACHE_SIZE)
+
+
+class Touches:
+    """Pending ``pk -> timestamp`` updates of one column, written in bulk."""
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flushed = time.monotonic()
+
+    def due(self):
+        return bool(self.pending) and (
+            len(self.pending) >= TOUCH_BATCH_SIZE
+            or time.monotonic() - self.flushed >= settings.SESSION_TOUCH_INTERVAL
+        )
+
+    def add(self, pk, value):
+        with self.lock:
+            self.pending[pk] = value
+            due = self.due()
+        if due:
+            self.flush()
+
+    def flush_if_due(self):
+        if self.due():
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = list(self.pending.items()), {}
+            self.flushed = time.monotonic()
+        output_field = self.model._meta.get_field(self.field)
+        for start in range(0, len(pending), TOUCH_BATCH_SIZE):
+            batch = pending[start:start + TOUCH_BATCH_SIZE]
+            try:
+                # A savepoint when called inside a view's transaction.
+                with db_transaction.atomic():
+                    self.model.objects.filter(pk__in=[pk for pk, _ in batch]).update(**{self.field: Case(
+                        *[When(pk=pk, then=Value(value)) for pk, value in batch], output_field=output_field,
+                    )})
+            except DatabaseError:
+                # Timestamps only; losing a batch is better than failing a request.
+                logger.exception("Could not write %d %s touches", len(batch), self.field)
+
+    def clear(self):
+        with self.lock:
+            self.pending.clear()
+
+
+session_expiry = Touches(Session, "expire_date")
+
+
+def flush_touches():
+    session_expiry.flush()
+
+
+def forget():
+    # A forked worker starts cold; its parent writes its own pending touches.
+    local_sessions.clear()
+    session_expiry.clear()
+
+
+os.register_at_fork(after_in_child=forget)
+
+
+class SessionMiddleware(DjangoSessionMiddleware):
+    """
+    Django's session middleware, plus: state-changing requests read the
+    session past this worker's LRU, and queued expiry touches that are due
+    are written at the end of each request, on its database connection.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        if request.method not in SAFE_METHODS and isinstance(request.session, SessionStore):
+            request.session.use_local = False
+
+    def process_response(self, request, response):
+        response = super().process_response(request, response)
+        session_expiry.flush_if_due()
+        return response
+
+
+class SessionStore(DBStore):
+    def __init__(self, session_key=None):
+        alias = settings.SESSION_CACHE_ALIAS
+        self._cache = caches[alias] if alias else None
+        # (serialized data, expire date) as last read or written.
+        self.stored = None
+        self.use_local = True
+        super().__init__(session_key)
+
+    @classmethod
+    def cache_key_for(cls, session_key):
+        return KEY_PREFIX + session_key
+
+    def serialize(self, data):
+        return self.serializer().dumps(data)
+
+    def load(self):
+        self.stored = self.fetch() if self.session_key else None
+        if self.stored is None:
+            return {}
+        return self.serializer().loads(self.stored[0])
+
+    def fetch(self):
+        entry = local_sessions.get(self.session_key) if self.use_local else None
+        if entry is not None and entry[1] > timezone.now():
+            metrics.session_loads.inc(source="local")
+            return entry
+
+        entry = None
+        if self._cache is not None:
+            try:
+                entry = self._cache.get(self.cache_key_for(self.session_key))
+            except Exception:
+                # Some backends (memcached) reject odd keys; fall back to the database.
+                entry = None
+        if entry is not None:
+            metrics.session_loads.inc(source="cache")
+        else:
+            session = self._get_session_from_db()
+            if session is None:
+                metrics.session_loads.inc(source="missing")
+                return None
+            metrics.session_loads.inc(source="database")
+            entry = (self.serialize(self.decode(session.session_data)), session.expire_date)
+            self.share(entry)
+        self.remember(entry)
+        return entry
+
+    def remember(self, entry):
+        ttl = min(settings.SESSION_LOCAL_CACHE_TTL, self.get_expiry_age(expiry=entry[1]))
+        if ttl > 0:
+            local_sessions.set(self.session_key, entry, ttl)
+
+    def share(self, entry):
+        if self._cache is not None:
+            self._cache.set(self.cache_key_for(self.session_key), entry, self.get_expiry_age(expiry=entry[1]))
+
+    def exists(self, session_key):
+        if session_key and self._cache is not None and self.cache_key_for(session_key) in self._cache:
+            return True
+        return super().exists(session_key)
+
+    def save(self, must_create=False):
+        if must_create or self.session_key is None or self.stored is None:
+            return self.write(must_create)
+        data = self._get_session(no_load=False)
+        if self.serialize(data) != self.stored[0]:
+            return self.write(must_create)
+
+        expire_date = self.get_expiry_date()
+        if (expire_date - self.stored[1]).total_seconds() >= settings.SESSION_TOUCH_INTERVAL:
+            self.stored = (self.stored[0], expire_date)
+            self.share(self.stored)
+            self.remember(self.stored)
+            session_expiry.add(self.session_key, expire_date)
+
+    def write(self, must_create):
+        super().save(must_create)
+        if self.session_key is None:
+            return
+        self.stored = (self.serialize(self._get_session(no_load=must_create)), self.get_expiry_date())
+        self.share(self.stored)
+        self.remember(self.stored)
+
+    def delete(self, session_key=None):
+        super().delete(session_key)
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        local_sessions.delete(session_key)
+        if self._cache is not None:
+            self._cache.delete(self.cache_key_for(session_key))
+
+    def flush(self):
+        self.clear()
+        self.delete(self.session_key)
+        self._session_key = None
+        self.stored = None
@@ -0,0 +1,212 @@
+"""
+Slow-query log (``SLOW_QUERY_THRESHOLD_MS`` > 0).
+
+Every database connection gets an execute wrapper that times each statement.
+One that takes longer than the threshold is written as a JSON line to
+``SLOW_QUERY_LOG_FILE``, a size-rotated log. Each line holds:
+
+- the SQL, its normalised fingerprint and a hash of the parameters;
+- the URL name of the request that ran it;
+- the application frames of the stack;
+- the backend's EXPLAIN plan.
+
+``python manage.py slow_queries`` aggregates the log by fingerprint.
+
+Several worker processes may write to the same file. A line can be lost
+when two of them rotate it at the same moment, which is acceptable for a
+diagnostic log.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import traceback
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections, transaction as db_transaction
+from django.utils import timezone
+
+from core.performance import url_name
+
+logger = logging.getLogger(__name__)
+
+current_request = ContextVar("slow_query_request", default=None)
+# Set while the recorder runs its own EXPLAIN, which must not be recorded.
+explaining = ContextVar("slow_query_explaining", default=False)
+
+EXPLAINABLE = ("select", "with", "update", "delete", "insert")
+STACK_FRAMES = 8
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalise(sql):
+    """SQL with literals and placeholders replaced by ``?`` and ``IN`` lists collapsed."""
+    sql = sql.replace("%s", "?")
+    sql = STRING.sub("?", sql)
+    sql = NUMBER.sub("?", sql)
+    sql = IN_LIST.sub("IN (...)", sql)
+    return WHITESPACE.sub(" ", sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalise(sql).encode()).hexdigest()[:16]
+
+
+def params_hash(params):
+    return hashlib.sha1(repr(params).encode()).hexdigest()[:16]
+
+
+def application_stack():
+    """The innermost frames that belong to this project rather than to Django or the standard library."""
+    base = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(base) and "site-packages" not in frame.filename
+        and not frame.filename.endswith("slow_queries.py")
+    ]
+    return [f"{os.path.relpath(f.filename, base)}:{f.lineno} in {f.name}" for f in frames[-STACK_FRAMES:]]
+
+
+def explain(connection, sql, params):
+    if not sql.lstrip().lower().startswith(EXPLAINABLE):
+        return None
+    token = explaining.set(True)
+    try:
+        # A savepoint, so a failed EXPLAIN can not abort the surrounding
+        # PostgreSQL transaction.
+        with db_transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f"EXPLAIN failed: {e}"
+    finally:
+        explaining.reset(token)
+
+
+def log():
+    """The slow-query logger, writing to the current ``SLOW_QUERY_LOG_FILE``."""
+    path = os.path.abspath(settings.SLOW_QUERY_LOG_FILE)
+    if not any(getattr(handler, "baseFilename", None) == path for handler in logger.handlers):
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        logger.addHandler(RotatingFileHandler(
+            path, maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES, backupCount=settings.SLOW_QUERY_LOG_BACKUPS,
+        ))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def record(connection, sql, params, many, duration):
+    request = current_request.get()
+    entry = {
+        "date": timezone.now().isoformat(),
+        "database": connection.alias,
+        "vendor": connection.vendor,
+        "duration_ms": round(duration * 1000, 2),
+        "fingerprint": fingerprint(sql),
+        "normalised": normalise(sql),
+        "sql": sql,
+        "params_hash": params_hash(params),
+        "many": many,
+        "view": url_name(request) if request is not None else None,
+        "path": request.path if request is not None else None,
+        "stack": application_stack(),
+        "explain": None if many else explain(connection, sql, params),
+    }
+    log().info(json.dumps(entry, default=str))
+
+
+def recorder(execute, sql, params, many, context):
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - started
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if threshold and duration * 1000 >= threshold and not explaining.get():
+        try:
+            record(context["connection"], sql, params, many, duration)
+        except Exception:
+            # The log is diagnostic; never fail the query because of it.
+            logger.exception("Could not record a slow query")
+    return result
+
+
+def install(sender=None, connection=None, **kwargs):
+    """``connection_created`` receiver: put the recorder on the connection (once)."""
+    if recorder not in connection.execute_wrappers:
+        connection.execute_wrappers.append(recorder)
+
+
+def install_all():
+    for connection in connections.all():
+        install(connection=connection)
+
+
+class SlowQueryMiddleware:
+    """Makes the current request (and so its URL name) available to the recorder."""
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_THRESHOLD_MS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            current_request.reset(token)
+
+
+def read_log(path):
+    """Entries from ``path`` and its rotated backups, oldest file first."""
+    paths = [f"{path}.{index}" for index in range(settings.SLOW_QUERY_LOG_BACKUPS, 0, -1)] + [path]
+    for log_path in paths:
+        if not os.path.exists(log_path):
+            continue
+        with open(log_path) as log:
+            for line in log:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+
+def top_offenders(entries, sort="total"):
+    """Entries grouped by fingerprint, worst first."""
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(entry["fingerprint"], {
+            "fingerprint": entry["fingerprint"],
+            "normalised": entry["normalised"],
+            "count": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "views": {},
+            "example": entry,
+        })
+        group["count"] += 1
+        group["total_ms"] += entry["duration_ms"]
+        view = entry.get("view") or "(no request)"
+        group["views"][view] = group["views"].get(view, 0) + 1
+        if entry["duration_ms"] >= group["max_ms"]:
+            group["max_ms"] = entry["duration_ms"]
+            # Keep the slowest call's SQL, stack and plan as the example.
+            group["example"] = entry
+    for group in groups.values():
+        group["mean_ms"] = group["total_ms"] / group["count"]
+    key = {"total": "total_ms", "count": "count", "max": "max_ms", "mean": "mean_ms"}[sort]
+    return sorted(groups.values(), key=lambda group: group[key], reverse=True)
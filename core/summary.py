@@ -0,0 +1,121 @@
+"""
+Per-user dashboard summary, kept in Django's cache.
+
+Everything the dashboard shows that is derived from transactions, cards and
+notifications is computed once and cached under the user's id: balance,
+completed sent/received totals and counts, this month's sent total, the first page of each
+transaction feed, the user's cards and the unread notification count. The
+entry is dropped after every write that could change it (see ``invalidate``
+and ``connect_signals``), so a warm dashboard never touches the transaction
+table.
+
+The cache must be shared by all workers (``CACHE_BACKEND``,
+``CACHE_LOCATION``): with a per-process memory cache one worker's
+invalidation is not seen by the others. A summary that is going to be
+cached is built from the primary: built from a lagging replica, it would
+keep the state from before the write that invalidated it. Without
+``DASHBOARD_SUMMARY_CACHE`` (the default unless ``CACHE_BACKEND`` is set)
+the summary is built for every request.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction as db_transaction
+from django.db.models import Count, Sum
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from account.models import Account
+from core.models import CreditCard, Notification, Transaction
+from core.pagination import paginate
+from core.transaction import TRANSACTION_FEEDS, transaction_feed, with_parties
+from paylio.db import routers
+
+SUMMARY_VERSION = 2
+CENT = Decimal("0.01")
+
+
+def cache():
+    alias = settings.DASHBOARD_SUMMARY_CACHE
+    return caches[alias] if alias else None
+
+
+def summary_key(user_id):
+    return f"dashboard-summary:v{SUMMARY_VERSION}:{user_id}"
+
+
+def transfer_totals(user, side, since=None):
+    transfers = Transaction.objects.filter(**{side: user}, transaction_type="transfer", status="completed")
+    if since is not None:
+        transfers = transfers.filter(date__gte=since)
+    totals = transfers.aggregate(total=Sum("amount"), count=Count("id"))
+    # SQLite sums decimals as floats, dropping the cents' trailing zero.
+    return Decimal(totals["total"] or 0).quantize(CENT), totals["count"]
+
+
+def month_start():
+    return timezone.localtime().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def build_summary(user):
+    sent_total, sent_count = transfer_totals(user, "sender")
+    received_total, received_count = transfer_totals(user, "reciever")
+    month_sent_total, _ = transfer_totals(user, "sender", since=month_start())
+    # Read with the balance rather than from ``user``, which may come from a replica.
+    balance, unread_notifications = Account.objects.values_list(
+        "account_balance", "user__unread_notifications"
+    ).get(user=user)
+    return {
+        "balance": balance,
+        "sent_total": sent_total,
+        "sent_count": sent_count,
+        "month_sent_total": month_sent_total,
+        "received_total": received_total,
+        "received_count": received_count,
+        "feeds": {
+            feed: paginate(with_parties(transaction_feed(user, feed)), per_page=settings.DASHBOARD_TRANSACTIONS)
+            for feed in TRANSACTION_FEEDS
+        },
+        "cards": list(CreditCard.objects.filter(user=user).order_by("-id")),
+        "unread_notifications": unread_notifications,
+    }
+
+
+def get_summary(user):
+    summary_cache = cache()
+    if summary_cache is None:
+        return build_summary(user)
+    key = summary_key(user.pk)
+    summary = summary_cache.get(key)
+    if summary is None:
+        with routers.use_primary():
+            summary = build_summary(user)
+        summary_cache.set(key, summary, settings.DASHBOARD_SUMMARY_TIMEOUT)
+    return summary
+
+
+def invalidate(*user_ids):
+    keys = [summary_key(user_id) for user_id in set(user_ids) if user_id is not None]
+    if keys and cache() is not None:
+        # After commit, so a concurrent dashboard render can not cache the
+        # pre-transfer state again between the delete and the commit.
+        db_transaction.on_commit(lambda: cache().delete_many(keys))
+
+
+def transaction_changed(sender, instance, **kwargs):
+    invalidate(instance.user_id, instance.sender_id, instance.reciever_id)
+
+
+def owner_changed(sender, instance, **kwargs):
+    invalidate(instance.user_id)
+
+
+def connect_signals():
+    # Covers single-row saves and deletes from anywhere, including the admin.
+    # Queryset .update() and bulk_create() bypass these, so the transfer
+    # service calls ``invalidate`` itself.
+    for signal in (post_save, post_delete):
+        signal.connect(transaction_changed, sender=Transaction, dispatch_uid=f"summary-transaction-{signal is post_save}")
+        for model in (CreditCard, Notification, Account):
+            signal.connect(owner_changed, sender=model, dispatch_uid=f"summary-{model.__name__}-{signal is post_save}")
@@ -0,0 +1,258 @@
+"""
+Synthetic users, accounts, KYC rows, transactions and notifications for load
+and query testing (``python manage.py generate_data``).
+
+Everything is written with bulk inserts in committed batches, with model
+signals switched off, and drawn from one ``random.Random(seed)``, so the same
+arguments always produce the same dataset (apart from the random
+``transaction_id``/``nid`` codes). Senders follow a power law (a few
+accounts send most of the money), amounts are log-normal and dates run
+forward over the requested number of years, so ids and dates grow together
+as they do in production.
+"""
+import random
+import secrets
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction as db_transaction
+from django.db.models import signals
+from django.utils import timezone
+
+from account import identifiers
+from account.models import KYC, Account
+from core.models import BalanceSnapshot, Notification, Transaction
+from core.notifications import recount_all
+from userauths.models import User
+
+EMAIL_DOMAIN = "synthetic.example.com"
+PASSWORD = "Synthetic12345!"
+
+FIRST_NAMES = ["Ada", "Ben", "Chloe", "David", "Ema", "Femi", "Grace", "Hiro", "Ines", "Jon", "Kemi", "Liam", "Mia", "Noah", "Olu", "Priya"]
+LAST_NAMES = ["Adams", "Bello", "Chen", "Diaz", "Evans", "Fofana", "Garcia", "Hughes", "Ito", "Jones", "Khan", "Lopez", "Musa", "Novak", "Okafor", "Patel"]
+CITIES = [("US", "VA", "Roanoke"), ("US", "NY", "New York"), ("NG", "LA", "Lagos"), ("GB", "LND", "London"), ("IN", "MH", "Mumbai")]
+
+TRANSACTION_COLUMNS = [
+    "transaction_id", "user", "sender", "reciever", "sender_account", "reciever_account",
+    "amount", "status", "transaction_type", "description", "date", "updated",
+]
+NOTIFICATION_COLUMNS = ["user", "notification_type", "amount", "is_read", "date", "nid"]
+NID_ALPHABET = "abcdefghijklmnopqrstuvxyz"
+
+# (transaction_type, status) -> weight
+TRANSACTION_MIX = {
+    ("transfer", "completed"): 72,
+    ("transfer", "processing"): 4,
+    ("transfer", "failed"): 4,
+    ("request", "request_sent"): 8,
+    ("request", "request_settled"): 10,
+    ("request", "request_processing"): 2,
+}
+
+
+@contextmanager
+def signals_suppressed():
+    """Disconnect every model signal receiver for the duration of the block."""
+    model_signals = [signals.pre_save, signals.post_save, signals.pre_delete, signals.post_delete, signals.m2m_changed]
+    saved = [(signal, signal.receivers) for signal in model_signals]
+    for signal in model_signals:
+        signal.receivers = []
+        signal.sender_receivers_cache.clear()
+    try:
+        yield
+    finally:
+        for signal, receivers in saved:
+            signal.receivers = receivers
+            signal.sender_receivers_cache.clear()
+
+
+def insert_rows(model, columns, rows):
+    """
+    Multi-row ``INSERT`` of already database-ready tuples. Skips building a
+    model instance per row, which is most of bulk_create's cost at this
+    volume.
+    """
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    names = ", ".join(quote(model._meta.get_field(name).column) for name in columns)
+    row_sql = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    # Stay well under every backend's bind-parameter limit (SQLite: 32766).
+    per_statement = max(1, 20000 // len(columns))
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), per_statement):
+            chunk = rows[start:start + per_statement]
+            cursor.execute(
+                f"INSERT INTO {table} ({names}) VALUES {', '.join([row_sql] * len(chunk))}",
+                [value for row in chunk for value in row],
+            )
+
+
+class Generator:
+    def __init__(self, seed=42, batch_size=5000, years=3, alpha=1.1, log=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.years = years
+        self.alpha = alpha
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        # A per-run prefix keeps reruns from colliding on transaction_id; the
+        # increasing suffix appends to the unique index instead of scattering
+        # across it.
+        self.run = secrets.token_hex(3)
+
+    def users(self, count):
+        """Create ``count`` users with an active account, a KYC row and an opening balance snapshot."""
+        offset = User.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}").count()
+        password = make_password(PASSWORD)
+        created = 0
+        while created < count:
+            size = min(self.batch_size, count - created)
+            numbers = range(offset + created, offset + created + size)
+            with db_transaction.atomic():
+                self.user_batch(numbers, password)
+            created += size
+            self.log(f"  users {created}/{count}")
+
+    def user_batch(self, numbers, password):
+        rng = self.rng
+        users = User.objects.bulk_create([
+            User(username=f"synth{n}", email=f"synth{n}@{EMAIL_DOMAIN}", password=password, date_joined=self.now)
+            for n in numbers
+        ])
+        if users[0].pk is None:
+            # Backends that can not return ids from a bulk insert (MySQL).
+            ids = dict(User.objects.filter(email__in=[u.email for u in users]).values_list("email", "pk"))
+            for user in users:
+                user.pk = ids[user.email]
+
+        account_numbers = identifiers.allocate_many("account_number", len(users))
+        account_ids = identifiers.allocate_many("account_id", len(users))
+        try:
+            access_codes = identifiers.allocate_many("access_code", len(users))
+        except identifiers.IdentifierSpaceExhausted:
+            # Only a million access codes exist; the field is optional.
+            access_codes = [None] * len(users)
+
+        accounts = Account.objects.bulk_create([
+            Account(
+                user=user,
+                account_number=account_numbers[i],
+                account_id=account_ids[i],
+                access_code=access_codes[i],
+                account_balance=Decimal(int(rng.lognormvariate(7, 1.5) * 100)) / 100,
+                account_status="active",
+                kyc_submitted=True,
+                kyc_confirmed=True,
+            )
+            for i, user in enumerate(users)
+        ])
+        kycs = []
+        for account in accounts:
+            country, state, city = rng.choice(CITIES)
+            kycs.append(KYC(
+                user=account.user,
+                account=account,
+                full_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                marrital_status=rng.choice(["single", "married", "other"]),
+                gender=rng.choice(["male", "female"]),
+                identity_type=rng.choice(["national_id_card", "drivers_licence", "international_passport"]),
+                date_of_birth=self.now - timedelta(days=rng.randint(18 * 365, 80 * 365)),
+                country=country, state=state, city=city,
+                mobile=f"+1{rng.randint(2000000000, 9999999999)}",
+                fax="",
+            ))
+        KYC.objects.bulk_create(kycs)
+        # Balances that do not come from ledger entries are opening snapshots,
+        # as in core/migrations/0008_opening_snapshots.py, so reconciliation stays clean.
+        BalanceSnapshot.objects.bulk_create([
+            BalanceSnapshot(account=account, balance=account.account_balance, last_entry_id=0) for account in accounts
+        ])
+
+    def transactions(self, count):
+        """Create ``count`` transactions between synthetic accounts, plus their notifications."""
+        account_pk = Account._meta.pk
+        pool = [
+            (account_pk.get_db_prep_value(pk, connection), user_id)
+            for pk, user_id in Account.objects.filter(user__email__endswith=f"@{EMAIL_DOMAIN}")
+            .order_by("user_id")
+            .values_list("pk", "user_id")
+        ]
+        if len(pool) < 2:
+            raise ValueError("Generate at least two users before generating transactions.")
+        # Rank r sends with weight 1 / (r + 1) ** alpha; cumulative weights
+        # make each draw O(log n).
+        sender_weights = list(accumulate(1.0 / (rank + 1) ** self.alpha for rank in range(len(pool))))
+        kinds = list(TRANSACTION_MIX)
+        kind_weights = list(accumulate(TRANSACTION_MIX.values()))
+        start = self.now - timedelta(days=365 * self.years)
+        span = (self.now - start).total_seconds()
+
+        created = 0
+        while created < count:
+            size = min(self.batch_size, count - created)
+            with db_transaction.atomic():
+                self.transaction_batch(pool, sender_weights, kinds, kind_weights, start, span, created, size, count)
+            created += size
+            self.log(f"  transactions {created}/{count}")
+
+    def transaction_batch(self, pool, sender_weights, kinds, kind_weights, start, span, offset, size, count):
+        rng = self.rng
+        ops = connection.ops
+        status_field = Transaction._meta.get_field("status")
+        type_field = Transaction._meta.get_field("transaction_type")
+        notification_type_field = Notification._meta.get_field("notification_type")
+        codes = {kind: (type_field.encode(kind[0]), status_field.encode(kind[1])) for kind in kinds}
+        alerts = {
+            name: notification_type_field.encode(name)
+            for name in ("Credit Alert", "Debit Alert", "Sent Payment Request", "Recieved Payment Request")
+        }
+
+        transactions = []
+        notifications = []
+        senders = rng.choices(pool, cum_weights=sender_weights, k=size)
+        for i, (sender_account, sender) in enumerate(senders):
+            reciever_account, reciever = rng.choice(pool)
+            while reciever == sender:
+                reciever_account, reciever = rng.choice(pool)
+            kind = rng.choices(kinds, cum_weights=kind_weights)[0]
+            transaction_type, status = codes[kind]
+            amount = Decimal(int(min(rng.lognormvariate(3.5, 1.3), 250000) * 100) + 1) / 100
+            date = start + timedelta(seconds=span * (offset + i + rng.random()) / count)
+            db_date = ops.adapt_datetimefield_value(date)
+            transactions.append((
+                f"TRN{self.run}{offset + i:09d}", sender, sender, reciever, sender_account, reciever_account,
+                ops.adapt_decimalfield_value(amount, 12, 2), status, transaction_type,
+                "Synthetic " + kind[0], db_date, db_date,
+            ))
+            # Anything older than a month has been read.
+            is_read = (self.now - date).days > 30
+            if kind[1] == "completed":
+                parties = ((reciever, alerts["Credit Alert"]), (sender, alerts["Debit Alert"]))
+            elif kind[0] == "request":
+                parties = ((sender, alerts["Sent Payment Request"]), (reciever, alerts["Recieved Payment Request"]))
+            else:
+                parties = ()
+            for user_id, notification_type in parties:
+                nid = "".join(rng.choices(NID_ALPHABET, k=10))
+                notifications.append((user_id, notification_type, int(amount), is_read, db_date, nid))
+
+        insert_rows(Transaction, TRANSACTION_COLUMNS, transactions)
+        insert_rows(Notification, NOTIFICATION_COLUMNS, notifications)
+
+    def unread_counters(self):
+        recount_all(Notification.objects.filter(user__email__endswith=f"@{EMAIL_DOMAIN}"))
+
+
+def generate(users=0, transactions=0, seed=42, batch_size=5000, years=3, alpha=1.1, log=None):
+    generator = Generator(seed=seed, batch_size=batch_size, years=years, alpha=alpha, log=log)
+    with signals_suppressed():
+        if users:
+            generator.log(f"Creating {users} users, accounts and KYC rows...")
+            generator.users(users)
+        if transactions:
+            generator.log(f"Creating {transactions} transactions and notifications...")
+            generator.transactions(transactions)
+            generator.unread_counters()
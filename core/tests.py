@@ -1,3 +1,1140 @@
-from django.test import TestCase
+import base64
+import contextvars
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections, transaction as db_transaction
+from django.db.models import F, Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from account.models import KYC, Account
+from core import account_resolver, idempotency, ledger, metrics, pagination, sessions, slow_queries, summary, synthetic, transfer_service
+from core.management.commands import benchmark_sqlite, stress_transfers
+from core.models import BalanceSnapshot, CreditCard, IdempotencyKey, LedgerEntry, Notification, Transaction
+from core.transaction import transaction_feed
+from paylio.db import batches, routers
+from paylio.db.backends import pool as db_pool
+from paylio.db.backends.sqlite3.base import DatabaseWrapper as TunedSQLite
+from paylio.db.transaction import write_transaction
+from userauths.models import User
+
+
+def make_user(username):
+    user = User.objects.create_user(username=username, email=f"{username}@example.com", password="Test12345!")
+    KYC.objects.create(
+        user=user, account=user.account, full_name=f"{username} person", marrital_status="single",
+        gender="female", identity_type="national_id_card", date_of_birth=timezone.now(),
+        country="US", state="VA", city="Roanoke", mobile="000", fax="000",
+    )
+    return user
+
+
+def make_history(user, rows):
+    """``rows`` transfers and requests in each direction between ``user`` and fresh counterparties."""
+    for i in range(rows):
+        other = make_user(f"{user.username}-peer{i}")
+        for sender, reciever in ((user, other), (other, user)):
+            for transaction_type, status in (("transfer", "completed"), ("request", "request_sent")):
+                Transaction.objects.create(
+                    user=sender, sender=sender, reciever=reciever,
+                    sender_account=sender.account, reciever_account=reciever.account,
+                    amount=Decimal("10.00"), transaction_type=transaction_type, status=status,
+                )
+        CreditCard.objects.create(user=user, name="Card", number=4111, month=1, year=2030, cvv=123)
+        Notification.objects.create(user=user, notification_type="Credit Alert", amount=10)
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Pages must render in a fixed number of queries however many rows they
+    show; a template reaching through a relation per row breaks this.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def assertQueryBudget(self, url, budget):
+        counts = []
+        for rows in (1, 8):
+            user = make_user(f"owner{rows}")
+            make_history(user, rows)
+            self.client.force_login(user)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1], f"{url} query count grows with the number of rows: {counts}")
+        self.assertLessEqual(counts[1], budget, f"{url} ran {counts[1]} queries, budget is {budget}")
+
+
+class TransactionListQueryTests(QueryBudgetTestCase):
+    def test_transaction_list_query_budget(self):
+        self.assertQueryBudget(reverse("core:transactions"), budget=7)
+
+
+@override_settings(DASHBOARD_SUMMARY_CACHE="default")
+class DashboardSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user("owner")
+        make_history(self.user, 2)
+        self.client.force_login(self.user)
+
+    def test_warm_dashboard_skips_transaction_table(self):
+        self.client.get(reverse("account:dashboard"))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("account:dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q["sql"] for q in queries if "core_transaction" in q["sql"]])
+
+    def test_dashboard_figures(self):
+        Account.objects.filter(user=self.user).update(account_balance=Decimal("123.45"))
+        Transaction.objects.filter(sender=self.user, transaction_type="transfer").update(amount=Decimal("7.50"))
+        last_month = Transaction.objects.filter(sender=self.user, transaction_type="transfer").first()
+        Transaction.objects.filter(pk=last_month.pk).update(date=summary.month_start() - timedelta(days=1))
+        for _ in range(2):
+            content = self.client.get(reverse("account:dashboard")).content.decode()
+            # Only this month's completed transfers count as spending.
+            self.assertRegex(content, r"Monthly Spending</p>\s*<h3[^>]*>\s*\$7\.50\s*</h3>")
+            # As before the summary cache: the account balance.
+            self.assertEqual(len(re.findall(r"Total Received</p>\s*<(?:h3|p)[^>]*>\s*\$123\.45", content)), 2)
+
+    def test_transfer_invalidates_both_parties(self):
+        other = make_user("other")
+        Account.objects.filter(pk=self.user.account.pk).update(account_balance=Decimal("100.00"))
+        before = summary.get_summary(self.user)
+        summary.get_summary(other)
+
+        transaction = Transaction.objects.create(
+            user=self.user, sender=self.user, reciever=other,
+            sender_account=self.user.account, reciever_account=other.account,
+            amount=Decimal("25.00"), transaction_type="transfer", status="processing",
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            transfer_service.complete_transfer(transaction, self.user.account, other.account)
+
+        after = summary.get_summary(self.user)
+        self.assertEqual(after["balance"], Decimal("75.00"))
+        self.assertEqual(after["sent_count"], before["sent_count"] + 1)
+        self.assertEqual(summary.get_summary(other)["received_total"], Decimal("25.00"))
+
+    def test_cached_summary_is_built_from_the_primary(self):
+        pinned = []
+        build = summary.build_summary
+
+        def record(user):
+            pinned.append(routers.pinned.get())
+            return build(user)
+
+        with mock.patch.object(summary, "build_summary", side_effect=record):
+            summary.get_summary(self.user)
+            with self.settings(DASHBOARD_SUMMARY_CACHE=""):
+                summary.get_summary(self.user)
+        # Only the uncached summary may read from a replica.
+        self.assertEqual(pinned, [True, False])
+
+    @override_settings(DASHBOARD_SUMMARY_CACHE="")
+    def test_without_a_shared_cache_every_dashboard_is_fresh(self):
+        self.client.get(reverse("account:dashboard"))
+        Account.objects.filter(user=self.user).update(account_balance=Decimal("42.00"))
+        self.assertEqual(summary.get_summary(self.user)["balance"], Decimal("42.00"))
+        self.assertIsNone(cache.get(summary.summary_key(self.user.pk)))
+
+
+class AccountResolverTests(TestCase):
+    def setUp(self):
+        account_resolver.card_cache.clear()
+        self.user = make_user("payee")
+        self.account = Account.objects.get(user=self.user)
+
+    def test_empty_query_resolves_nothing_without_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(account_resolver.resolve(""), [])
+            self.assertEqual(account_resolver.resolve(None), [])
+
+    def test_exact_lookups_are_cached(self):
+        for query in (self.account.account_number, self.account.account_id.lower(), self.account.access_code):
+            [card] = account_resolver.resolve(query)
+            self.assertEqual(card.account_number, self.account.account_number)
+            self.assertEqual(card.full_name, "payee person")
+            with self.assertNumQueries(0):
+                account_resolver.resolve(query)
+        self.assertEqual(account_resolver.resolve("2170000000"), [])
+
+    def test_kyc_change_drops_cached_card(self):
+        account_resolver.resolve(self.account.account_number)
+        self.user.kyc.full_name = "renamed"
+        self.user.kyc.save()
+        [card] = account_resolver.resolve(self.account.account_number)
+        self.assertEqual(card.full_name, "renamed")
+
+
+class NotificationContextTests(TestCase):
+    def setUp(self):
+        self.user = make_user("reader")
+        self.client.force_login(self.user)
+
+    def test_marketing_page_runs_no_notification_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("core:payments"))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q["sql"] for q in queries if "core_notification" in q["sql"]])
+
+    @override_settings(LATEST_NOTIFICATIONS=3)
+    def test_badge_counts_the_notifications_shown(self):
+        for _ in range(4):
+            Notification.objects.create(user=self.user, notification_type="Credit Alert", amount=10)
+        response = self.client.get(reverse("account:dashboard"))
+        self.assertContains(response, '<span class="mdr">3</span>')
+
+    def test_unread_counter_follows_notifications(self):
+        first = Notification.objects.create(user=self.user, notification_type="Credit Alert", amount=10)
+        Notification.objects.create(user=self.user, notification_type="Debit Alert", amount=5)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notifications, 2)
+
+        first.is_read = True
+        first.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notifications, 1)
+
+        Notification.objects.filter(is_read=False).get().delete()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notifications, 0)
+
+
+class EnumFieldTests(TestCase):
+    def test_strings_in_python_small_integers_in_the_column(self):
+        user = make_user("enum")
+        transaction = Transaction.objects.create(
+            user=user, sender=user, reciever=user, transaction_type="request", status="request_sent",
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT status, transaction_type FROM core_transaction WHERE id = %s", [transaction.pk])
+            self.assertEqual(cursor.fetchone(), (4, 5))
+
+        transaction = Transaction.objects.get(pk=transaction.pk)
+        self.assertEqual((transaction.status, transaction.transaction_type), ("request_sent", "request"))
+        self.assertEqual(transaction.get_status_display(), "request_sent")
+        self.assertTrue(Transaction.objects.filter(status__in=["request_sent", "completed"]).exists())
+
+    def test_legacy_alias_and_unknown_values(self):
+        notification = Notification.objects.create(notification_type="none")
+        self.assertEqual(Notification.objects.get(pk=notification.pk).notification_type, "None")
+        with self.assertRaises(ValueError):
+            Transaction.objects.filter(status="done").exists()
+
+
+class SyntheticDataTests(TestCase):
+    def test_generates_consistent_rows(self):
+        synthetic.generate(users=6, transactions=60, batch_size=25)
+
+        users = User.objects.filter(email__endswith=f"@{synthetic.EMAIL_DOMAIN}")
+        self.assertEqual(users.count(), 6)
+        self.assertEqual(KYC.objects.filter(user__in=users).count(), 6)
+        self.assertEqual(len(set(Account.objects.values_list("account_number", flat=True))), 6)
+        self.assertEqual(Transaction.objects.count(), 60)
+        self.assertFalse(Transaction.objects.filter(sender=F("reciever")).exists())
+        for user in users:
+            self.assertEqual(
+                user.unread_notifications, Notification.objects.filter(user=user, is_read=False).count()
+            )
+
+
+class BenchmarkFlowsTests(TestCase):
+    def test_every_flow_runs_and_conserves_money(self):
+        synthetic.generate(users=4, transactions=0)
+        Account.objects.update(account_balance=Decimal("5000.00"))
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "flows.json")
+            call_command("benchmark_flows", iterations=2, warmup=1, output=output, stdout=io.StringIO())
+            with open(output) as f:
+                results = json.load(f)
+        self.assertEqual(set(results["flows"]), {"sign-in", "dashboard", "transfer", "request-settlement", "card"})
+        self.assertEqual(results["flows"]["transfer"]["steps"]["transfer-process"]["latency_ms"].keys(),
+                         {"p50", "p95", "p99", "mean", "max"})
+        total = Account.objects.aggregate(total=Sum("account_balance"))["total"]
+        total += CreditCard.objects.aggregate(total=Sum("amount"))["total"]
+        self.assertEqual(total, Decimal("20000.00"))
+
+
+class StressTransfersTests(TransactionTestCase):
+    def test_concurrent_movements_conserve_money(self):
+        synthetic.generate(users=6, transactions=0)
+        out = io.StringIO()
+        with tempfile.NamedTemporaryFile(suffix=".json") as output:
+            call_command(
+                "stress_transfers", accounts=6, operations=60, processes=1, threads=3, output=output.name, stdout=out,
+            )
+            result = json.load(output)
+        self.assertIn("Money conserved.", out.getvalue())
+        self.assertGreater(result["monitor"]["checks"], 0)
+        self.assertIsNone(result["monitor"]["failure"])
+
+    def test_crashed_worker_fails_the_run(self):
+        synthetic.generate(users=4, transactions=0)
+        with mock.patch(
+            "core.management.commands.stress_transfers.pool_accounts", side_effect=RuntimeError("boom"),
+        ), self.assertRaisesMessage(CommandError, "2 worker thread(s) crashed."):
+            call_command("stress_transfers", accounts=4, operations=10, processes=1, threads=2, stdout=io.StringIO())
+
+    def test_monitor_retries_busy_checks(self):
+        monitor = stress_transfers.NegativeBalanceMonitor([], 0)
+        with mock.patch.object(
+            Account.objects, "filter", side_effect=[OperationalError("database table is locked"), Account.objects.none()],
+        ):
+            monitor.stopped.set()
+            monitor.run()
+        self.assertEqual((monitor.checks, monitor.errors, monitor.failure), (1, 1, None))
+
+
+@override_settings(DASHBOARD_SUMMARY_CACHE="default")
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_disabled_by_default(self):
+        self.client.force_login(make_user("quiet"))
+        response = self.client.get(reverse("account:dashboard"))
+        self.assertNotIn("Server-Timing", response)
+
+    def test_server_timing_log_line_and_profile(self):
+        self.client.force_login(make_user("timed"))
+        with tempfile.TemporaryDirectory() as directory, self.settings(
+            PERFORMANCE_INSTRUMENTATION=True, PERFORMANCE_PROFILE_RATE=1, PERFORMANCE_PROFILE_DIR=directory,
+        ), self.assertLogs("core.performance") as logs:
+            response = self.client.get(reverse("account:dashboard"))
+            self.assertTrue(os.listdir(os.path.join(directory, "account.dashboard")))
+
+        timing = response["Server-Timing"]
+        for metric in ("view;dur=", "sql;dur=", "tpl;dur=", "cache;desc=", "total;dur="):
+            self.assertIn(metric, timing)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["url_name"], "account:dashboard")
+        self.assertGreater(record["queries"], 0)
+        self.assertGreater(record["template_ms"], 0)
+        self.assertEqual(record["cache_misses"], 1)
+
+
+def count_in_child(directory):
+    with override_settings(METRICS_DIR=directory):
+        metrics.transfers.inc(outcome="completed")
+        metrics.view_latency.observe(0.2, view="core:transfer-process")
+
+
+@override_settings(METRICS_TOKEN="", METRICS_ALLOW_UNAUTHENTICATED=True)
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.reset()
+
+    def test_endpoint_reports_view_counters_and_latency(self):
+        self.client.post(reverse("userauths:sign-in"), {"username": "nobody", "password": "wrong"})
+
+        response = self.client.get(reverse("core:metrics"))
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('paylio_sign_ins_total{outcome="failure"} 1.0', text)
+        self.assertIn('paylio_view_latency_seconds_count{view="userauths:sign-in"} 1.0', text)
+        self.assertIn('paylio_view_latency_seconds_bucket{view="userauths:sign-in",le="+Inf"} 1.0', text)
+        self.assertIn("# TYPE paylio_requests_in_progress gauge", text)
+
+    def test_token_required_when_configured(self):
+        with self.settings(METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get(reverse("core:metrics")).status_code, 403)
+            response = self.client.get(reverse("core:metrics"), HTTP_AUTHORIZATION="Bearer wrong")
+            self.assertEqual(response.status_code, 403)
+            response = self.client.get(reverse("core:metrics"), HTTP_AUTHORIZATION="Bearer secret")
+            self.assertEqual(response.status_code, 200)
+
+    def test_closed_without_a_token_even_from_localhost(self):
+        with self.settings(METRICS_ALLOW_UNAUTHENTICATED=False):
+            response = self.client.get(reverse("core:metrics"), REMOTE_ADDR="127.0.0.1")
+            self.assertEqual(response.status_code, 403)
+
+    def test_counters_end_in_total(self):
+        metrics.card_operations.inc(operation="fund", outcome="completed")
+        self.assertIn(
+            'paylio_card_operations_total{operation="fund",outcome="completed"} 1.0',
+            self.client.get(reverse("core:metrics")).content.decode(),
+        )
+
+    def test_worker_processes_are_added_up(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            metrics.transfers.inc(outcome="completed")
+            child = multiprocessing.get_context("fork").Process(target=count_in_child, args=(directory,))
+            child.start()
+            child.join()
+            metrics.view_latency.observe(0.02, view="core:transfer-process")
+
+            text = metrics.render()
+        self.assertIn('paylio_transfers_total{outcome="completed"} 2.0', text)
+        self.assertIn('paylio_view_latency_seconds_bucket{view="core:transfer-process",le="0.025"} 1.0', text)
+        self.assertIn('paylio_view_latency_seconds_bucket{view="core:transfer-process",le="0.25"} 2.0', text)
+        self.assertIn('paylio_view_latency_seconds_count{view="core:transfer-process"} 2.0', text)
+
+
+class SlowQueryTests(TestCase):
+    def setUp(self):
+        slow_queries.install_all()
+        self.directory = tempfile.TemporaryDirectory()
+        self.log_file = os.path.join(self.directory.name, "slow.log")
+
+    def tearDown(self):
+        for alias_connection in connections.all():
+            alias_connection.execute_wrappers.remove(slow_queries.recorder)
+        self.directory.cleanup()
+
+    def test_normalised_fingerprint(self):
+        self.assertEqual(
+            slow_queries.normalise("SELECT * FROM t WHERE a = 'x' AND b IN (%s, %s, %s) AND c = 12"),
+            "SELECT * FROM t WHERE a = ? AND b IN (...) AND c = ?",
+        )
+        self.assertEqual(
+            slow_queries.fingerprint("SELECT 1 FROM t WHERE id IN (%s)"),
+            slow_queries.fingerprint("SELECT 2 FROM t  WHERE id IN (%s, %s)"),
+        )
+
+    def test_slow_statements_are_logged_with_view_and_plan(self):
+        user = make_user("slow")
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=0.000001, SLOW_QUERY_LOG_FILE=self.log_file):
+            self.client.post(reverse("userauths:sign-in"), {"username": user.username, "password": "wrong"})
+
+        entries = list(slow_queries.read_log(self.log_file))
+        lookup = [e for e in entries if 'FROM "userauths_user"' in e["sql"] and '"username" = ' in e["sql"]]
+        self.assertTrue(lookup)
+        self.assertEqual(lookup[0]["view"], "userauths:sign-in")
+        self.assertTrue(lookup[0]["explain"])
+        self.assertTrue(any("userauths/views.py" in frame for frame in lookup[0]["stack"]))
+
+        out = io.StringIO()
+        call_command("slow_queries", file=self.log_file, stdout=out)
+        self.assertIn(lookup[0]["fingerprint"], out.getvalue())
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    # Not a TestCase: its wrapping transaction would pin every read to the primary.
+    databases = {"default"}
+
+    def route(self, action):
+        return contextvars.copy_context().run(action)
+
+    def test_reads_go_to_replicas_until_a_write(self):
+        router = routers.ReplicaRouter()
+
+        def read_write_read():
+            first = router.db_for_read(Account)
+            router.db_for_write(Account)
+            return first, router.db_for_read(Account)
+
+        with self.settings(REPLICA_DATABASES=["replica1"]):
+            self.assertEqual(self.route(read_write_read), ("replica1", "default"))
+            with db_transaction.atomic():
+                self.assertEqual(self.route(lambda: router.db_for_read(Account)), "default")
+        self.assertEqual(self.route(lambda: router.db_for_read(Account)), "default")
+
+    def test_middleware_pins_after_a_write(self):
+        router = routers.ReplicaRouter()
+        seen = []
+
+        def view(request):
+            seen.append(router.db_for_read(Account))
+            if request.method == "POST":
+                router.db_for_write(Account)
+            return HttpResponse()
+
+        factory = RequestFactory()
+        with self.settings(REPLICA_DATABASES=["replica1"]):
+            middleware = routers.ReplicaPinningMiddleware(view)
+            self.assertNotIn("primary_pin", self.route(lambda: middleware(factory.get("/"))).cookies)
+            response = self.route(lambda: middleware(factory.post("/")))
+            self.assertEqual(response.cookies["primary_pin"]["max-age"], settings.REPLICA_STICKY_SECONDS)
+            pinned_request = factory.get("/")
+            pinned_request.COOKIES["primary_pin"] = "1"
+            self.route(lambda: middleware(pinned_request))
+        self.assertEqual(seen, ["replica1", "default", "default"])
+
+    def test_use_primary_pins_reads_inside_the_block(self):
+        router = routers.ReplicaRouter()
+
+        def reads():
+            with routers.use_primary():
+                inside = router.db_for_read(Account)
+            return inside, router.db_for_read(Account)
+
+        with self.settings(REPLICA_DATABASES=["replica1"]):
+            self.assertEqual(self.route(reads), ("default", "replica1"))
+
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+def ping_fake(connection):
+    if not connection.healthy:
+        raise OSError("server has gone away")
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.reset()
+
+    def test_connections_are_reused_up_to_max_size(self):
+        pool = db_pool.ConnectionPool("test", {"MAX_SIZE": 2, "TIMEOUT": 0.05}, ping_fake)
+        first, second = pool.checkout(FakeConnection), pool.checkout(FakeConnection)
+        self.assertIsNot(first, second)
+        with self.assertRaises(db_pool.PoolTimeout):
+            pool.checkout(FakeConnection)
+        pool.release(first)
+        self.assertIs(pool.checkout(FakeConnection), first)
+        self.assertEqual(pool.stats(), {"idle": 0, "in_use": 2, "size": 2, "max_size": 2})
+        self.assertIn('paylio_db_pool_timeouts_total{alias="test"} 1.0', metrics.render())
+        self.assertIn('paylio_db_pool_connections{alias="test",state="in_use"} 2.0', metrics.render())
+
+    def test_unhealthy_old_and_broken_connections_are_replaced(self):
+        pool = db_pool.ConnectionPool("test", {"RECYCLE": 60}, ping_fake)
+        sick = pool.checkout(FakeConnection)
+        pool.release(sick)
+        sick.healthy = False
+        fresh = pool.checkout(FakeConnection)
+        self.assertIsNot(fresh, sick)
+        self.assertTrue(sick.closed)
+
+        pool.release(fresh, reusable=False)
+        self.assertTrue(fresh.closed)
+
+        old = pool.checkout(FakeConnection)
+        pool.in_use[id(old)].created -= 60
+        pool.release(old)
+        self.assertTrue(old.closed)
+        self.assertEqual(pool.stats()["size"], 0)
+        text = metrics.render()
+        for reason in ("unhealthy", "broken", "recycled"):
+            self.assertIn(f'paylio_db_pool_closed_total{{alias="test",reason="{reason}"}} 1.0', text)
+
+    def test_idle_connections_above_min_size_are_closed(self):
+        pool = db_pool.ConnectionPool("test", {"MIN_SIZE": 1, "IDLE_TIMEOUT": 0}, ping_fake)
+        first, second = pool.checkout(FakeConnection), pool.checkout(FakeConnection)
+        pool.release(first)
+        pool.release(second)
+        self.assertIs(pool.checkout(FakeConnection), second)
+        self.assertTrue(first.closed)
+
+    def test_connections_it_did_not_hand_out_are_left_alone(self):
+        pool = db_pool.ConnectionPool("test")
+        inherited = FakeConnection()
+        self.assertFalse(pool.release(inherited))
+        self.assertFalse(inherited.closed)
+
+    def test_backend_checks_connections_out_and_back_in(self):
+        from django.db.backends.postgresql.base import DatabaseWrapper as StockWrapper
+        from paylio.db.backends.postgresql.base import DatabaseWrapper
+
+        wrapper = DatabaseWrapper({**connection.settings_dict, "NAME": "paylio", "POOL": {"MAX_SIZE": 1}}, alias="pooled")
+        try:
+            with mock.patch.object(StockWrapper, "get_new_connection", side_effect=lambda params: FakeConnection()), \
+                    mock.patch.object(DatabaseWrapper, "ping_connection", staticmethod(ping_fake)):
+                wrapper.connection = raw = wrapper.get_new_connection({"dbname": "paylio"})
+                wrapper.autocommit = True
+                wrapper.close()
+                self.assertIsNone(wrapper.connection)
+                self.assertFalse(raw.closed)
+                wrapper.connection = wrapper.get_new_connection({"dbname": "paylio"})
+                self.assertIs(wrapper.connection, raw)
+        finally:
+            db_pool.close_pools("pooled")
+        # Closing the pool closes a connection in use once it comes back.
+        self.assertFalse(raw.closed)
+        wrapper.close()
+        self.assertTrue(raw.closed)
+
+
+class SQLiteWriteTransactionTests(SimpleTestCase):
+    """The tuned backend, on its own database file whatever the test database's engine."""
+
+    pragmas = {"journal_mode": "WAL", "busy_timeout": 1234}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        connections["tuned"] = TunedSQLite({
+            "ENGINE": "paylio.db.backends.sqlite3", "NAME": os.path.join(directory.name, "tuned.sqlite3"),
+            "PRAGMAS": self.pragmas, "OPTIONS": {}, "TIME_ZONE": None, "AUTOCOMMIT": True,
+            "ATOMIC_REQUESTS": False, "CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False, "TEST": {},
+            "USER": "", "PASSWORD": "", "HOST": "", "PORT": "",
+        }, "tuned")
+        self.tuned = connections["tuned"]
+        self.addCleanup(connections.__delitem__, "tuned")
+        self.addCleanup(self.tuned.close)
+
+    def test_outermost_write_transaction_begins_immediate(self):
+        with CaptureQueriesContext(self.tuned) as queries:
+            with write_transaction(using="tuned"):
+                with write_transaction(using="tuned"):
+                    self.tuned.cursor().execute("SELECT 1")
+            with db_transaction.atomic(using="tuned"):
+                self.tuned.cursor().execute("SELECT 1")
+        self.assertEqual([query["sql"] for query in queries if query["sql"].startswith("BEGIN")], ["BEGIN IMMEDIATE", "BEGIN"])
+
+    def test_pragmas_applied_on_connect(self):
+        with self.tuned.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], self.pragmas["busy_timeout"])
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+
+
+class BenchmarkSQLiteTests(SimpleTestCase):
+    def test_children_use_the_scratch_database(self):
+        with tempfile.TemporaryDirectory() as directory, mock.patch.dict(os.environ, {
+            "DATABASE_URL": "postgres://paylio@db.invalid/paylio", "REPLICA_DATABASE_URLS": "postgres://db.invalid/r",
+        }):
+            path = os.path.join(directory, "scratch.sqlite3")
+            benchmark_sqlite.Command().manage(path, "False", "check")
+
+    def test_refuses_a_child_on_another_database(self):
+        command = benchmark_sqlite.Command()
+        probe = json.dumps(["django.db.backends.postgresql", "paylio", []])
+        with mock.patch.object(command, "run_child", return_value=probe) as run_child:
+            with self.assertRaisesMessage(CommandError, "Refusing to run stress_transfers"):
+                command.manage("/tmp/scratch.sqlite3", "False", "stress_transfers")
+        # Only the probe ran.
+        self.assertEqual(run_child.call_count, 1)
+        self.assertEqual(run_child.call_args.args[0]["DATABASE_URL"], "")
+
+
+class BenchmarkUUIDKeysTests(TransactionTestCase):
+    def test_scratch_tables_stay_out_of_the_app_registry(self):
+        out = io.StringIO()
+        call_command("benchmark_uuid_keys", rows=20, batch_size=10, stdout=out)
+        self.assertIn("uuid4:", out.getvalue())
+        self.assertIn("uuid7:", out.getvalue())
+        self.assertFalse([model for model in apps.get_models() if model.__name__.startswith("Bench")])
+        self.assertFalse([table for table in connection.introspection.table_names() if table.startswith("bench_")])
+
+
+class SessionStoreTests(TestCase):
+    def setUp(self):
+        sessions.local_sessions.clear()
+        cache.clear()
+        self.user = make_user("sessions")
+
+    def sign_in(self):
+        response = self.client.post(
+            reverse("userauths:sign-in"), {"username": self.user.username, "password": "Test12345!"}
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def session_queries(self, path, times=2):
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(times):
+                self.assertEqual(self.client.get(path).status_code, 200)
+        return [query["sql"] for query in queries if "django_session" in query["sql"]]
+
+    def test_signed_in_requests_do_not_read_the_session_table(self):
+        self.sign_in()
+        self.assertEqual(self.session_queries(reverse("account:dashboard")), [])
+        sessions.local_sessions.clear()
+        with self.settings(SESSION_CACHE_ALIAS="default"):
+            # Loaded from the table once, then from the shared cache.
+            self.assertEqual(len(self.session_queries(reverse("account:dashboard"))), 1)
+            sessions.local_sessions.clear()
+            self.assertEqual(self.session_queries(reverse("account:dashboard")), [])
+
+    def test_unchanged_session_is_not_rewritten(self):
+        self.sign_in()
+        with self.settings(SESSION_SAVE_EVERY_REQUEST=True):
+            self.assertEqual(self.session_queries(reverse("account:dashboard")), [])
+            with self.settings(SESSION_TOUCH_INTERVAL=0):
+                queries = self.session_queries(reverse("account:dashboard"), times=1)
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0].startswith("UPDATE"))
+
+    def test_last_login_is_written_at_sign_in(self):
+        # The password-reset token hashes last_login, so it must not change later.
+        with self.settings(SESSION_TOUCH_INTERVAL=3600):
+            self.sign_in()
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    def test_due_expiry_touches_are_written_at_request_end(self):
+        self.sign_in()
+        session_key = self.client.session.session_key
+        expire_date = timezone.now() + timedelta(days=30)
+        with self.settings(SESSION_TOUCH_INTERVAL=3600):
+            sessions.session_expiry.add(session_key, expire_date)
+            self.assertNotEqual(Session.objects.get(pk=session_key).expire_date, expire_date)
+            sessions.session_expiry.flushed -= 3600
+            self.client.get(reverse("account:dashboard"))
+        self.assertEqual(Session.objects.get(pk=session_key).expire_date, expire_date)
+        self.assertFalse(sessions.session_expiry.pending)
+
+    def test_state_changing_requests_see_a_sign_out_on_another_worker(self):
+        self.sign_in()
+        self.assertEqual(self.client.get(reverse("account:dashboard")).status_code, 200)
+        # Another worker signed out: the row is gone, this worker's LRU still has it.
+        Session.objects.filter(pk=self.client.session.session_key).delete()
+        self.assertEqual(self.client.get(reverse("account:dashboard")).status_code, 200)
+        response = self.client.post(reverse("core:bulk-transfer-api"), "{}", content_type="application/json")
+        self.assertRedirects(response, f"{reverse('userauths:sign-in')}?next={reverse('core:bulk-transfer-api')}",
+                             fetch_redirect_response=False)
+
+    def test_sign_out_ends_the_session(self):
+        self.sign_in()
+        session_key = self.client.session.session_key
+        self.client.get(reverse("userauths:sign-out"))
+        self.assertEqual(sessions.SessionStore(session_key).load(), {})
+
+
+class AccountWriteTests(TestCase):
+    def setUp(self):
+        self.user = make_user("writes")
+
+    def updates(self, queries):
+        return [query["sql"] for query in queries if query["sql"].startswith("UPDATE")]
+
+    def test_sign_in_does_not_touch_the_account(self):
+        with self.settings(SESSION_TOUCH_INTERVAL=3600), CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse("userauths:sign-in"), {"username": self.user.username, "password": "Test12345!"})
+        # Besides the new session row, only last_login is written.
+        (update,) = [sql for sql in self.updates(queries) if "django_session" not in sql]
+        self.assertTrue(update.startswith('UPDATE "userauths_user" SET "last_login"'))
+        self.assertNotIn(",", update.split(" WHERE ")[0])
+        self.assertFalse([query for query in queries if "account_account" in query["sql"]])
+
+    def test_sign_up_provisions_one_account(self):
+        response = self.client.post(reverse("userauths:sign-up"), {
+            "username": "newcomer", "email": "newcomer@example.com",
+            "password1": "Sign-up-12345", "password2": "Sign-up-12345",
+        })
+        self.assertEqual(response.status_code, 302)
+        user = User.objects.get(email="newcomer@example.com")
+        self.assertEqual(Account.objects.filter(user=user).count(), 1)
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertFalse([query for query in queries if "account_account" in query["sql"]])
+
+    def test_saves_write_only_changed_columns(self):
+        account = Account.objects.get(user=self.user)
+        card = CreditCard.objects.create(user=self.user, name="Card", number=4111, month=1, year=2030, cvv=123)
+        card = CreditCard.objects.get(pk=card.pk)
+        with self.assertNumQueries(0):
+            account.save()
+            card.save()
+
+        account.kyc_submitted = True
+        card.card_status = False
+        with CaptureQueriesContext(connection) as queries:
+            account.save()
+            card.save()
+            account.save()
+        account_update, card_update = self.updates(queries)
+        self.assertIn('"kyc_submitted"', account_update)
+        self.assertNotIn('"account_balance"', account_update)
+        self.assertIn('"card_status"', card_update)
+        self.assertNotIn('"amount"', card_update)
+
+    def test_refreshed_balance_is_not_written_back(self):
+        account = Account.objects.get(user=self.user)
+        Account.objects.filter(pk=account.pk).update(account_balance=F("account_balance") + 5)
+        account.refresh_from_db(fields=["account_balance"])
+        with self.assertNumQueries(0):
+            account.save()
+
+
+class BatchedMigrationTests(TestCase):
+    def setUp(self):
+        self.users = [make_user(f"batch{i}") for i in range(5)]
+        Account.objects.update(access_code=None)
+
+    def test_updates_each_chunk_with_one_bulk_update(self):
+        codes = iter(range(100000, 100005))
+
+        def assign(accounts):
+            for account in accounts:
+                account.access_code = str(next(codes))
+            return accounts
+
+        missing = Account.objects.filter(access_code__isnull=True)
+        with self.assertLogs("paylio.db.batches") as logs, CaptureQueriesContext(connection) as queries:
+            self.assertEqual(batches.update_in_chunks(missing, ["access_code"], assign, batch_size=2), 5)
+        self.assertFalse(missing.exists())
+        self.assertEqual(len([query for query in queries if query["sql"].startswith("UPDATE")]), 3)
+        self.assertIn("5 of 5 rows (100.0%)", logs.output[-1])
+
+    def test_interrupted_run_resumes(self):
+        chunks = []
+
+        def assign(accounts):
+            chunks.append(len(accounts))
+            if len(chunks) == 2:
+                raise RuntimeError("interrupted")
+            for account in accounts:
+                account.access_code = str(account.pk).zfill(6)
+            return accounts
+
+        missing = Account.objects.filter(access_code__isnull=True)
+        with self.assertRaises(RuntimeError):
+            batches.update_in_chunks(missing, ["access_code"], assign, batch_size=2)
+        self.assertEqual(missing.count(), 3)
+
+        with self.assertLogs("paylio.db.batches"):
+            self.assertEqual(batches.update_in_chunks(missing, ["access_code"], assign, batch_size=2), 3)
+        self.assertEqual(chunks, [2, 2, 2, 1])
+        self.assertFalse(missing.exists())
+
+    def test_data_migrations(self):
+        access_codes = importlib.import_module("account.migrations.0006_fill_access_codes")
+        with self.assertLogs("paylio.db.batches"):
+            access_codes.forwards(apps, None)
+        self.assertEqual(len(set(Account.objects.values_list("access_code", flat=True))), 5)
+
+        unread = importlib.import_module("userauths.migrations.0004_count_unread_notifications")
+        Notification.objects.create(user=self.users[0], notification_type="Credit Alert")
+        Notification.objects.create(user=self.users[0], notification_type="Credit Alert", is_read=True)
+        User.objects.update(unread_notifications=0)
+        with self.assertLogs("paylio.db.batches"):
+            unread.count_unread(apps, None)
+        self.assertEqual(
+            dict(User.objects.filter(pk__in=[user.pk for user in self.users]).values_list("pk", "unread_notifications")),
+            {user.pk: int(user == self.users[0]) for user in self.users},
+        )
+
+
+class TransferServiceTests(TestCase):
+    def setUp(self):
+        self.sender = make_user("payer")
+        self.reciever = make_user("payee")
+        self.set_balance(self.sender, "100.00")
+
+    def set_balance(self, user, balance):
+        Account.objects.filter(user=user).update(account_balance=Decimal(balance))
+        user.account.refresh_from_db()
+
+    def balances(self):
+        return [
+            Account.objects.get(user=user).account_balance for user in (self.sender, self.reciever)
+        ]
+
+    def transfer(self, amount, status="processing", transaction_type="transfer"):
+        return Transaction.objects.create(
+            user=self.sender, sender=self.sender, reciever=self.reciever,
+            sender_account=self.sender.account, reciever_account=self.reciever.account,
+            amount=Decimal(amount), transaction_type=transaction_type, status=status,
+        )
+
+    def test_insufficient_funds_changes_nothing(self):
+        transaction = self.transfer("150.00")
+        with self.assertRaises(transfer_service.InsufficientFunds):
+            transfer_service.complete_transfer(transaction, self.sender.account, self.reciever.account)
+        self.assertEqual(self.balances(), [Decimal("100.00"), Decimal("0.00")])
+        self.assertEqual(Transaction.objects.get(pk=transaction.pk).status, "processing")
+        self.assertFalse(Notification.objects.filter(notification_type="Debit Alert").exists())
+
+    def test_completing_twice_moves_money_once(self):
+        transaction = self.transfer("40.00")
+        transfer_service.complete_transfer(transaction, self.sender.account, self.reciever.account)
+        with self.assertRaises(transfer_service.InvalidTransactionState):
+            transfer_service.complete_transfer(
+                Transaction.objects.get(pk=transaction.pk), self.sender.account, self.reciever.account,
+            )
+        self.assertEqual(self.balances(), [Decimal("60.00"), Decimal("40.00")])
+
+    def test_wrong_account_or_state_is_rejected(self):
+        stranger = make_user("stranger")
+        self.set_balance(stranger, "100.00")
+        transaction = self.transfer("10.00")
+        with self.assertRaises(transfer_service.InvalidTransactionState):
+            transfer_service.complete_transfer(transaction, stranger.account, self.reciever.account)
+        with self.assertRaises(transfer_service.InvalidTransactionState):
+            transfer_service.settle_request(transaction, self.reciever.account, self.sender.account)
+        self.assertEqual(self.balances(), [Decimal("100.00"), Decimal("0.00")])
+        self.assertEqual(Account.objects.get(user=stranger).account_balance, Decimal("100.00"))
+
+    def test_card_amounts_are_validated(self):
+        card = CreditCard.objects.create(user=self.sender, name="Card", number=4111, month=1, year=2030, cvv=123)
+        for amount in (None, "", "abc", "NaN", "Infinity", "-5", "0", "1e20"):
+            with self.subTest(amount=amount), self.assertRaises(transfer_service.TransferError):
+                transfer_service.fund_card(self.sender.account, card, amount)
+        transfer_service.fund_card(self.sender.account, card, " 25.50 ")
+        transfer_service.withdraw_from_card(self.sender.account, card, "5")
+        self.assertEqual(CreditCard.objects.get(pk=card.pk).amount, Decimal("20.50"))
+        self.assertEqual(self.balances()[0], Decimal("79.50"))
+
+    def test_invalid_card_amount_is_a_form_message(self):
+        card = CreditCard.objects.create(user=self.sender, name="Card", number=4111, month=1, year=2030, cvv=123)
+        self.client.force_login(self.sender)
+        response = self.client.post(reverse("core:fund-credit-card", args=[card.card_id]), {"funding_amount": "abc"})
+        self.assertRedirects(response, reverse("core:card-detail", args=[card.card_id]), fetch_redirect_response=False)
+        response = self.client.post(reverse("core:withdraw_fund", args=[card.card_id]), {})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)], ["Invalid amount.", "Invalid amount."]
+        )
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.payer = make_user("ledger-payer")
+        self.payee = make_user("ledger-payee")
+        Account.objects.filter(user=self.payer).update(account_balance=Decimal("100.00"))
+        # The opening balance, as migration core 0002 records it.
+        BalanceSnapshot.objects.create(account=self.payer.account, balance=Decimal("100.00"), last_entry_id=0)
+
+    def pay(self, amount):
+        transaction = Transaction.objects.create(
+            user=self.payer, sender=self.payer, reciever=self.payee,
+            sender_account=self.payer.account, reciever_account=self.payee.account,
+            amount=Decimal(amount), transaction_type="transfer", status="processing",
+        )
+        transfer_service.complete_transfer(transaction, self.payer.account, self.payee.account)
+
+    def test_balance_at_across_a_snapshot(self):
+        self.pay("10.00")
+        before_snapshot = timezone.now()
+        snapshot = ledger.take_snapshot(self.payer.account)
+        self.assertEqual(snapshot.balance, Decimal("90.00"))
+        self.pay("15.25")
+
+        self.assertEqual(ledger.balance_at(self.payer.account), Decimal("74.75"))
+        self.assertEqual(ledger.balance_at(self.payer.account, before_snapshot), Decimal("90.00"))
+        self.assertEqual(ledger.balance_at(self.payee.account), Decimal("25.25"))
+        # Nothing was posted since, so no new snapshot.
+        self.pay("0.75")
+        snapshot = ledger.take_snapshot(self.payer.account)
+        self.assertEqual(ledger.take_snapshot(self.payer.account), snapshot)
+        self.assertEqual(snapshot.balance, Decimal("74.00"))
+
+    def test_reconcile_detects_drift(self):
+        self.pay("30.00")
+        self.assertEqual(ledger.reconcile(self.payer.account), 0)
+        self.assertEqual(ledger.reconcile(self.payee.account), 0)
+
+        Account.objects.filter(user=self.payee).update(account_balance=F("account_balance") + 5)
+        self.assertEqual(ledger.reconcile(self.payee.account), Decimal("5.00"))
+
+    def test_every_movement_balances(self):
+        self.pay("12.00")
+        entries = LedgerEntry.objects.values("direction").annotate(total=Sum("amount")).order_by("direction")
+        self.assertEqual({entry["direction"]: entry["total"] for entry in entries}, {
+            "credit": Decimal("12.00"), "debit": Decimal("12.00"),
+        })
+
+
+class BulkTransferTests(TestCase):
+    def setUp(self):
+        self.sender = make_user("bulk-sender")
+        self.recipients = [make_user(f"bulk-recipient{i}") for i in range(2)]
+        Account.objects.filter(user=self.sender).update(account_balance=Decimal("100.00"))
+        self.sender.account.refresh_from_db()
+        self.client.force_login(self.sender)
+
+    def post(self, payouts):
+        return self.client.post(
+            reverse("core:bulk-transfer-api"),
+            json.dumps({"pin": self.sender.account.pin_number, "payouts": payouts}),
+            content_type="application/json",
+        )
+
+    def balances(self):
+        return [Account.objects.get(user=user).account_balance for user in [self.sender, *self.recipients]]
+
+    def test_bad_rows_fail_and_the_rest_are_paid(self):
+        first, second = (user.account.account_number for user in self.recipients)
+        response = self.post([
+            {"account_number": first, "amount": "10.00", "description": "rent"},
+            {"account_number": "nobody", "amount": "5"},
+            {"account_number": second, "amount": "abc"},
+            {"account_number": self.sender.account.account_number, "amount": "1"},
+            {"account_number": second, "amount": "2.50", "description": {"not": "text"}},
+            {"account_number": second, "amount": "20", "description": 42},
+            {"account_number": second, "amount": 20},
+        ])
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual([row["error"] for row in result["failed"]], [
+            "Account does not exist.", "Invalid amount.", "You can not pay yourself.",
+            "Invalid description.", "Invalid description.",
+        ])
+        self.assertEqual([row["row"] for row in result["failed"]], [2, 3, 4, 5, 6])
+        self.assertEqual(result["total"], "30.00")
+        self.assertEqual(self.balances(), [Decimal("70.00"), Decimal("10.00"), Decimal("20.00")])
+        self.assertEqual(Transaction.objects.get(reciever_account=self.recipients[0].account).description, "rent")
+
+    def test_payable_rows_are_all_or_nothing(self):
+        response = self.post([
+            {"account_number": user.account.account_number, "amount": "60"} for user in self.recipients
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Insufficient Funds."})
+        self.assertEqual(self.balances(), [Decimal("100.00"), Decimal("0.00"), Decimal("0.00")])
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(LedgerEntry.objects.exists())
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        idempotency.key_cache.clear()
+        self.sender = make_user("idem-sender")
+        self.reciever = make_user("idem-reciever")
+        Account.objects.filter(user=self.sender).update(account_balance=Decimal("100.00"))
+        self.client.force_login(self.sender)
+
+    def start_transfer(self, **extra):
+        return self.client.post(
+            reverse("core:amount-transfer-process", args=[self.reciever.account.account_number]),
+            {"amount-send": "30.00", "description": "dinner", **extra.pop("data", {})}, **extra,
+        )
+
+    def test_replayed_form_returns_the_stored_transaction_and_pays_once(self):
+        key = idempotency.new_key()
+        first = self.start_transfer(data={"idempotency_key": key})
+        idempotency.key_cache.clear()
+        replay = self.start_transfer(data={"idempotency_key": key})
+        self.assertEqual(first.status_code, 302)
+        self.assertEqual(replay["Location"], first["Location"])
+        transaction = Transaction.objects.get()
+
+        process = reverse(
+            "core:transfer-process", args=[self.reciever.account.account_number, transaction.transaction_id],
+        )
+        for _ in range(2):
+            self.client.post(process, {"pin-number": self.sender.account.pin_number})
+        self.assertEqual(Account.objects.get(user=self.sender).account_balance, Decimal("70.00"))
+        self.assertEqual(Account.objects.get(user=self.reciever).account_balance, Decimal("30.00"))
+        self.assertEqual(LedgerEntry.objects.count(), 2)
+
+    def test_header_key_and_distinct_keys(self):
+        first = self.start_transfer(HTTP_IDEMPOTENCY_KEY="header-key")
+        replay = self.start_transfer(HTTP_IDEMPOTENCY_KEY="header-key")
+        self.assertEqual(replay["Location"], first["Location"])
+        self.start_transfer(HTTP_IDEMPOTENCY_KEY="another-key")
+        self.start_transfer()
+        self.assertEqual(Transaction.objects.count(), 3)
+
+    def test_expired_key_creates_a_new_transaction(self):
+        self.start_transfer(data={"idempotency_key": "old"})
+        IdempotencyKey.objects.update(date=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL + 1))
+        idempotency.key_cache.clear()
+        self.start_transfer(data={"idempotency_key": "old"})
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_malformed_amount_is_a_warning_not_an_error(self):
+        form = reverse("core:amount-transfer", args=[self.reciever.account.account_number])
+        amounts = ("abc", "", "-5", "NaN")
+        for amount in amounts:
+            response = self.start_transfer(data={"amount-send": amount})
+            self.assertRedirects(response, form, fetch_redirect_response=False)
+        self.assertEqual([str(m) for m in get_messages(response.wsgi_request)], ["Invalid amount."] * len(amounts))
+        self.assertFalse(Transaction.objects.exists())
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = make_user("pager")
+        other = make_user("pager-peer")
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user, sender=self.user, reciever=other, amount=Decimal(i + 1),
+                transaction_type="transfer", status="completed",
+            )
+            for i in range(7)
+        ])
+        # Several rows share a date, so only the id breaks the tie.
+        tied = timezone.now()
+        Transaction.objects.update(date=tied)
+        Transaction.objects.filter(amount__lte=2).update(date=tied - timedelta(minutes=1))
+        self.client.force_login(self.user)
+
+    def feed(self, cursor=None, limit=3):
+        params = {"feed": "sent", "limit": limit}
+        if cursor is not None:
+            params["cursor"] = cursor
+        return self.client.get(reverse("core:transaction-feed"), params).json()
+
+    def test_pages_have_no_duplicates_or_gaps(self):
+        seen = []
+        data = self.feed()
+        while True:
+            seen.extend(row["transaction_id"] for row in data["results"])
+            if not data["next_cursor"]:
+                break
+            data = self.feed(data["next_cursor"])
+        expected = list(Transaction.objects.order_by("-date", "-id").values_list("transaction_id", flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(set(seen)), 7)
+
+    def test_tampered_cursor_yields_the_first_page(self):
+        first = self.feed()
+        date = Transaction.objects.first().date.isoformat()
+        for raw in (b"garbage", b'["not a date", 5]', f'["{date}", {2 ** 70}]'.encode(),
+                    f'["{date}", -1]'.encode(), f'["{date}", [1]]'.encode()):
+            cursor = base64.urlsafe_b64encode(raw).decode()
+            with self.subTest(raw=raw):
+                self.assertEqual(self.feed(cursor), first)
+        self.assertEqual(self.feed("%%%not-base64"), first)
+        self.assertIsNone(pagination.decode_cursor(""))
+
+
+class TransactionFeedTests(TestCase):
+    def setUp(self):
+        self.user = make_user("feeds")
+        self.other = make_user("feeds-peer")
+        for sender, reciever in ((self.user, self.other), (self.other, self.user)):
+            for transaction_type, status in (("transfer", "completed"), ("request", "request_sent")):
+                Transaction.objects.create(
+                    user=sender, sender=sender, reciever=reciever, amount=Decimal("1.00"),
+                    transaction_type=transaction_type, status=status,
+                )
+        self.client.force_login(self.user)
+
+    def test_each_feed_holds_its_own_rows(self):
+        expected = {
+            "sent": ("sender", "transfer"), "received": ("reciever", "transfer"),
+            "sent_requests": ("sender", "request"), "received_requests": ("reciever", "request"),
+        }
+        for feed, (side, transaction_type) in expected.items():
+            with self.subTest(feed=feed):
+                data = self.client.get(reverse("core:transaction-feed"), {"feed": feed}).json()
+                transaction = Transaction.objects.get(**{side: self.user}, transaction_type=transaction_type)
+                self.assertEqual([row["transaction_id"] for row in data["results"]], [transaction.transaction_id])
+        response = self.client.get(reverse("core:transaction-feed"), {"feed": "everything"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_feeds_use_the_composite_indexes(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Reads SQLite query plans.")
+        for feed, index in (("sent", "txn_sender_type_date_idx"), ("received", "txn_reciever_type_date_idx")):
+            with self.subTest(feed=feed):
+                self.assertIn(index, transaction_feed(self.user, feed).order_by("-date", "-id")[:25].explain())
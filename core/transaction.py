@@ -1,16 +1,38 @@
 from django.shortcuts import render, redirect
+from django.http import JsonResponse
 from core.models import Transaction
+from core.pagination import paginate
 from account.models import Account
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 
+# Feed name (also the cursor's query-string parameter) -> (user side, transaction type)
+TRANSACTION_FEEDS = {
+    "sent": ("sender", "transfer"),
+    "received": ("reciever", "transfer"),
+    "sent_requests": ("sender", "request"),
+    "received_requests": ("reciever", "request"),
+}
+
+
+def transaction_feed(user, feed):
+    side, transaction_type = TRANSACTION_FEEDS[feed]
+    return Transaction.objects.filter(**{side: user}, transaction_type=transaction_type)
+
+
+def with_parties(transactions):
+    # Everything the transaction rows in the templates show (names and the
+    # requester's account number), fetched with the page instead of per row.
+    return transactions.select_related("sender__kyc", "sender__account", "reciever__kyc")
+
+
 @login_required
 def transaction_lists(request):
-    sender_transaction = Transaction.objects.filter(sender=request.user, transaction_type="transfer").order_by("-id")
-    reciever_transaction = Transaction.objects.filter(reciever=request.user, transaction_type="transfer").order_by("-id")
+    sender_transaction = paginate(with_parties(transaction_feed(request.user, "sent")), request.GET.get("sent"))
+    reciever_transaction = paginate(with_parties(transaction_feed(request.user, "received")), request.GET.get("received"))
 
-    request_sender_transaction = Transaction.objects.filter(sender=request.user, transaction_type="request")
-    request_reciever_transaction = Transaction.objects.filter(reciever=request.user, transaction_type="request")
+    request_sender_transaction = paginate(with_parties(transaction_feed(request.user, "sent_requests")), request.GET.get("sent_requests"))
+    request_reciever_transaction = paginate(with_parties(transaction_feed(request.user, "received_requests")), request.GET.get("received_requests"))
 
     context = {
         "sender_transaction":sender_transaction,
@@ -22,13 +44,44 @@ def transaction_lists(request):
 
     return render(request, "transaction/transaction-list.html", context)
 
+
+@login_required
+def transaction_feed_api(request):
+    feed = request.GET.get("feed", "sent")
+    if feed not in TRANSACTION_FEEDS:
+        return JsonResponse({"error": f"Unknown feed, use one of: {', '.join(TRANSACTION_FEEDS)}."}, status=400)
+    try:
+        limit = min(max(int(request.GET.get("limit", 25)), 1), 100)
+    except ValueError:
+        limit = 25
+
+    transactions = transaction_feed(request.user, feed).select_related("sender_account", "reciever_account")
+    page = paginate(transactions, request.GET.get("cursor"), per_page=limit)
+
+    return JsonResponse({
+        "results": [
+            {
+                "transaction_id": t.transaction_id,
+                "amount": str(t.amount),
+                "description": t.description,
+                "status": t.status,
+                "transaction_type": t.transaction_type,
+                "sender_account": t.sender_account.account_number if t.sender_account else None,
+                "reciever_account": t.reciever_account.account_number if t.reciever_account else None,
+                "date": t.date.isoformat(),
+            }
+            for t in page
+        ],
+        "next_cursor": page.next_cursor,
+    })
+
 @login_required
 def transaction_detail(request, transaction_id):
-    transaction = Transaction.objects.get(transaction_id=transaction_id)
+    transaction = Transaction.objects.select_related("sender__kyc", "reciever__kyc").get(transaction_id=transaction_id)
 
     context = {
         "transaction":transaction,
 
     }
 
-    return render(request, "transaction/transaction-detail.html", context)
\ No newline at end of file
+    return render(request, "transaction/transaction-detail.html", context)
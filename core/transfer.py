@@ -1,24 +1,15 @@
 from django.shortcuts import render, redirect
 from account.models import Account
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
 from django.contrib import messages
-from decimal import Decimal
-from core.models import Transaction, Notification
+from core.models import Transaction
+from core import account_resolver, transfer_service, idempotency, metrics
 
 
 @login_required
 def search_users_account_number(request):
-    # account = Account.objects.filter(account_status="active")
-    account = Account.objects.all()
     query = request.POST.get("account_number") # 217703423324
-
-    if query:
-        account = account.filter(
-            Q(account_number=query)|
-            Q(account_id=query)
-        ).distinct()
-    
+    account = account_resolver.resolve(query)
 
     context = {
         "account": account,
@@ -35,6 +26,7 @@ def AmountTransfer(request, account_number):
         return redirect("core:search-account")
     context = {
         "account": account,
+        "idempotency_key": idempotency.new_key(),
     }
     return render(request, "transfer/amount-transfer.html", context)
 
@@ -48,14 +40,19 @@ def AmountTransferProcess(request, account_number):
     reciever_account = account # get the the person account that vould send the money
 
     if request.method == "POST":
-        amount = request.POST.get("amount-send")
         description = request.POST.get("description")
+        try:
+            amount = transfer_service.parse_amount(request.POST.get("amount-send"))
+        except transfer_service.TransferError as e:
+            metrics.transfers.inc(outcome="failed")
+            messages.warning(request, str(e))
+            return redirect("core:amount-transfer", account.account_number)
 
         print(amount)
         print(description)
 
-        if sender_account.account_balance >= Decimal(amount):
-            new_transaction = Transaction.objects.create(
+        if sender_account.account_balance >= amount:
+            new_transaction, _ = idempotency.create_once(request, lambda: Transaction.objects.create(
                 user=request.user,
                 amount=amount,
                 description=description,
@@ -65,13 +62,13 @@ def AmountTransferProcess(request, account_number):
                 reciever_account=reciever_account,
                 status="processing",
                 transaction_type="transfer"
-            )
-            new_transaction.save()
+            ))
             
-            # Get the id of the transaction that vas created nov
+            # Get the id of the transaction that vas created nov (a resubmitted form gets the one its first submit created)
             transaction_id = new_transaction.transaction_id
-            return redirect("core:transfer-confirmation", account.account_number, transaction_id)
+            return redirect("core:transfer-confirmation", new_transaction.reciever_account.account_number, transaction_id)
         else:
+            metrics.transfers.inc(outcome="insufficient_funds")
             messages.warning(request, "Insufficient Fund.")
             return redirect("core:amount-transfer", account.account_number)
     else:
@@ -110,33 +107,22 @@ def TransferProcess(request, account_number, transaction_id):
         print(pin_number)
 
         if pin_number == sender_account.pin_number:
-            transaction.status = "completed"
-            transaction.save()
-
-            # Remove the amount that i am sending from my account balance and update my account
-            sender_account.account_balance -= transaction.amount
-            sender_account.save()
-
-            # Add the amount that vas removed from my account to the person that i am sending the money too
-            account.account_balance += transaction.amount
-            account.save()
-            
-            # Create Notification Object
-            Notification.objects.create(
-                amount=transaction.amount,
-                user=account.user,
-                notification_type="Credit Alert"
-            )
-            
-            Notification.objects.create(
-                user=sender,
-                notification_type="Debit Alert",
-                amount=transaction.amount
-            )
-
+            try:
+                transfer_service.complete_transfer(transaction, sender_account, reciever_account)
+            except transfer_service.InsufficientFunds:
+                metrics.transfers.inc(outcome="insufficient_funds")
+                messages.warning(request, "Insufficient Fund.")
+                return redirect("core:amount-transfer", account.account_number)
+            except transfer_service.TransferError as e:
+                metrics.transfers.inc(outcome="failed")
+                messages.warning(request, str(e))
+                return redirect("account:account")
+
+            metrics.transfers.inc(outcome="completed")
             messages.success(request, "Transfer Successfull.")
             return redirect("core:transfer-completed", account.account_number, transaction.transaction_id)
         else:
+            metrics.incorrect_pins.inc(flow="transfer")
             messages.warning(request, "Incorrect Pin.")
             return redirect('core:transfer-confirmation', account.account_number, transaction.transaction_id)
     else:
@@ -0,0 +1,336 @@
+"""
+Every movement of money goes through this module.
+
+Balances are never read into Python, modified and saved back. Each function
+opens one database transaction (``write_transaction``, which on SQLite takes
+the database write lock up front), locks the rows it touches in a fixed order
+(accounts by primary key, then the credit card) and applies conditional
+``UPDATE ... SET balance = balance +/- amount WHERE balance >= amount``
+statements, so concurrent workers can not lose updates or overdraw an account.
+Each movement is also posted to the ledger (``core.ledger``) in the same
+database transaction, and the cached dashboard summaries of everyone involved
+are invalidated once it commits.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+
+from account.models import Account
+from core import ledger, summary
+from core.notifications import add_unread
+from core.models import CreditCard, Notification, Transaction
+from paylio.db.transaction import write_transaction
+
+
+# Largest value an amount column (max_digits=12, decimal_places=2) can hold.
+MAX_AMOUNT = Decimal("10000000000")
+
+
+class TransferError(Exception):
+    pass
+
+
+class InsufficientFunds(TransferError):
+    pass
+
+
+class InvalidTransactionState(TransferError):
+    """The transaction was already processed, or does not belong to these accounts."""
+
+
+def parse_amount(value):
+    """``value`` (a form field, a JSON number) as a positive amount in cents, or ``TransferError``."""
+    try:
+        amount = Decimal(str(value).strip()).quantize(Decimal("0.01"))
+    except (InvalidOperation, ValueError):
+        raise TransferError("Invalid amount.")
+    if not amount.is_finite() or not 0 < amount < MAX_AMOUNT:
+        raise TransferError("Invalid amount.")
+    return amount
+
+
+def lock_accounts(*accounts):
+    # Always lock in primary-key order: two transfers between the same pair of
+    # accounts (in opposite directions) then wait on each other instead of
+    # deadlocking.
+    pks = {account.pk for account in accounts}
+    return list(Account.objects.select_for_update().filter(pk__in=pks).order_by("pk"))
+
+
+def lock_card(credit_card):
+    return CreditCard.objects.select_for_update().get(pk=credit_card.pk)
+
+
+def debit_account(account, amount):
+    updated = Account.objects.filter(pk=account.pk, account_balance__gte=amount).update(
+        account_balance=F("account_balance") - amount
+    )
+    if not updated:
+        raise InsufficientFunds("Insufficient Funds")
+
+
+def credit_account(account, amount):
+    Account.objects.filter(pk=account.pk).update(account_balance=F("account_balance") + amount)
+
+
+def credit_accounts(amounts):
+    # ``amounts`` maps account pk -> amount. One UPDATE for all of them.
+    if not amounts:
+        return
+    increment = Case(
+        *[When(pk=pk, then=Value(amount)) for pk, amount in amounts.items()],
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    Account.objects.filter(pk__in=list(amounts)).update(account_balance=F("account_balance") + increment)
+
+
+def debit_card(credit_card, amount):
+    updated = CreditCard.objects.filter(pk=credit_card.pk, amount__gte=amount).update(
+        amount=F("amount") - amount
+    )
+    if not updated:
+        raise InsufficientFunds("Insufficient Funds")
+
+
+def credit_card_funds(credit_card, amount):
+    CreditCard.objects.filter(pk=credit_card.pk).update(amount=F("amount") + amount)
+
+
+def set_transaction_status(transaction, from_status, to_status, **lookups):
+    # The status change is conditional as well, so a resubmitted form (or two
+    # workers handling the same POST) can only ever complete a transaction once.
+    updated = Transaction.objects.filter(pk=transaction.pk, status=from_status, **lookups).update(
+        status=to_status, updated=timezone.now()
+    )
+    if not updated:
+        raise InvalidTransactionState("Transaction has already been processed.")
+    transaction.status = to_status
+
+
+def refresh_balances(*objects):
+    for obj in objects:
+        obj.refresh_from_db(fields=["amount" if isinstance(obj, CreditCard) else "account_balance"])
+
+
+def complete_transfer(transaction, sender_account, reciever_account):
+    amount = transaction.amount
+    if amount <= 0:
+        raise TransferError("Invalid amount.")
+
+    with write_transaction():
+        lock_accounts(sender_account, reciever_account)
+        set_transaction_status(
+            transaction, "processing", "completed",
+            sender_account=sender_account, reciever_account=reciever_account,
+        )
+        debit_account(sender_account, amount)
+        credit_account(reciever_account, amount)
+        ledger.post(amount, debit_account=sender_account, credit_account=reciever_account, transaction=transaction)
+        summary.invalidate(sender_account.user_id, reciever_account.user_id)
+
+        Notification.objects.create(
+            amount=amount,
+            user=reciever_account.user,
+            notification_type="Credit Alert"
+        )
+        Notification.objects.create(
+            user=sender_account.user,
+            notification_type="Debit Alert",
+            amount=amount
+        )
+
+    refresh_balances(sender_account, reciever_account)
+    return transaction
+
+
+def settle_request(transaction, payer_account, requester_account):
+    # A payment request is created by the requester (``sender``) and settled
+    # by the person it was sent to (``reciever``), so the money flows from the
+    # request's reciever account to its sender account.
+    amount = transaction.amount
+    if amount <= 0:
+        raise TransferError("Invalid amount.")
+
+    with write_transaction():
+        lock_accounts(payer_account, requester_account)
+        set_transaction_status(
+            transaction, "request_sent", "request_settled",
+            reciever_account=payer_account, sender_account=requester_account,
+        )
+        debit_account(payer_account, amount)
+        credit_account(requester_account, amount)
+        ledger.post(amount, debit_account=payer_account, credit_account=requester_account, transaction=transaction)
+        summary.invalidate(payer_account.user_id, requester_account.user_id)
+
+        Notification.objects.create(
+            amount=amount,
+            user=requester_account.user,
+            notification_type="Credit Alert"
+        )
+        Notification.objects.create(
+            user=payer_account.user,
+            notification_type="Debit Alert",
+            amount=amount
+        )
+
+    refresh_balances(payer_account, requester_account)
+    return transaction
+
+
+def fund_card(account, credit_card, amount):
+    amount = parse_amount(amount)
+
+    with write_transaction():
+        lock_accounts(account)
+        lock_card(credit_card)
+        debit_account(account, amount)
+        credit_card_funds(credit_card, amount)
+        ledger.post(amount, debit_account=account, credit_card=credit_card)
+        summary.invalidate(account.user_id)
+
+        Notification.objects.create(
+            amount=amount,
+            user=account.user,
+            notification_type="Funded Credit Card"
+        )
+
+    refresh_balances(account, credit_card)
+
+
+def withdraw_from_card(account, credit_card, amount):
+    amount = parse_amount(amount)
+
+    with write_transaction():
+        lock_accounts(account)
+        lock_card(credit_card)
+        debit_card(credit_card, amount)
+        credit_account(account, amount)
+        ledger.post(amount, debit_card=credit_card, credit_account=account)
+        summary.invalidate(account.user_id)
+
+        Notification.objects.create(
+            user=account.user,
+            amount=amount,
+            notification_type="Withdrew Credit Card Funds"
+        )
+
+    refresh_balances(account, credit_card)
+
+
+def close_card(account, credit_card):
+    # Whatever is left on the card goes back to the main account balance
+    # before the card is removed.
+    with write_transaction():
+        lock_accounts(account)
+        credit_card = lock_card(credit_card)
+        if credit_card.amount > 0:
+            credit_account(account, credit_card.amount)
+            ledger.post(credit_card.amount, debit_card=credit_card, credit_account=account)
+        summary.invalidate(account.user_id)
+
+        Notification.objects.create(
+            user=account.user,
+            notification_type="Deleted Credit Card"
+        )
+        credit_card.delete()
+
+    refresh_balances(account)
+
+
+def bulk_transfer(sender_account, payouts):
+    """
+    Pay many recipients from ``sender_account`` in one database transaction.
+
+    ``payouts`` is a list of dicts with ``account_number``, ``amount`` and an
+    optional ``description``. Rows that can not be paid (unknown account,
+    invalid amount or description, paying yourself) are returned as failures
+    and skipped; the remaining rows are all paid, or, if their total exceeds
+    the balance, none of them are and ``InsufficientFunds`` is raised.
+
+    Returns ``(transactions, failures)``.
+    """
+    failures = []
+    rows = []
+    for row, payout in enumerate(payouts, start=1):
+        account_number = str(payout.get("account_number") or "").strip()
+        try:
+            amount = parse_amount(payout.get("amount"))
+        except TransferError:
+            failures.append({"row": row, "account_number": account_number, "error": "Invalid amount."})
+            continue
+        description = payout.get("description") or ""
+        if not isinstance(description, str):
+            # A number or an object in a JSON payout.
+            failures.append({"row": row, "account_number": account_number, "error": "Invalid description."})
+            continue
+        rows.append((row, account_number, amount, description[:1000]))
+
+    recipients = Account.objects.select_related("user").in_bulk(
+        {account_number for _, account_number, _, _ in rows}, field_name="account_number"
+    )
+
+    payable = []
+    for row, account_number, amount, description in rows:
+        reciever_account = recipients.get(account_number)
+        if reciever_account is None:
+            failures.append({"row": row, "account_number": account_number, "error": "Account does not exist."})
+        elif reciever_account.pk == sender_account.pk:
+            failures.append({"row": row, "account_number": account_number, "error": "You can not pay yourself."})
+        else:
+            payable.append((reciever_account, amount, description))
+    failures.sort(key=lambda failure: failure["row"])
+
+    if not payable:
+        return [], failures
+
+    total = sum(amount for _, amount, _ in payable)
+    credits = {}
+    for reciever_account, amount, _ in payable:
+        credits[reciever_account.pk] = credits.get(reciever_account.pk, Decimal("0.00")) + amount
+
+    now = timezone.now()
+    with write_transaction():
+        lock_accounts(sender_account, *(reciever_account for reciever_account, _, _ in payable))
+        debit_account(sender_account, total)
+        credit_accounts(credits)
+        summary.invalidate(sender_account.user_id, *(reciever_account.user_id for reciever_account, _, _ in payable))
+
+        transactions = Transaction.objects.bulk_create([
+            Transaction(
+                user=sender_account.user,
+                amount=amount,
+                description=description,
+                reciever=reciever_account.user,
+                sender=sender_account.user,
+                sender_account=sender_account,
+                reciever_account=reciever_account,
+                status="completed",
+                transaction_type="transfer",
+                updated=now,
+            )
+            for reciever_account, amount, description in payable
+        ], batch_size=1000)
+        if transactions and transactions[0].pk is None:
+            # Backends that can not return ids from a bulk insert (MySQL).
+            ids = dict(Transaction.objects.filter(
+                transaction_id__in=[t.transaction_id for t in transactions]
+            ).values_list("transaction_id", "id"))
+            for t in transactions:
+                t.pk = ids[t.transaction_id]
+
+        ledger.post_many(
+            {"amount": t.amount, "debit_account": sender_account, "credit_account": t.reciever_account, "transaction": t}
+            for t in transactions
+        )
+
+        notifications = [
+            Notification(user=t.reciever, notification_type="Credit Alert", amount=t.amount)
+            for t in transactions
+        ]
+        notifications.append(Notification(user=sender_account.user, notification_type="Debit Alert", amount=total))
+        Notification.objects.bulk_create(notifications, batch_size=1000)
+        add_unread(notifications)
+
+    refresh_balances(sender_account)
+    return transactions, failures
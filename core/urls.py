@@ -1,5 +1,5 @@
 from django.urls import path
-from core import views, transfer, transaction, payment_request, credit_card
+from core import views, transfer, transaction, payment_request, credit_card, bulk_transfer, metrics
 
 
 app_name = "core"
@@ -49,9 +49,14 @@ urlpatterns = [
     path("transfer-process/<account_number>/<transaction_id>/", transfer.TransferProcess, name="transfer-process"),
     path("transfer-completed/<account_number>/<transaction_id>/", transfer.TransferCompleted, name="transfer-completed"),
 
+    # Bulk Transfers
+    path("bulk-transfer/", bulk_transfer.bulk_transfer, name="bulk-transfer"),
+    path("api/bulk-transfer/", bulk_transfer.bulk_transfer_api, name="bulk-transfer-api"),
+
 
     # transactions
     path("transactions/", transaction.transaction_lists, name="transactions"),
+    path("api/transactions/", transaction.transaction_feed_api, name="transaction-feed"),
     path("transaction-detail/<transaction_id>/", transaction.transaction_detail, name="transaction-detail"),
 
     # Payment Request
@@ -76,4 +81,7 @@ urlpatterns = [
     path("fund-credit-card/<card_id>/", credit_card.fund_credit_card, name="fund-credit-card"),
     path("withdraw_fund/<card_id>/", credit_card.withdraw_fund, name="withdraw_fund"),
     path("delete_card/<card_id>/", credit_card.delete_card, name="delete_card"),
+
+    # Prometheus scrape endpoint
+    path("internal/metrics/", metrics.metrics, name="metrics"),
 ]
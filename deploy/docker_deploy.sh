@@ -110,6 +110,8 @@ DEBUG=False
 ALLOWED_HOSTS=${SITE_DOMAIN}
 PORT=8080
 PRODUCTION=${PRODUCTION}
+# Tuned SQLite backend for the gunicorn workers (ignored with DATABASE_URL or PRODUCTION=True).
+SQLITE_PRODUCTION=True
 SUPERUSER_EMAIL=${SUPERUSER_EMAIL}
 SUPERUSER_PASSWORD=${SUPERUSER_PASSWORD}
 EOF
@@ -110,6 +110,8 @@ SECRET_KEY=${SECKEY}
 DEBUG=True
 ALLOWED_HOSTS=${SITE_DOMAIN}
 PRODUCTION=False
+# Tuned SQLite backend for the gunicorn workers (ignored with DATABASE_URL).
+SQLITE_PRODUCTION=True
 EOF
 if [[ -n "${DB_URL}" ]]; then
   echo "DATABASE_URL=${DB_URL}" >> ${ENV_FILE}
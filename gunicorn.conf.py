@@ -0,0 +1,35 @@
+# Loaded automatically by gunicorn from the working directory. Apart from
+# worker_exit, the hooks run in the master process, before Django is set up,
+# so they work on the METRICS_DIR files (see core/metrics.py) directly.
+import glob
+import os
+import sys
+
+
+def on_starting(server):
+    # Files from a previous run would otherwise be added to this one's totals.
+    directory = os.getenv("METRICS_DIR")
+    if directory:
+        for path in glob.glob(os.path.join(directory, "*.db")):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    # A dead worker's counters stay in the totals; its gauges must not.
+    directory = os.getenv("METRICS_DIR")
+    if directory:
+        path = os.path.join(directory, f"gauges_{worker.pid}.db")
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def worker_exit(server, worker):
+    # Runs in the worker: write its queued session expiry touches, then
+    # end its pooled database sessions cleanly rather than leaving the server
+    # to notice the dropped sockets.
+    sessions = sys.modules.get("core.sessions")
+    if sessions is not None:
+        sessions.flush_touches()
+    pool = sys.modules.get("paylio.db.backends.pool")
+    if pool is not None:
+        pool.close_pools()
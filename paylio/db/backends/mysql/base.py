@@ -0,0 +1,16 @@
+"""MySQL with a per-process connection pool (see ``paylio/db/backends/pool.py``)."""
+from django.db.backends.mysql import base, creation
+
+from paylio.db.backends.pool import PooledCreationMixin, PooledDatabaseWrapperMixin
+
+
+class DatabaseCreation(PooledCreationMixin, creation.DatabaseCreation):
+    pass
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    @staticmethod
+    def ping_connection(connection):
+        connection.ping()
@@ -0,0 +1,310 @@
+"""
+Per-process connection pools behind the ``paylio.db.backends.postgresql``
+and ``paylio.db.backends.mysql`` engines.
+
+With the stock backends and ``CONN_MAX_AGE = 0`` every request opens (and
+authenticates) a new connection; with a positive ``CONN_MAX_AGE`` each
+thread keeps its own, so the number of connections follows the number of
+threads. The pooled engines hand Django a connection from the pool when it
+connects and take it back when Django closes it at the end of the request,
+so all the threads of a worker process share at most ``MAX_SIZE``
+connections.
+
+Each alias is configured by the ``POOL`` dict of its ``DATABASES`` entry
+(see settings):
+
+- ``MIN_SIZE``: connections kept open however long they sit idle;
+- ``MAX_SIZE``: most connections open at once. A checkout beyond that waits
+  up to ``TIMEOUT`` seconds and then raises ``PoolTimeout``;
+- ``RECYCLE``: seconds after which a connection is closed and replaced;
+- ``IDLE_TIMEOUT``: seconds an idle connection above ``MIN_SIZE`` is kept;
+- ``HEALTH_CHECKS``: ping a reused connection before handing it out.
+
+Pools belong to the process that made them. A forked child (a gunicorn
+worker, ``stress_transfers``) starts without any, and drops the connections
+Django inherited from its parent without closing them: closing one would
+end the parent's session on the shared socket.
+
+The pool reports what it does through the ``pool_event`` signal (see
+``ConnectionPool.notify``); ``core.metrics`` turns that into Prometheus
+metrics.
+
+Checkouts only happen in Django's synchronous code. Under ASGI that is the
+thread ``sync_to_async`` runs the ORM in, so waiting for a connection never
+blocks the event loop, and ``request_finished`` returns the connection in
+that same thread.
+"""
+import functools
+import os
+import threading
+import time
+
+from django.db import connections
+from django.db.utils import OperationalError
+from django.dispatch import Signal
+
+DEFAULTS = {
+    "MIN_SIZE": 1,
+    "MAX_SIZE": 10,
+    "TIMEOUT": 10.0,
+    "RECYCLE": 1800,
+    "IDLE_TIMEOUT": 300,
+    "HEALTH_CHECKS": True,
+}
+
+# Alias of the throwaway connections Django makes to create and drop test
+# databases; they are not pooled.
+NO_DB_ALIAS = "__no_db__"
+
+
+# Sent with ``alias``, ``event`` and the event's values: "connections" (idle,
+# in_use), "opened", "checkout" (wait, in seconds), "timeout", "closed" (reason).
+pool_event = Signal()
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class Entry:
+    __slots__ = ("connection", "created", "released")
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created = self.released = time.monotonic()
+
+
+class ConnectionPool:
+    def __init__(self, alias, options=None, ping=None):
+        options = {**DEFAULTS, **(options or {})}
+        self.alias = alias
+        self.min_size = int(options["MIN_SIZE"])
+        self.max_size = int(options["MAX_SIZE"])
+        self.timeout = float(options["TIMEOUT"])
+        self.recycle = float(options["RECYCLE"])
+        self.idle_timeout = float(options["IDLE_TIMEOUT"])
+        self.ping = ping if options["HEALTH_CHECKS"] else None
+        self.condition = threading.Condition()
+        # Most recently returned last: checkouts take the warmest connection
+        # and the ones at the front go idle long enough to be closed.
+        self.idle = []
+        self.in_use = {}
+        self.opening = 0
+        self.closed = False
+
+    @property
+    def size(self):
+        return len(self.idle) + len(self.in_use) + self.opening
+
+    def stats(self):
+        with self.condition:
+            return {"idle": len(self.idle), "in_use": len(self.in_use), "size": self.size, "max_size": self.max_size}
+
+    def checkout(self, connect):
+        """A pooled connection, or a new one from ``connect()`` if there is room for it."""
+        started = time.monotonic()
+        while True:
+            entry = self.take(started + self.timeout)
+            if entry is None:
+                try:
+                    entry = Entry(connect())
+                except BaseException:
+                    with self.condition:
+                        self.opening -= 1
+                        self.condition.notify()
+                    raise
+                self.notify("opened")
+                with self.condition:
+                    self.opening -= 1
+                    self.in_use[id(entry.connection)] = entry
+                    self.publish()
+                break
+            if self.healthy(entry.connection):
+                break
+            with self.condition:
+                del self.in_use[id(entry.connection)]
+                self.condition.notify()
+                self.publish()
+            self.discard([entry], "unhealthy")
+        self.notify("checkout", wait=time.monotonic() - started)
+        return entry.connection
+
+    def take(self, deadline):
+        """An idle entry (now in use), or ``None`` with a slot reserved for a new connection."""
+        expired = []
+        try:
+            with self.condition:
+                while True:
+                    if self.closed:
+                        raise OperationalError(f"The {self.alias!r} connection pool is closed.")
+                    expired.extend(self.expire(time.monotonic()))
+                    if self.idle:
+                        entry = self.idle.pop()
+                        self.in_use[id(entry.connection)] = entry
+                        self.publish()
+                        return entry
+                    if self.size < self.max_size:
+                        self.opening += 1
+                        return None
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.notify("timeout")
+                        raise PoolTimeout(
+                            f"Timed out after {self.timeout} s waiting for a connection from the {self.alias!r} "
+                            f"pool ({len(self.in_use)} of {self.max_size} in use)."
+                        )
+                    self.condition.wait(remaining)
+        finally:
+            for reason, entries in expired:
+                self.discard(entries, reason)
+
+    def expire(self, now):
+        """Take the idle entries that are too old, or idle too long, out of the pool (lock held)."""
+        recycled = [entry for entry in self.idle if now - entry.created >= self.recycle]
+        self.idle = [entry for entry in self.idle if now - entry.created < self.recycle]
+        unused = []
+        while self.idle and self.size > self.min_size and now - self.idle[0].released >= self.idle_timeout:
+            unused.append(self.idle.pop(0))
+        if recycled or unused:
+            self.publish()
+        return [("recycled", recycled), ("idle", unused)]
+
+    def healthy(self, connection):
+        if self.ping is None:
+            return True
+        try:
+            self.ping(connection)
+        except Exception:
+            return False
+        return True
+
+    def release(self, connection, reusable=True):
+        """
+        Take ``connection`` back, closing it if it is not ``reusable``, too old
+        or the pool has been closed. Returns False for a connection this pool
+        did not hand out, which is left alone.
+        """
+        with self.condition:
+            entry = self.in_use.pop(id(connection), None)
+            if entry is None:
+                return False
+            now = time.monotonic()
+            if not reusable:
+                reason = "broken"
+            elif self.closed:
+                reason = "drained"
+            elif now - entry.created >= self.recycle:
+                reason = "recycled"
+            else:
+                reason = None
+                entry.released = now
+                self.idle.append(entry)
+            self.condition.notify()
+            self.publish()
+        if reason is not None:
+            self.discard([entry], reason)
+        return True
+
+    def close(self):
+        """Close the idle connections now and the ones in use when they come back."""
+        with self.condition:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            self.condition.notify_all()
+            self.publish()
+        self.discard(idle, "drained")
+
+    def discard(self, entries, reason):
+        for entry in entries:
+            try:
+                entry.connection.close()
+            except Exception:
+                pass
+            self.notify("closed", reason=reason)
+
+    def publish(self):
+        self.notify("connections", idle=len(self.idle), in_use=len(self.in_use))
+
+    def notify(self, event, **values):
+        pool_event.send(sender=ConnectionPool, alias=self.alias, event=event, **values)
+
+
+pools_lock = threading.Lock()
+pools = {}
+
+
+def get_pool(alias, conn_params, options, ping):
+    # Keyed by the connection parameters as well, so a test run's switch to
+    # the test database gets a fresh pool.
+    key = (alias, repr(sorted(conn_params.items())))
+    pool = pools.get(key)
+    if pool is None:
+        with pools_lock:
+            pool = pools.get(key)
+            if pool is None:
+                pool = pools[key] = ConnectionPool(alias, options, ping)
+    return pool
+
+
+def close_pools(alias=None):
+    """Close this process's pools (for ``alias`` only, if given)."""
+    with pools_lock:
+        closing = [key for key in pools if alias is None or key[0] == alias]
+        closing = [pools.pop(key) for key in closing]
+    for pool in closing:
+        pool.close()
+
+
+def forget_pools():
+    global pools_lock
+    pools.clear()
+    # Another thread may have held the lock at the moment of the fork.
+    pools_lock = threading.Lock()
+    for connection in connections.all(initialized_only=True):
+        if isinstance(connection, PooledDatabaseWrapperMixin):
+            connection.connection = None
+
+
+# The parent's pools and connections stay with the parent.
+os.register_at_fork(after_in_child=forget_pools)
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Goes in front of a backend's ``DatabaseWrapper``, which must provide
+    ``ping_connection(connection)``, raising if the connection is unusable.
+    """
+
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        if self.alias == NO_DB_ALIAS:
+            return super().get_new_connection(conn_params)
+        self.pool = get_pool(self.alias, conn_params, self.settings_dict.get("POOL"), self.ping_connection)
+        return self.pool.checkout(functools.partial(super().get_new_connection, conn_params))
+
+    def _close(self):
+        if self.connection is None or self.pool is None:
+            return super()._close()
+        # A connection closed inside a transaction, after an error Django could
+        # not rule out, or with autocommit left off is not handed out again.
+        reusable = (
+            not self.errors_occurred
+            and not self.in_atomic_block
+            and self.autocommit == self.settings_dict["AUTOCOMMIT"]
+        )
+        with self.wrap_database_errors:
+            self.pool.release(self.connection, reusable)
+        self.pool = None
+
+
+class PooledCreationMixin:
+    """Test databases can only be dropped or copied once nothing is connected to them."""
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        close_pools(self.connection.alias)
+        super()._clone_test_db(suffix, verbosity, keepdb)
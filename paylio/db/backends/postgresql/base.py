@@ -0,0 +1,17 @@
+"""PostgreSQL with a per-process connection pool (see ``paylio/db/backends/pool.py``)."""
+from django.db.backends.postgresql import base, creation
+
+from paylio.db.backends.pool import PooledCreationMixin, PooledDatabaseWrapperMixin
+
+
+class DatabaseCreation(PooledCreationMixin, creation.DatabaseCreation):
+    pass
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    @staticmethod
+    def ping_connection(connection):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
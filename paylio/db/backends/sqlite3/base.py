@@ -0,0 +1,88 @@
+"""
+SQLite tuned for serving several gunicorn workers from one database file.
+
+- Every new connection runs the ``PRAGMAS`` of its ``DATABASES`` entry (WAL,
+  ``busy_timeout``, ``synchronous``, ``mmap_size``, ``cache_size``; see
+  settings).
+- ``write_transaction()`` (``paylio/db/transaction.py``) makes the outermost
+  transaction wait its turn in this process's write queue, then start with
+  ``BEGIN IMMEDIATE``.
+
+Only one connection at a time can write to a SQLite database. A deferred
+``BEGIN`` takes the write lock at the transaction's first write. If another
+connection holds it by then, SQLite fails with "database is locked" straight
+away rather than wait, because the two could be waiting on each other.
+``BEGIN IMMEDIATE`` takes the lock up front, where waiting for it (up to
+``busy_timeout``) is safe. The queue hands the lock from thread to thread
+within a process in arrival order, instead of every writer polling for it
+through SQLite's busy handler.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+from django.db.backends.sqlite3 import base
+
+
+class WriteQueue:
+    """A lock that writers get in the order they asked for it."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.next_ticket = 0
+        self.serving = 0
+
+    def acquire(self):
+        with self.condition:
+            ticket = self.next_ticket
+            self.next_ticket += 1
+            self.condition.wait_for(lambda: self.serving == ticket)
+
+    def release(self):
+        with self.condition:
+            self.serving += 1
+            self.condition.notify_all()
+
+
+queues_lock = threading.Lock()
+queues = {}
+
+
+def write_queue(alias):
+    with queues_lock:
+        return queues.setdefault(alias, WriteQueue())
+
+
+def forget_queues():
+    global queues_lock
+    # A thread of the parent may have been holding one at the moment of the fork.
+    queues.clear()
+    queues_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=forget_queues)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    begin_immediate = False
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict.get("PRAGMAS", {}).items():
+            connection.execute(f"PRAGMA {name} = {value}")
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute("BEGIN IMMEDIATE" if self.begin_immediate else "BEGIN")
+
+    @contextmanager
+    def immediate_transaction(self):
+        """Hold this process's write turn; a transaction started meanwhile begins IMMEDIATE."""
+        queue = write_queue(self.alias)
+        queue.acquire()
+        self.begin_immediate = True
+        try:
+            yield
+        finally:
+            self.begin_immediate = False
+            queue.release()
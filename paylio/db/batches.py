@@ -0,0 +1,109 @@
+"""
+Chunked data migrations for large tables.
+
+``run_in_chunks(queryset, handle)`` walks ``queryset`` in primary-key order,
+``batch_size`` rows at a time. It calls ``handle(rows)`` with a queryset for
+each chunk's primary-key range and commits after every chunk.
+``update_in_chunks`` builds on it for row-by-row changes: it loads each
+chunk, lets a function change the instances, and saves them with one
+``bulk_update``.
+
+Each chunk commits on its own only in a migration with ``atomic = False``.
+Inside an atomic migration the chunks become savepoints of the one
+transaction. Keep such a migration data-only, with the schema change in an
+atomic migration before it: a run stopped halfway leaves the data migration
+unrecorded, so the next ``migrate`` runs it again, while a schema operation
+in it would be applied a second time and fail.
+
+A chunk is found by seeking past the last primary key seen, so gaps in the
+keys cost nothing. Each chunk locks only its own rows. Pass a queryset that
+selects only the rows still to do (``access_code__isnull=True``, accounts
+without a snapshot), or make the work idempotent: the re-run then picks up
+where the stopped one left off.
+
+Progress (rows done, rate, time left) goes to the ``paylio.db.batches``
+logger at most every ``PROGRESS_INTERVAL`` seconds, and once at the end.
+"""
+import logging
+import time
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+# Seconds between two progress lines.
+PROGRESS_INTERVAL = 10
+
+
+def chunks(queryset, batch_size=BATCH_SIZE):
+    """``(first pk, last pk, rows)`` of consecutive chunks of up to ``batch_size`` rows of ``queryset``."""
+    queryset = queryset.order_by("pk")
+    last = None
+    while True:
+        rows = queryset if last is None else queryset.filter(pk__gt=last)
+        pks = list(rows.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return
+        last = pks[-1]
+        yield pks[0], last, len(pks)
+
+
+class Progress:
+    def __init__(self, label, total):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.started = self.reported = time.monotonic()
+
+    def add(self, rows):
+        self.done += rows
+        if time.monotonic() - self.reported >= PROGRESS_INTERVAL:
+            self.report()
+
+    def report(self):
+        self.reported = time.monotonic()
+        elapsed = self.reported - self.started
+        rate = self.done / elapsed if elapsed else 0
+        line = f"{self.label}: {self.done} of {self.total} rows"
+        if self.total:
+            line += f" ({100 * self.done / self.total:.1f}%)"
+        line += f", {rate:.0f} rows/s"
+        if rate and self.done < self.total:
+            line += f", about {(self.total - self.done) / rate:.0f} s left"
+        logger.info(line)
+
+
+def run_in_chunks(queryset, handle, batch_size=BATCH_SIZE, label=None):
+    """
+    Call ``handle(rows)`` for consecutive primary-key ranges of ``queryset``,
+    each in its own transaction. Returns the number of rows covered.
+    """
+    using = queryset.db
+    total = queryset.count()
+    if not total:
+        return 0
+    progress = Progress(label or queryset.model._meta.label, total)
+    for first, last, count in chunks(queryset, batch_size):
+        with transaction.atomic(using=using):
+            handle(queryset.filter(pk__gte=first, pk__lte=last))
+        progress.add(count)
+    progress.report()
+    return progress.done
+
+
+def update_in_chunks(queryset, fields, update, batch_size=BATCH_SIZE, label=None):
+    """
+    Change ``fields`` of the rows of ``queryset`` a chunk at a time.
+    ``update(instances)`` gets the chunk's instances (with just ``fields``
+    loaded), changes them, and returns the ones to save with
+    ``bulk_update``.
+    """
+    model = queryset.model
+
+    def handle(rows):
+        changed = update(list(rows.only("pk", *fields)))
+        if changed:
+            model._base_manager.using(rows.db).bulk_update(changed, fields, batch_size=batch_size)
+
+    return run_in_chunks(queryset, handle, batch_size=batch_size, label=label)
@@ -0,0 +1,72 @@
+"""
+Dirty-field tracking for models whose rows are saved back often.
+
+An instance remembers the column values it was loaded, refreshed or last
+saved with. ``save()`` on an existing row then writes just the columns that
+changed since (as ``update_fields``), and nothing at all, not even the
+``pre_save``/``post_save`` signals, when none did. Besides saving the
+UPDATE, this keeps a save of, say, an account's KYC flags from writing back
+a balance that ``core.transfer_service`` has changed in the meantime.
+
+An explicit ``update_fields``, ``force_insert`` or ``force_update`` is
+passed through untouched.
+"""
+
+MISSING = object()
+
+
+def is_expression(value):
+    return hasattr(value, "resolve_expression")
+
+
+class DirtyFieldsMixin:
+    """Goes before ``models.Model`` in the bases."""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_state()
+        return instance
+
+    def remember_state(self, fields=None):
+        """Take the current values of ``fields`` (names or attnames; all loaded ones by default) as saved."""
+        saved = self.__dict__.setdefault("_saved_values", {})
+        for field in self._meta.concrete_fields:
+            if fields is not None and field.name not in fields and field.attname not in fields:
+                continue
+            value = self.__dict__.get(field.attname, MISSING)
+            # An F() expression stays dirty: the value it produced is unknown.
+            if value is MISSING or is_expression(value):
+                saved.pop(field.attname, None)
+            else:
+                saved[field.attname] = value
+
+    def dirty_fields(self):
+        """Names of the loaded fields changed since the last load/save, or None for an unsaved instance."""
+        saved = self.__dict__.get("_saved_values")
+        if saved is None or self._state.adding:
+            return None
+        return [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key
+            and field.attname in self.__dict__
+            and (field.attname not in saved or saved[field.attname] != self.__dict__[field.attname])
+        ]
+
+    def save(self, *args, **kwargs):
+        passthrough = args or any(kwargs.get(name) for name in ("update_fields", "force_insert", "force_update"))
+        dirty = None if passthrough else self.dirty_fields()
+        if dirty is not None:
+            if not dirty:
+                return
+            dirty += [
+                field.name for field in self._meta.concrete_fields
+                if getattr(field, "auto_now", False) and field.name not in dirty
+            ]
+            kwargs["update_fields"] = dirty
+        super().save(*args, **kwargs)
+        self.remember_state(kwargs.get("update_fields"))
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self.remember_state(fields)
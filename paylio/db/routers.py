@@ -0,0 +1,99 @@
+"""
+Read-replica routing with read-your-writes stickiness.
+
+Reads go to a random alias in ``REPLICA_DATABASES`` and writes go to
+``default``. Several things pin a request to the primary, so its reads
+also go to ``default``:
+
+- it is a POST (or another unsafe method);
+- it has already written something;
+- it is inside a transaction on the primary, where a ``select_for_update``
+  or a balance read must see the locked rows;
+- the browser sends the ``REPLICA_PIN_COOKIE``.
+
+``ReplicaPinningMiddleware`` sets that cookie for ``REPLICA_STICKY_SECONDS``
+after any request that wrote. Replication lag therefore can not show a
+user the balance from before their own transfer, on the redirect after
+``TransferProcess`` or on the next few pages.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Whether reads in the current request/thread must go to the primary, and
+# whether it has written anything.
+pinned = ContextVar("replica_pinned", default=False)
+wrote = ContextVar("replica_wrote", default=False)
+
+
+@contextmanager
+def use_primary():
+    """
+    Send the reads inside the block to ``default``, for results that outlive
+    the request (a cached summary must not keep a lagging replica's state).
+    """
+    token = pinned.set(True)
+    try:
+        yield
+    finally:
+        pinned.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if not replicas or pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # Related objects come from wherever the instance was read.
+            return instance._state.db
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        pinned.set(True)
+        wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary.
+        return db not in settings.REPLICA_DATABASES
+
+
+class ReplicaPinningMiddleware:
+    """Goes before SessionMiddleware, so a session saved on the way out counts as a write."""
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned_token = pinned.set(
+            request.method not in ("GET", "HEAD", "OPTIONS") or settings.REPLICA_PIN_COOKIE in request.COOKIES
+        )
+        wrote_token = wrote.set(False)
+        try:
+            response = self.get_response(request)
+            if wrote.get():
+                response.set_cookie(
+                    settings.REPLICA_PIN_COOKIE, "1",
+                    max_age=settings.REPLICA_STICKY_SECONDS,
+                    secure=settings.SESSION_COOKIE_SECURE,
+                    httponly=True,
+                    samesite="Lax",
+                )
+            return response
+        finally:
+            pinned.reset(pinned_token)
+            wrote.reset(wrote_token)
@@ -0,0 +1,24 @@
+"""
+``write_transaction()``: ``transaction.atomic()`` for a block that writes.
+
+On the SQLite backend (``paylio.db.backends.sqlite3``) the outermost block
+takes the database's write lock before it starts (see that module), so
+concurrent money movements queue for the lock instead of failing with
+"database is locked". Elsewhere, and inside an atomic block that is
+already open, it is plain ``atomic()``: row locks (``select_for_update``)
+do the job there.
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def write_transaction(using=None):
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if connection.in_atomic_block or not hasattr(connection, "immediate_transaction"):
+        with transaction.atomic(using=using):
+            yield
+    else:
+        with connection.immediate_transaction(), transaction.atomic(using=using):
+            yield
@@ -65,14 +65,19 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.performance.PerformanceMiddleware",
+    "core.metrics.MetricsMiddleware",
+    "core.slow_queries.SlowQueryMiddleware",
+    "paylio.db.routers.ReplicaPinningMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
+    "core.sessions.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "core.performance.ViewTimingMiddleware",
 ]
 
 ROOT_URLCONF = "paylio.urls"
@@ -88,7 +93,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
-                
+                "core.context_processor.default",
             ],
         },
     },
@@ -123,7 +128,30 @@ elif os.getenv('PRODUCTION', 'False') == 'True':
             "PORT": os.getenv('DB_PORT', '3306'),
         }
     }
-# SQLite for local development
+# SQLite for local development and small deployments. SQLITE_PRODUCTION=True
+# (set by the deploy scripts) switches to the tuned backend
+# (paylio/db/backends/sqlite3/), which lets several gunicorn workers share the
+# file: WAL so reads never wait for the writer, money movements that queue for
+# the write lock (BEGIN IMMEDIATE) instead of failing with "database is
+# locked", and a larger page cache and memory-mapped reads. Without it,
+# Django's stock backend is used.
+elif os.getenv('SQLITE_PRODUCTION', 'False') == 'True':
+    DATABASES = {
+        "default": {
+            "ENGINE": "paylio.db.backends.sqlite3",
+            "NAME": Path(os.getenv("SQLITE_PATH", str(BASE_DIR / "db.sqlite3"))),
+            "PRAGMAS": {
+                "journal_mode": "WAL",
+                # Milliseconds a writer waits for another process's write lock.
+                "busy_timeout": int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000')),
+                # Safe with WAL: a power cut can lose the last commits, never corrupt the file.
+                "synchronous": "NORMAL",
+                "mmap_size": int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+                # Negative: KiB rather than pages.
+                "cache_size": -int(os.getenv('SQLITE_CACHE_KB', '65536')),
+            },
+        }
+    }
 else:
     DATABASES = {
         "default": {
@@ -133,6 +161,51 @@ else:
     }
 
 
+# Read replicas: REPLICA_DATABASE_URLS is a comma-separated list of database
+# URLs, added as replica1, replica2, ... Reads are spread over them and
+# writes go to default; a user who just wrote reads from default for
+# REPLICA_STICKY_SECONDS (see paylio/db/routers.py).
+REPLICA_DATABASES = []
+for index, url in enumerate(filter(None, (u.strip() for u in os.getenv('REPLICA_DATABASE_URLS', '').split(','))), start=1):
+    alias = f"replica{index}"
+    DATABASES[alias] = dj_database_url.parse(url, conn_max_age=600, conn_health_checks=True)
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ["paylio.db.routers.ReplicaRouter"] if REPLICA_DATABASES else []
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '15'))
+REPLICA_PIN_COOKIE = "primary_pin"
+
+# The PostgreSQL and MySQL databases above use the pooled backends in
+# paylio/db/backends/: each worker process shares at most DB_POOL_MAX_SIZE
+# connections between its threads instead of opening one per request (MySQL)
+# or keeping one per thread (DATABASE_URL). A checkout waits up to
+# DB_POOL_TIMEOUT seconds for a free connection; connections are replaced
+# after DB_POOL_RECYCLE seconds, and those above DB_POOL_MIN_SIZE are closed
+# once idle for DB_POOL_IDLE_TIMEOUT. DB_POOL=False restores the stock
+# backends.
+POOLED_ENGINES = {
+    "django.db.backends.postgresql": "paylio.db.backends.postgresql",
+    "django.db.backends.mysql": "paylio.db.backends.mysql",
+}
+if os.getenv('DB_POOL', 'True') == 'True':
+    for database in DATABASES.values():
+        if database["ENGINE"] in POOLED_ENGINES:
+            database["ENGINE"] = POOLED_ENGINES[database["ENGINE"]]
+            # Django hands the connection back at the end of every request;
+            # the pool does the reusing and the health checks.
+            database["CONN_MAX_AGE"] = 0
+            database["CONN_HEALTH_CHECKS"] = False
+            database["POOL"] = {
+                "MIN_SIZE": int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+                "MAX_SIZE": int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+                "TIMEOUT": float(os.getenv('DB_POOL_TIMEOUT', '10')),
+                "RECYCLE": int(os.getenv('DB_POOL_RECYCLE', '1800')),
+                "IDLE_TIMEOUT": int(os.getenv('DB_POOL_IDLE_TIMEOUT', '300')),
+                "HEALTH_CHECKS": os.getenv('DB_POOL_HEALTH_CHECKS', 'True') == 'True',
+            }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -193,6 +266,98 @@ WHITENOISE_MANIFEST_STRICT = False
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 AUTH_USER_MODEL = 'userauths.User'
 
+# Page size of the cursor-paginated transaction lists.
+TRANSACTIONS_PER_PAGE = int(os.getenv('TRANSACTIONS_PER_PAGE', '25'))
+DASHBOARD_TRANSACTIONS = int(os.getenv('DASHBOARD_TRANSACTIONS', '10'))
+
+# Largest number of recipients accepted by one bulk transfer (CSV upload or API).
+BULK_TRANSFER_MAX_ROWS = int(os.getenv('BULK_TRANSFER_MAX_ROWS', '5000'))
+
+# How long (seconds) a transfer/request idempotency key is honoured, and how
+# many recent keys each worker keeps in memory.
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', str(24 * 60 * 60)))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv('IDEMPOTENCY_CACHE_SIZE', '10000'))
+
+# Cache backend. The per-process memory cache is fine for a single worker;
+# multi-worker deployments should point this at a shared cache, e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Sessions (core/sessions.py) are read from a per-worker LRU, then from the
+# SESSION_CACHE_ALIAS cache, then from the database. The cache tier is only
+# used when it is shared between workers, so it is off unless CACHE_BACKEND
+# is set. Each worker keeps SESSION_LOCAL_CACHE_SIZE sessions for
+# SESSION_LOCAL_CACHE_TTL seconds, which is how long a sign-out takes to
+# reach the other workers' read-only requests (state-changing ones always
+# check). Expiry pushes of unchanged sessions are written in bulk every
+# SESSION_TOUCH_INTERVAL seconds, by core.sessions.SessionMiddleware.
+SESSION_ENGINE = "core.sessions"
+SESSION_CACHE_ALIAS = os.getenv('SESSION_CACHE_ALIAS', 'default' if os.getenv('CACHE_BACKEND') else '')
+SESSION_LOCAL_CACHE_SIZE = int(os.getenv('SESSION_LOCAL_CACHE_SIZE', '10000'))
+SESSION_LOCAL_CACHE_TTL = int(os.getenv('SESSION_LOCAL_CACHE_TTL', '5'))
+SESSION_TOUCH_INTERVAL = int(os.getenv('SESSION_TOUCH_INTERVAL', '60'))
+
+# Cache alias and lifetime (seconds) of the per-user dashboard summary. Like
+# the session cache tier, it must be shared between workers, so it is off
+# unless CACHE_BACKEND is set.
+DASHBOARD_SUMMARY_CACHE = os.getenv('DASHBOARD_SUMMARY_CACHE', 'default' if os.getenv('CACHE_BACKEND') else '')
+DASHBOARD_SUMMARY_TIMEOUT = int(os.getenv('DASHBOARD_SUMMARY_TIMEOUT', '300'))
+
+# Per-process cache of resolved recipient cards on the transfer/request search pages.
+ACCOUNT_CARD_CACHE_SIZE = int(os.getenv('ACCOUNT_CARD_CACHE_SIZE', '10000'))
+ACCOUNT_CARD_CACHE_TTL = int(os.getenv('ACCOUNT_CARD_CACHE_TTL', '300'))
+
+# How many notifications the header dropdown and dashboard alerts list show.
+LATEST_NOTIFICATIONS = int(os.getenv('LATEST_NOTIFICATIONS', '5'))
+
+# Account identifiers are reserved this many at a time per worker process;
+# a warning is logged once a keyspace is this fraction reserved.
+IDENTIFIER_BLOCK_SIZE = int(os.getenv('IDENTIFIER_BLOCK_SIZE', '100'))
+IDENTIFIER_WARN_UTILISATION = float(os.getenv('IDENTIFIER_WARN_UTILISATION', '0.8'))
+
+# Opt-in per-request timings: a Server-Timing header and a JSON log line on
+# the core.performance logger. PERFORMANCE_PROFILE_RATE of the requests are
+# also run under cProfile and dumped to PERFORMANCE_PROFILE_DIR/<url name>/.
+PERFORMANCE_INSTRUMENTATION = os.getenv('PERFORMANCE_INSTRUMENTATION', 'False') == 'True'
+PERFORMANCE_PROFILE_RATE = float(os.getenv('PERFORMANCE_PROFILE_RATE', '0'))
+PERFORMANCE_PROFILE_DIR = os.getenv('PERFORMANCE_PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+
+# Prometheus metrics at /internal/metrics/. Under gunicorn, point METRICS_DIR
+# at a directory the workers share (emptied on start by gunicorn.conf.py) so
+# the endpoint reports all workers; without it each process counts alone.
+# Scrapers must send METRICS_TOKEN as a bearer token. Without a token the
+# endpoint is closed, unless METRICS_ALLOW_UNAUTHENTICATED opens it to anyone
+# who can reach it (only do that where nginx does not proxy it).
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOW_UNAUTHENTICATED = os.getenv('METRICS_ALLOW_UNAUTHENTICATED', 'False') == 'True'
+
+# Statements slower than SLOW_QUERY_THRESHOLD_MS (0 = off) are logged with
+# their EXPLAIN plan to a size-rotated JSON-lines file; summarise it with
+# `python manage.py slow_queries`.
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '0'))
+SLOW_QUERY_LOG_FILE = os.getenv('SLOW_QUERY_LOG_FILE', os.path.join(BASE_DIR, 'logs', 'slow_queries.log'))
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv('SLOW_QUERY_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv('SLOW_QUERY_LOG_BACKUPS', '5'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.performance': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'paylio.db.batches': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 JAZZMIN_SETTINGS = {
     "site_header": "Paylio",
     "site_brand": "Payment Made Easy...",
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+from paylio.db.batches import update_in_chunks
+
+
+def count_unread(apps, schema_editor):
+    User = apps.get_model('userauths', 'User')
+    Notification = apps.get_model('core', 'Notification')
+    unread = Notification.objects.filter(is_read=False, user__isnull=False)
+
+    def count(users):
+        counts = dict(
+            unread.filter(user__in=users).values_list('user_id').annotate(count=models.Count('id')).order_by()
+        )
+        for user in users:
+            user.unread_notifications = counts[user.pk]
+        return users
+
+    # Recounting is idempotent, so a stopped run can simply be applied again.
+    update_in_chunks(User.objects.filter(pk__in=unread.values('user_id')), ['unread_notifications'], count)
+
+
+class Migration(migrations.Migration):
+    # Data only: each chunk of users commits separately.
+    atomic = False
+
+    dependencies = [
+        ('userauths', '0003_user_unread_notifications'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(count_unread, migrations.RunPython.noop),
+    ]
@@ -4,9 +4,12 @@ from django.contrib.auth.models import AbstractUser
 # Create your models here.
 
 class User(AbstractUser):
-    username = models.CharField(max_length=100)
+    username = models.CharField(max_length=100, db_index=True)
     email = models.EmailField(unique=True)
     is_staff =  models.BooleanField(default=False)
+    # Kept in step with the user's unread Notification rows by core.notifications,
+    # so the header badge needs no query.
+    unread_notifications = models.PositiveIntegerField(default=0, editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
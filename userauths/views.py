@@ -2,6 +2,8 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 
+from core import metrics
+from paylio.db.transaction import write_transaction
 from userauths.models import User
 from userauths.forms import UserRegisterForm
 
@@ -13,8 +15,11 @@ def RegisterView(request):
     if request.method == "POST":
         form = UserRegisterForm(request.POST)
         if form.is_valid():
-            # form.save()
-            new_user = form.save() # new_user.email
+            # The user, its account (create_account) and the account's
+            # identifiers are all written in this one transaction.
+            with write_transaction():
+                new_user = form.save() # new_user.email
+            metrics.sign_ups.inc()
             username = form.cleaned_data.get("username")
             # username = request.POST.get("username")
             messages.success(request, f"Hey {username}, your account was created successfully.")
@@ -52,9 +57,11 @@ def LoginView(request):
             user = authenticate(request, username=identifier, password=password)
 
         if user is not None:
+            metrics.sign_ins.inc(outcome="success")
             login(request, user)
             messages.success(request, "You are logged.")
             return redirect("account:account")
+        metrics.sign_ins.inc(outcome="failure")
         messages.warning(request, "Username/email or password does not exist")
         return redirect("userauths:sign-in")
 